@@ -29,6 +29,69 @@ OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
 GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID', 'your-google-client-id-here')
 GOOGLE_CLOUD_API_KEY = os.getenv('GOOGLE_CLOUD_API_KEY', '')
 
+# ✅ Cliente OpenAI compartido: timeouts, reintentos y circuit breaker
+OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '5'))
+OPENAI_READ_TIMEOUT = float(os.getenv('OPENAI_READ_TIMEOUT', '20'))
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '2'))
+OPENAI_RETRY_BUDGET_RATIO = float(os.getenv('OPENAI_RETRY_BUDGET_RATIO', '0.2'))
+OPENAI_POOL_MAX_CONNECTIONS = int(os.getenv('OPENAI_POOL_MAX_CONNECTIONS', '10'))
+OPENAI_BREAKER_FAILURE_THRESHOLD = int(os.getenv('OPENAI_BREAKER_FAILURE_THRESHOLD', '5'))
+OPENAI_BREAKER_LATENCY_THRESHOLD = float(os.getenv('OPENAI_BREAKER_LATENCY_THRESHOLD', '8'))
+OPENAI_BREAKER_RESET_TIMEOUT = float(os.getenv('OPENAI_BREAKER_RESET_TIMEOUT', '30'))
+# URL alternativa de la API (p. ej. el servidor local `manage.py llm_standin`)
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', '')
+# Generación de ejercicios con IA: serial, concurrent o single
+EXERCISE_GENERATION_MODE = os.getenv('EXERCISE_GENERATION_MODE', 'serial')
+
+# ✅ Prefetch especulativo de la siguiente sesión de práctica
+PRACTICE_PREFETCH_ENABLED = os.getenv('PRACTICE_PREFETCH_ENABLED', 'True').lower() == 'true'
+PRACTICE_PREFETCH_COMPLETION_RATIO = float(os.getenv('PRACTICE_PREFETCH_COMPLETION_RATIO', '0.7'))
+PRACTICE_PREFETCH_TTL = int(os.getenv('PRACTICE_PREFETCH_TTL', '600'))
+
+# ✅ Catálogo de logros en memoria (segundos antes de recargarlo de la base)
+ACHIEVEMENT_CATALOGUE_TTL = int(os.getenv('ACHIEVEMENT_CATALOGUE_TTL', '300'))
+
+# ✅ Registro de actividad en diferido (buffer en memoria + lista de Redis como respaldo)
+ACTIVITY_LOG_ASYNC = os.getenv('ACTIVITY_LOG_ASYNC', 'True').lower() == 'true'
+ACTIVITY_LOG_BUFFER_SIZE = int(os.getenv('ACTIVITY_LOG_BUFFER_SIZE', '200'))
+ACTIVITY_LOG_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_LOG_FLUSH_INTERVAL', '2'))
+ACTIVITY_LOG_MAX_BUFFER = int(os.getenv('ACTIVITY_LOG_MAX_BUFFER', '10000'))
+ACTIVITY_LOG_REDIS_KEY = os.getenv('ACTIVITY_LOG_REDIS_KEY', 'activity_log:pending')
+# Retención de ActivityLog y particiones mensuales creadas por adelantado (PostgreSQL)
+ACTIVITY_LOG_RETENTION_DAYS = int(os.getenv('ACTIVITY_LOG_RETENTION_DAYS', '90'))
+ACTIVITY_LOG_PARTITIONS_AHEAD = int(os.getenv('ACTIVITY_LOG_PARTITIONS_AHEAD', '3'))
+
+# ✅ Idempotency-Key en escrituras que los clientes reintentan
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', '86400'))
+IDEMPOTENCY_LOCK_TTL = int(os.getenv('IDEMPOTENCY_LOCK_TTL', '60'))
+
+# ✅ Vista previa de penalización por abandono (caché por sesión)
+ABANDONMENT_PREVIEW_TTL = int(os.getenv('ABANDONMENT_PREVIEW_TTL', '300'))
+
+# ✅ Caché de respuestas por usuario (progreso, panel, vocabulario); se invalida por versión
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '600'))
+
+# ✅ Barrido de sesiones abiertas vencidas (intervalo 0 = solo con reap_stale_sessions)
+STALE_SESSION_AFTER = int(os.getenv('STALE_SESSION_AFTER', str(60 * 60 * 2)))
+STALE_SESSION_SWEEP_INTERVAL = float(os.getenv('STALE_SESSION_SWEEP_INTERVAL', '0'))
+STALE_SESSION_BATCH = int(os.getenv('STALE_SESSION_BATCH', '200'))
+STALE_SESSION_MAX_BATCHES = int(os.getenv('STALE_SESSION_MAX_BATCHES', '10'))
+
+# ✅ Estado de sesiones en curso en Redis (TTL mayor que STALE_SESSION_AFTER)
+SESSION_STATE_REDIS = os.getenv('SESSION_STATE_REDIS', 'True').lower() == 'true'
+SESSION_STATE_TTL = int(os.getenv('SESSION_STATE_TTL', str(60 * 60 * 24)))
+
+# ✅ Metas diarias con escritura diferida (contadores de hoy en Redis)
+DAILY_GOAL_WRITE_BEHIND = os.getenv('DAILY_GOAL_WRITE_BEHIND', 'True').lower() == 'true'
+DAILY_GOAL_FLUSH_INTERVAL = float(os.getenv('DAILY_GOAL_FLUSH_INTERVAL', '30'))
+DAILY_GOAL_FLUSH_BATCH = int(os.getenv('DAILY_GOAL_FLUSH_BATCH', '500'))
+DAILY_GOAL_REDIS_TTL = int(os.getenv('DAILY_GOAL_REDIS_TTL', str(60 * 60 * 48)))
+
+# ✅ Sincronización incremental de clientes sin conexión (ChangeLog)
+# El cursor solo avanza sobre cambios con más de estos segundos (transacciones en curso)
+SYNC_SETTLE_SECONDS = int(os.getenv('SYNC_SETTLE_SECONDS', '10'))
+SYNC_CHANGELOG_RETENTION_DAYS = int(os.getenv('SYNC_CHANGELOG_RETENTION_DAYS', '30'))
+
 # ✅ Firebase credentials para Render (como string JSON, no archivo)
 FIREBASE_CREDENTIALS_JSON = os.getenv('FIREBASE_CREDENTIALS_JSON', '{}')
 
@@ -194,7 +257,9 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
 ]
+CORS_EXPOSE_HEADERS = ['idempotent-replayed', 'retry-after', 'etag', 'last-modified']
 
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
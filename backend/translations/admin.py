@@ -1,5 +1,6 @@
 # translations/admin.py - ADMIN COMPLETO EN ESPAÑOL PARA YACHAY CON MEJORAS DE INTERFAZ
 from django.contrib import admin
+from django.conf import settings
 from django.utils.html import format_html
 from django.db.models import Count
 from django.utils import timezone
@@ -794,7 +795,11 @@ class UserProfileAdmin(BaseModelAdmin):
     
     def reset_streak(self, request, queryset):
         """Reinicia rachas de los perfiles seleccionados"""
+        from .services import user_cache
+        user_ids = list(queryset.values_list('user_id', flat=True))
         updated = queryset.update(streak_days=0, last_activity=None)
+        for user_id in user_ids:
+            user_cache.bump(user_id)
         self.message_user(request, f'🔄 {updated} perfiles tuvieron sus rachas reiniciadas.')
     reset_streak.short_description = "🔄 Reiniciar racha de usuarios seleccionados"
     
@@ -1135,14 +1140,16 @@ class ActivityLogAdmin(BaseModelAdmin):
     fecha_hora_formateada.admin_order_field = 'timestamp'
     
     def cleanup_old_logs(self, request, queryset):
-        """Limpia logs antiguos (más de 90 días)"""
-        from datetime import timedelta
-        cutoff_date = timezone.now() - timedelta(days=90)
-        old_logs = ActivityLog.objects.filter(timestamp__lt=cutoff_date)
-        count = old_logs.count()
-        old_logs.delete()
-        
-        self.message_user(request, f'🗑️ Se eliminaron {count} registros antiguos (más de 90 días).')
+        """Limpia logs antiguos (más de ACTIVITY_LOG_RETENTION_DAYS días)"""
+        from .services import log_partitions
+        result = log_partitions.cleanup()
+        # Con particiones, los meses completos se retiran sin contar sus filas
+        partitions = f" y {len(result['partitions'])} particiones mensuales" if result['partitions'] else ''
+        self.message_user(
+            request,
+            f"🗑️ Se eliminaron {result['rows']} registros antiguos{partitions} "
+            f"(más de {settings.ACTIVITY_LOG_RETENTION_DAYS} días)."
+        )
     cleanup_old_logs.short_description = "🗑️ Limpiar registros antiguos"
     
     def changelist_view(self, request, extra_context=None):
@@ -1351,12 +1358,21 @@ class UserVocabularyAdmin(BaseModelAdmin):
     
     def reset_mastery(self, request, queryset):
         """Reinicia el dominio de palabras seleccionadas"""
-        updated = queryset.update(
-            mastery_level=1, 
-            exercises_completed=0, 
-            exercises_correct=0,
-            consecutive_failures=0
-        )
+        from django.db import transaction
+        from .services import star_histogram, sync, user_cache
+        with transaction.atomic():
+            rows = list(queryset.select_for_update().values_list('id', 'user_id', 'mastery_level'))
+            transitions = [(user_id, level, 1) for _, user_id, level in rows]
+            updated = queryset.update(
+                mastery_level=1, 
+                exercises_completed=0, 
+                exercises_correct=0,
+                consecutive_failures=0
+            )
+            star_histogram.shift(transitions)
+            sync.record((user_id, 'vocabulary', vocab_id, False) for vocab_id, user_id, _ in rows)
+            for user_id in {user_id for _, user_id, _ in rows}:
+                user_cache.bump(user_id)
         self.message_user(request, f'🔄 {updated} vocabularios reiniciados.')
     reset_mastery.short_description = "🔄 Reiniciar dominio seleccionado"
     
@@ -1441,11 +1457,17 @@ class DailyGoalAdmin(BaseModelAdmin):
     
     def reset_goals(self, request, queryset):
         """Reinicia las metas seleccionadas"""
+        from .services import daily_goals, user_cache
+        goals = list(queryset.values_list('user_id', 'date'))
         updated = queryset.update(
             words_detected=0,
             words_practiced=0,
             words_mastered=0
         )
+        # Sin esto la copia en Redis seguiría mostrando los contadores viejos
+        daily_goals.discard(goals)
+        for user_id in {user_id for user_id, _ in goals}:
+            user_cache.bump(user_id)
         self.message_user(request, f'🔄 {updated} metas reiniciadas.')
     reset_goals.short_description = "🔄 Reiniciar metas seleccionadas"
     
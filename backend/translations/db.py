@@ -0,0 +1,34 @@
+# translations/db.py
+"""Consultas SQL construidas con el ORM que Django no expone (compartidas por modelos y servicios)"""
+from django.db import connections
+from django.db.models.expressions import Col
+from django.db.models.sql import UpdateQuery
+
+
+def update_returning(queryset, values, returning):
+    """
+    UPDATE ... RETURNING construido con las expresiones del ORM.
+    Devuelve la primera fila actualizada como dict (None si no hubo filas).
+    """
+    model = queryset.model
+    query = queryset.query.chain(UpdateQuery)
+    query.add_update_values(values)
+    compiler = query.get_compiler(queryset.db)
+    update_sql, params = compiler.as_sql()
+
+    connection = connections[queryset.db]
+    fields = [model._meta.get_field(name) for name in returning]
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.execute(f"{update_sql} RETURNING {columns}", params)
+        row = cursor.fetchone()
+    if row is None:
+        return None
+
+    result = {}
+    for field, value in zip(fields, row):
+        expression = Col(model._meta.db_table, field)
+        for converter in connection.ops.get_db_converters(expression) + field.get_db_converters(connection):
+            value = converter(value, expression, connection)
+        result[field.name] = value
+    return result
@@ -0,0 +1,48 @@
+# translations/management/commands/activity_log_partitions.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from translations.services import log_partitions
+
+
+class Command(BaseCommand):
+    """
+    Mantenimiento de ActivityLog: crea las particiones mensuales de los meses
+    que vienen y retira las que quedaron fuera de la retención. Sin
+    particiones (SQLite) solo borra los registros vencidos por lotes.
+    """
+
+    help = 'Crea particiones futuras de ActivityLog y retira las vencidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=None,
+                            help='Meses a crear por adelantado (default: ACTIVITY_LOG_PARTITIONS_AHEAD)')
+        parser.add_argument('--retention-days', type=int, default=None,
+                            help='Días de registros a conservar (default: ACTIVITY_LOG_RETENTION_DAYS)')
+        parser.add_argument('--detach-only', action='store_true',
+                            help='Separar las particiones vencidas sin borrarlas (para archivarlas)')
+        parser.add_argument('--skip-cleanup', action='store_true',
+                            help='Solo crear particiones')
+
+    def handle(self, *args, **options):
+        if not log_partitions.is_partitioned():
+            self.stdout.write('ActivityLog no está particionada en esta base; solo se borran registros vencidos')
+        else:
+            created = log_partitions.ensure_partitions(options['months_ahead'])
+            self.stdout.write(f"Particiones creadas: {', '.join(created) or 'ninguna'}")
+
+        if options['skip_cleanup']:
+            return
+
+        retention_days = options['retention_days'] or settings.ACTIVITY_LOG_RETENTION_DAYS
+        result = log_partitions.cleanup(
+            timezone.now() - timedelta(days=retention_days), detach_only=options['detach_only']
+        )
+        action = 'separadas' if options['detach_only'] else 'eliminadas'
+        self.stdout.write(self.style.SUCCESS(
+            f"Particiones {action}: {', '.join(result['partitions']) or 'ninguna'}; "
+            f"registros borrados: {result['rows']}"
+        ))
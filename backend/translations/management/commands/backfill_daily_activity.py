@@ -0,0 +1,47 @@
+# translations/management/commands/backfill_daily_activity.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from translations.models import ActivityLog
+from translations.services import daily_activity
+
+
+class Command(BaseCommand):
+    """
+    Reconstruye UserDailyActivity desde ActivityLog: la carga inicial tras la
+    migración y la corrección si algún resumen se desfasó (p. ej. un fallo al
+    actualizarlo después de insertar los eventos).
+    """
+
+    help = 'Recalcula el resumen diario de actividad de los usuarios desde ActivityLog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=0,
+                            help='Solo los últimos N días (default: 0, todo el historial)')
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Id de usuario (repetible; default: todos)')
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Usuarios por lote (default: 200)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days'] > 0:
+            since = timezone.localdate() - timedelta(days=options['days'] - 1)
+
+        user_ids = options['users']
+        if not user_ids:
+            logs = ActivityLog.objects.filter(activity_type__in=daily_activity.COUNTER_TYPES)
+            if since is not None:
+                logs = logs.filter(timestamp__date__gte=since)
+            user_ids = list(logs.values_list('user_id', flat=True).order_by('user_id').distinct())
+
+        batch_size = max(1, options['batch_size'])
+        rows = 0
+        for start in range(0, len(user_ids), batch_size):
+            rows += daily_activity.rebuild(user_ids[start:start + batch_size], since=since)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Resúmenes diarios escritos: {rows} ({len(user_ids)} usuarios)'
+        ))
@@ -0,0 +1,266 @@
+# translations/management/commands/benchmark_generation.py
+import json
+import os
+import platform
+import queue
+import subprocess
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from translations.models import Exercise, ExerciseSession, ObjectTranslation
+from translations.services import llm_client
+from translations.services.llm_standin import StandinServer, add_standin_arguments, config_from_options
+
+GENERATION_MODES = ('serial', 'concurrent', 'single')
+BENCHMARK_USERNAME = 'benchmark_generation'
+
+
+class Command(BaseCommand):
+    """
+    Mide la latencia de punta a punta de `generate_by_label` (vista completa:
+    generación, guardado de ejercicios y sesión, serialización) y el throughput
+    bajo concurrencia para cada modo de generación.
+
+    Por defecto levanta el stand-in local (llm_standin) en un puerto libre, así
+    que no se llama a OpenAI. Los resultados se escriben en JSON con el commit
+    actual para poder compararlos entre versiones.
+
+    No correr contra la base de datos de producción: crea ejercicios y sesiones
+    (se eliminan al terminar salvo --keep-data).
+    """
+
+    help = 'Benchmark de generate_by_label para los modos serial, concurrent y single'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default=','.join(GENERATION_MODES),
+                            help='Modos a medir, separados por coma (default: serial,concurrent,single)')
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Peticiones medidas por modo (default: 50)')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Peticiones simultáneas (default: 4)')
+        parser.add_argument('--warmup', type=int, default=2,
+                            help='Peticiones de calentamiento por modo, no medidas (default: 2)')
+        parser.add_argument('--labels', default='',
+                            help='Etiquetas en inglés separadas por coma (default: 10 al azar)')
+        parser.add_argument('--output', default='',
+                            help='Archivo donde escribir los resultados JSON (default: stdout)')
+        parser.add_argument('--base-url', default='',
+                            help='Usar un stand-in ya levantado en esta URL en lugar de uno en proceso')
+        parser.add_argument('--allow-openai', action='store_true',
+                            help='Permitir el benchmark contra la API real de OpenAI (tiene costo)')
+        parser.add_argument('--keep-data', action='store_true',
+                            help='No borrar los ejercicios y sesiones creados')
+        add_standin_arguments(parser)
+
+    def handle(self, *args, **options):
+        # La vista importa servicios pesados (YOLO, Firebase): cargarla solo aquí
+        from translations.views import ExerciseViewSet
+
+        modes = [m.strip() for m in options['modes'].split(',') if m.strip()]
+        invalid = set(modes) - set(GENERATION_MODES)
+        if invalid:
+            raise CommandError(f'Modos no válidos: {", ".join(sorted(invalid))}')
+
+        labels = self._labels(options['labels'])
+        user, _ = User.objects.get_or_create(username=BENCHMARK_USERNAME)
+        started_at = timezone.now()
+
+        server = None
+        overrides = {}
+        if options['allow_openai']:
+            if not settings.OPENAI_API_KEY:
+                raise CommandError('OPENAI_API_KEY no está configurada')
+            standin = {'target': 'openai'}
+        elif options['base_url']:
+            overrides = {'OPENAI_BASE_URL': options['base_url'],
+                         'OPENAI_API_KEY': settings.OPENAI_API_KEY or 'standin'}
+            standin = {'target': options['base_url']}
+        else:
+            config = config_from_options(options)
+            server = StandinServer(config)
+            server.start_in_background()
+            overrides = {'OPENAI_BASE_URL': server.base_url,
+                         'OPENAI_API_KEY': settings.OPENAI_API_KEY or 'standin'}
+            standin = {'target': 'in_process', **config.describe()}
+            self.stderr.write(f'Stand-in local en {server.base_url}')
+
+        self.view = ExerciseViewSet.as_view({'get': 'generate_by_label'})
+        self.user = user
+        self.created_exercise_ids = []
+
+        results = {}
+        try:
+            for mode in modes:
+                with override_settings(EXERCISE_GENERATION_MODE=mode, **overrides):
+                    llm_client.reset_client()
+                    self.stderr.write(f'Midiendo modo {mode}...')
+                    calls_before = dict(server.config.counters) if server else None
+
+                    for i in range(options['warmup']):
+                        self._timed_request(labels[i % len(labels)])
+
+                    results[mode] = self._run(labels, options['requests'], options['concurrency'])
+                    results[mode]['generator'] = llm_client.get_metrics()
+                    if server:
+                        results[mode]['standin_calls'] = {
+                            key: value - calls_before[key] for key, value in server.config.counters.items()
+                        }
+                    self.stderr.write(
+                        f"  p50={results[mode]['latency_ms']['p50']}ms "
+                        f"p95={results[mode]['latency_ms']['p95']}ms "
+                        f"throughput={results[mode]['throughput_rps']} req/s"
+                    )
+        finally:
+            llm_client.reset_client()
+            if server:
+                server.shutdown()
+                server.server_close()
+            if not options['keep_data']:
+                self._cleanup(started_at)
+
+        report = {
+            'benchmark': 'generate_by_label',
+            'timestamp': started_at.isoformat(),
+            'git': self._git_info(),
+            'environment': {
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'cpu_count': os.cpu_count(),
+            },
+            'parameters': {
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'warmup': options['warmup'],
+                'labels': labels,
+            },
+            'llm': standin,
+            'results': results,
+        }
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f'Resultados escritos en {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+    def _labels(self, labels_option):
+        if labels_option:
+            labels = [label.strip() for label in labels_option.split(',') if label.strip()]
+        else:
+            labels = list(ObjectTranslation.objects.order_by('?').values_list('english_label', flat=True)[:10])
+        if not labels:
+            raise CommandError('No hay traducciones cargadas (ejecuta load_translations)')
+        return labels
+
+    def _timed_request(self, label):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+
+        request = APIRequestFactory().get('/api/exercises/generate_by_label/', {'label': label})
+        force_authenticate(request, user=self.user)
+
+        started = time.perf_counter()
+        response = self.view(request)
+        response.render()
+        elapsed = time.perf_counter() - started
+
+        exercises = []
+        if response.status_code == 200:
+            data = response.data
+            exercises = data['exercises'] if isinstance(data, dict) else data
+            self.created_exercise_ids.extend(e['id'] for e in exercises if e.get('id'))
+        return elapsed, response.status_code, len(exercises)
+
+    def _run(self, labels, total, concurrency):
+        pending = queue.Queue()
+        for i in range(total):
+            pending.put(labels[i % len(labels)])
+
+        samples = []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        label = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        sample = self._timed_request(label)
+                    except Exception as e:
+                        self.stderr.write(f'  Error en petición: {e}')
+                        sample = (0.0, 'exception', 0)
+                    with lock:
+                        samples.append(sample)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(max(1, concurrency))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_time = time.perf_counter() - started
+
+        ok = [s for s in samples if s[1] == 200]
+        latencies = sorted(s[0] * 1000 for s in ok)
+        statuses = {}
+        for _, status_code, _ in samples:
+            statuses[str(status_code)] = statuses.get(str(status_code), 0) + 1
+
+        return {
+            'requests': len(samples),
+            'errors': len(samples) - len(ok),
+            'status_codes': statuses,
+            'wall_time_s': round(wall_time, 3),
+            'throughput_rps': round(len(ok) / wall_time, 2) if wall_time else 0,
+            'exercises_per_response': round(sum(s[2] for s in ok) / len(ok), 2) if ok else 0,
+            'latency_ms': {
+                'min': round(latencies[0], 1) if latencies else None,
+                'mean': round(sum(latencies) / len(latencies), 1) if latencies else None,
+                'p50': self._percentile(latencies, 50),
+                'p95': self._percentile(latencies, 95),
+                'p99': self._percentile(latencies, 99),
+                'max': round(latencies[-1], 1) if latencies else None,
+            },
+        }
+
+    @staticmethod
+    def _percentile(sorted_values, percentile):
+        """Percentil por rango más cercano"""
+        if not sorted_values:
+            return None
+        rank = max(1, -(-percentile * len(sorted_values) // 100))
+        return round(sorted_values[int(rank) - 1], 1)
+
+    def _cleanup(self, started_at):
+        ExerciseSession.objects.filter(user=self.user, start_time__gte=started_at).delete()
+        Exercise.objects.filter(id__in=self.created_exercise_ids).delete()
+
+    @staticmethod
+    def _git_info():
+        def git(*args):
+            try:
+                return subprocess.run(
+                    ['git', *args], capture_output=True, text=True, timeout=5,
+                    cwd=settings.BASE_DIR
+                ).stdout.strip()
+            except (OSError, subprocess.SubprocessError):
+                return ''
+
+        commit = git('rev-parse', 'HEAD')
+        return {
+            'commit': commit or None,
+            'branch': git('rev-parse', '--abbrev-ref', 'HEAD') or None,
+            'dirty': bool(git('status', '--porcelain', '--untracked-files=no')) if commit else None,
+        }
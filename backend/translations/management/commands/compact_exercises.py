@@ -0,0 +1,264 @@
+# translations/management/commands/compact_exercises.py
+import json
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, Count, Exists, IntegerField, Min, OuterRef, Sum, Value, When
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from translations.models import Exercise, ExerciseSessionLog, UserProgress
+
+CHECKPOINT_KEY = 'compact_exercises:checkpoint'
+
+# Sobrecarga aproximada por fila (cabecera, índices, FKs) para el reporte de espacio
+ROW_OVERHEAD_BYTES = 64
+
+
+class Command(BaseCommand):
+    """
+    Compacta las tablas de ejercicios:
+    1. Deduplica ejercicios generados idénticos (misma traducción, tipo, pregunta,
+       respuesta y distractores) en una fila canónica, re-apuntando UserProgress y
+       ExerciseSessionLog por lotes.
+    2. Purga ejercicios que nunca fueron respondidos después del periodo de retención.
+
+    El avance se guarda en caché por lote, así que una ejecución interrumpida
+    continúa donde se quedó.
+    """
+
+    help = 'Deduplica ejercicios idénticos y purga ejercicios nunca respondidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo reporta lo que se haría y el espacio recuperable')
+        parser.add_argument('--retention-days', type=int, default=30,
+                            help='Días de retención para ejercicios nunca respondidos (default: 30)')
+        parser.add_argument('--min-age-hours', type=int, default=24,
+                            help='Ignorar ejercicios más recientes (sesiones en curso) (default: 24)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Tamaño de lote para grupos y filas (default: 500)')
+        parser.add_argument('--skip-dedupe', action='store_true', help='No deduplicar')
+        parser.add_argument('--skip-purge', action='store_true', help='No purgar')
+        parser.add_argument('--reset', action='store_true',
+                            help='Descarta el progreso guardado y empieza desde el inicio')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.batch_size = max(1, options['batch_size'])
+        now = timezone.now()
+        safe_cutoff = now - timedelta(hours=options['min_age_hours'])
+        retention_cutoff = now - timedelta(days=options['retention_days'])
+
+        if options['reset'] or self.dry_run:
+            checkpoint = {}
+        else:
+            checkpoint = cache.get(CHECKPOINT_KEY) or {}
+        if checkpoint and not self.dry_run:
+            self.stdout.write(self.style.NOTICE(f'Reanudando desde {checkpoint}'))
+
+        self.stats = {
+            'duplicate_groups': 0,
+            'exercises_merged': 0,
+            'progress_merged': 0,
+            'logs_repointed': 0,
+            'exercises_purged': 0,
+            'logs_purged': 0,
+            'bytes_reclaimed': 0,
+        }
+        self.merged_ids = set()
+
+        if not options['skip_dedupe'] and checkpoint.get('phase', 'dedupe') == 'dedupe':
+            self._dedupe(safe_cutoff, checkpoint.get('last_id', 0))
+            checkpoint = {'phase': 'purge', 'last_id': 0}
+            self._save_checkpoint(checkpoint)
+
+        if not options['skip_purge']:
+            last_id = checkpoint.get('last_id', 0) if checkpoint.get('phase') == 'purge' else 0
+            self._purge(min(safe_cutoff, retention_cutoff), last_id)
+
+        if not self.dry_run:
+            cache.delete(CHECKPOINT_KEY)
+
+        self._report()
+
+    # ------------------------------------------------------------------
+    # Deduplicación
+    # ------------------------------------------------------------------
+
+    def _dedupe(self, safe_cutoff, last_id):
+        self.stdout.write(self.style.NOTICE('Buscando ejercicios duplicados...'))
+        group_fields = ('object_translation_id', 'type', 'question', 'answer')
+
+        while True:
+            groups = list(
+                Exercise.objects.filter(created_at__lt=safe_cutoff)
+                .values(*group_fields)
+                .annotate(first_id=Min('id'), total=Count('id'))
+                .filter(total__gt=1, first_id__gt=last_id)
+                .order_by('first_id')[:self.batch_size]
+            )
+            if not groups:
+                break
+
+            # duplicado -> canónico
+            mapping = {}
+            for group in groups:
+                members = Exercise.objects.filter(
+                    created_at__lt=safe_cutoff,
+                    **{field: group[field] for field in group_fields}
+                ).order_by('id').values('id', 'distractors', 'question', 'answer', 'metadata')
+
+                # Los distractores (JSON) se comparan en Python para no depender del motor
+                canonical_by_distractors = {}
+                for member in members:
+                    fingerprint = json.dumps(member['distractors'], sort_keys=True)
+                    canonical_id = canonical_by_distractors.setdefault(fingerprint, member['id'])
+                    if canonical_id != member['id']:
+                        mapping[member['id']] = canonical_id
+                        self.stats['bytes_reclaimed'] += self._row_size(member)
+
+                self.stats['duplicate_groups'] += 1
+
+            if mapping:
+                self._merge_batch(mapping)
+
+            last_id = groups[-1]['first_id']
+            self._save_checkpoint({'phase': 'dedupe', 'last_id': last_id})
+            self.stdout.write(f'  Lote procesado hasta el grupo {last_id} '
+                              f'({self.stats["exercises_merged"]} duplicados)')
+
+    def _merge_batch(self, mapping):
+        """Re-apunta las FKs de un lote de duplicados y los elimina en una transacción"""
+        duplicate_ids = list(mapping)
+        self.stats['exercises_merged'] += len(duplicate_ids)
+
+        if self.dry_run:
+            self.merged_ids.update(duplicate_ids)
+            self.stats['logs_repointed'] += ExerciseSessionLog.objects.filter(
+                exercise_id__in=duplicate_ids
+            ).count()
+            self.stats['progress_merged'] += UserProgress.objects.filter(
+                exercise_id__in=duplicate_ids
+            ).count()
+            return
+
+        with transaction.atomic():
+            # 1. Logs de sesión: un solo UPDATE con CASE para todo el lote
+            self.stats['logs_repointed'] += ExerciseSessionLog.objects.filter(
+                exercise_id__in=duplicate_ids
+            ).update(exercise_id=Case(
+                *[When(exercise_id=dup, then=Value(canonical)) for dup, canonical in mapping.items()],
+                output_field=IntegerField()
+            ))
+
+            # 2. Progreso: fusionar filas (user, ejercicio) para respetar unique_together
+            involved_ids = set(duplicate_ids) | set(mapping.values())
+            merged = {}
+            to_delete = []
+            rows = UserProgress.objects.filter(exercise_id__in=involved_ids).order_by('id')
+            for progress in rows:
+                canonical_id = mapping.get(progress.exercise_id, progress.exercise_id)
+                key = (progress.user_id, canonical_id)
+                keeper = merged.get(key)
+                if keeper is None:
+                    progress.exercise_id = canonical_id
+                    merged[key] = progress
+                    continue
+                keeper.attempts += progress.attempts
+                keeper.correct = keeper.correct or progress.correct
+                keeper.completed = keeper.completed or progress.completed
+                keeper.last_attempt = max(keeper.last_attempt, progress.last_attempt)
+                to_delete.append(progress.id)
+
+            if to_delete:
+                UserProgress.objects.filter(id__in=to_delete).delete()
+            if merged:
+                UserProgress.objects.bulk_update(
+                    merged.values(),
+                    ['exercise', 'attempts', 'correct', 'completed', 'last_attempt'],
+                    batch_size=self.batch_size
+                )
+            self.stats['progress_merged'] += len(to_delete)
+
+            # 3. Eliminar duplicados (ya sin referencias)
+            Exercise.objects.filter(id__in=duplicate_ids).delete()
+
+    # ------------------------------------------------------------------
+    # Purga por retención
+    # ------------------------------------------------------------------
+
+    def _purge(self, cutoff, last_id):
+        self.stdout.write(self.style.NOTICE(f'Purgando ejercicios sin responder anteriores a {cutoff:%Y-%m-%d %H:%M}...'))
+
+        never_answered = Exercise.objects.filter(created_at__lt=cutoff).filter(
+            ~Exists(UserProgress.objects.filter(exercise=OuterRef('pk'))),
+            ~Exists(ExerciseSessionLog.objects.filter(exercise=OuterRef('pk'), is_completed=True)),
+        )
+
+        while True:
+            ids = list(
+                never_answered.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:self.batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            # En simulación los duplicados siguen en la tabla: no contarlos dos veces
+            ids = [pk for pk in ids if pk not in self.merged_ids]
+            batch = Exercise.objects.filter(id__in=ids)
+            size = batch.aggregate(
+                text=Sum(Length('question') + Length('answer'))
+            )['text'] or 0
+            self.stats['bytes_reclaimed'] += size + ROW_OVERHEAD_BYTES * len(ids)
+            self.stats['exercises_purged'] += len(ids)
+
+            logs = ExerciseSessionLog.objects.filter(exercise_id__in=ids)
+            if self.dry_run:
+                self.stats['logs_purged'] += logs.count()
+            else:
+                with transaction.atomic():
+                    self.stats['logs_purged'] += logs.delete()[0]
+                    batch.delete()
+
+            self._save_checkpoint({'phase': 'purge', 'last_id': last_id})
+            self.stdout.write(f'  Lote purgado hasta el ejercicio {last_id} '
+                              f'({self.stats["exercises_purged"]} ejercicios)')
+
+    # ------------------------------------------------------------------
+    # Utilidades
+    # ------------------------------------------------------------------
+
+    def _save_checkpoint(self, checkpoint):
+        if not self.dry_run:
+            cache.set(CHECKPOINT_KEY, checkpoint, timeout=None)
+
+    def _row_size(self, row):
+        size = ROW_OVERHEAD_BYTES + len(row['question'] or '') + len(row['answer'] or '')
+        for field in ('distractors', 'metadata'):
+            if row[field] is not None:
+                size += len(json.dumps(row[field]))
+        return size
+
+    def _report(self):
+        title = 'Reporte (simulación)' if self.dry_run else 'Reporte de compactación'
+        self.stdout.write(self.style.SUCCESS(f'\n{title}'))
+        self.stdout.write(f"  Grupos duplicados:        {self.stats['duplicate_groups']}")
+        self.stdout.write(f"  Ejercicios fusionados:    {self.stats['exercises_merged']}")
+        self.stdout.write(f"  Progresos fusionados:     {self.stats['progress_merged']}")
+        self.stdout.write(f"  Logs de sesión re-apuntados: {self.stats['logs_repointed']}")
+        self.stdout.write(f"  Ejercicios purgados:      {self.stats['exercises_purged']}")
+        self.stdout.write(f"  Logs de sesión purgados:  {self.stats['logs_purged']}")
+        self.stdout.write(f"  Espacio recuperado (aprox.): {self._format_bytes(self.stats['bytes_reclaimed'])}")
+
+    @staticmethod
+    def _format_bytes(size):
+        for unit in ('B', 'KB', 'MB', 'GB'):
+            if size < 1024:
+                return f'{size:.1f} {unit}'
+            size /= 1024
+        return f'{size:.1f} TB'
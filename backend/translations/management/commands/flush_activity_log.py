@@ -0,0 +1,36 @@
+# translations/management/commands/flush_activity_log.py
+from django.core.management.base import BaseCommand
+
+from translations.services import activity_log
+
+
+class Command(BaseCommand):
+    """
+    Inserta en la base los registros de actividad que quedaron en la lista de
+    Redis (lotes rechazados por la base o workers reciclados con eventos
+    pendientes). Los workers también la vacían en cada flush; este comando
+    sirve para un cron o después de un despliegue.
+    """
+
+    help = 'Vacía la lista de Redis con registros de actividad pendientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Registros por lote (default: 1000)')
+        parser.add_argument('--max-batches', type=int, default=0,
+                            help='Detenerse tras N lotes (default: 0, hasta vaciar la lista)')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        total = 0
+        batches = 0
+        while True:
+            inserted = activity_log.flush(drain_limit=batch_size)
+            if not inserted:
+                break
+            total += inserted
+            batches += 1
+            if options['max_batches'] and batches >= options['max_batches']:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f'Registros de actividad guardados: {total}'))
@@ -0,0 +1,28 @@
+# translations/management/commands/flush_daily_goals.py
+from django.core.management.base import BaseCommand
+
+from translations.services import daily_goals
+
+
+class Command(BaseCommand):
+    """
+    Vuelca a DailyGoal las metas diarias pendientes en Redis. Los workers lo
+    hacen cada DAILY_GOAL_FLUSH_INTERVAL segundos; este comando sirve para un
+    cron o antes de apagar Redis.
+    """
+
+    help = 'Vuelca a la base los contadores de metas diarias guardados en Redis'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Metas por lote (default: 500)')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            flushed = daily_goals.flush(limit=max(1, options['batch_size']))
+            if not flushed:
+                break
+            total += flushed
+
+        self.stdout.write(self.style.SUCCESS(f'Metas diarias volcadas: {total}'))
@@ -0,0 +1,36 @@
+# translations/management/commands/llm_standin.py
+from django.core.management.base import BaseCommand
+
+from translations.services.llm_standin import StandinServer, add_standin_arguments, config_from_options
+
+
+class Command(BaseCommand):
+    """
+    Levanta un servidor local que reemplaza a la API de OpenAI reproduciendo
+    respuestas grabadas. Para usarlo desde el backend:
+
+        OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=standin python manage.py runserver
+    """
+
+    help = 'Servidor local que imita la API de OpenAI para benchmarks y pruebas de carga'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Interfaz (default: 127.0.0.1)')
+        parser.add_argument('--port', type=int, default=8765, help='Puerto (default: 8765)')
+        add_standin_arguments(parser)
+
+    def handle(self, *args, **options):
+        config = config_from_options(options)
+        server = StandinServer(config, host=options['host'], port=options['port'])
+
+        self.stdout.write(self.style.SUCCESS(f'LLM stand-in escuchando en {server.base_url}'))
+        self.stdout.write(f'  Configuración: {config.describe()}')
+        self.stdout.write(f'  Usa OPENAI_BASE_URL={server.base_url} (cualquier OPENAI_API_KEY no vacía)')
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f'\nPeticiones atendidas: {config.counters}')
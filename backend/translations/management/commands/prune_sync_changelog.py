@@ -0,0 +1,26 @@
+# translations/management/commands/prune_sync_changelog.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from translations.services import sync
+
+
+class Command(BaseCommand):
+    """
+    Borra las entradas viejas de ChangeLog. Un cliente con un cursor anterior
+    a lo borrado recibe el estado completo en su siguiente sincronización.
+    """
+
+    help = 'Borra las entradas de ChangeLog fuera de la retención'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=None,
+                            help='Días de cambios a conservar (default: SYNC_CHANGELOG_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        retention_days = options['retention_days'] or settings.SYNC_CHANGELOG_RETENTION_DAYS
+        rows = sync.prune(timezone.now() - timedelta(days=retention_days))
+        self.stdout.write(self.style.SUCCESS(f'Entradas de ChangeLog borradas: {rows}'))
@@ -0,0 +1,47 @@
+# translations/management/commands/reap_stale_sessions.py
+from django.core.management.base import BaseCommand
+
+from translations.services import session_reaper, session_state
+
+
+class Command(BaseCommand):
+    """
+    Cierra las sesiones de ejercicio que quedaron abiertas porque el usuario
+    cerró la app: completa las que tienen todo respondido y abandona (con
+    penalización) el resto. Pensado para un cron; con
+    STALE_SESSION_SWEEP_INTERVAL > 0 los workers también lo hacen.
+    """
+
+    help = 'Cierra o abandona sesiones de ejercicio abiertas y vencidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Sesiones por lote (default: STALE_SESSION_BATCH)')
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Lotes por barrido (default: STALE_SESSION_MAX_BATCHES)')
+        parser.add_argument('--older-than', type=int, default=None,
+                            help='Segundos desde el inicio para considerarla vencida (default: STALE_SESSION_AFTER)')
+        parser.add_argument('--flush-state', action='store_true',
+                            help='Volcar antes el estado en Redis de todas las sesiones en curso')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo informar cuántas sesiones vencidas hay')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            backlog = session_reaper.stale_sessions(options['older_than']).count()
+            self.stdout.write(f'Sesiones vencidas pendientes: {backlog}')
+            return
+
+        if options['flush_state']:
+            flushed = session_state.flush_active(options['batch_size'])
+            self.stdout.write(f'Sesiones volcadas desde Redis: {flushed}')
+
+        report = session_reaper.sweep(
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+            older_than=options['older_than'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Sesiones completadas: {report['completed']}, abandonadas: {report['abandoned']}, "
+            f"con error: {report['failed']}, pendientes: {report['backlog']} ({report['duration']}s)"
+        ))
@@ -0,0 +1,41 @@
+# translations/management/commands/reconcile_star_histogram.py
+from django.core.management.base import BaseCommand
+
+from translations.models import UserProfile
+from translations.services import star_histogram
+
+
+class Command(BaseCommand):
+    """
+    Verifica el histograma de estrellas de los perfiles contra UserVocabulary.
+    Las escrituras mantienen los contadores al día; esto detecta (y con --fix
+    corrige) desfases por cambios hechos fuera de la aplicación.
+    """
+
+    help = 'Compara el histograma de estrellas de los perfiles con el vocabulario'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Corregir los perfiles con diferencias')
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Id de usuario (repetible; default: todos)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Perfiles por lote (default: 500)')
+
+    def handle(self, *args, **options):
+        user_ids = options['users'] or list(
+            UserProfile.objects.order_by('user_id').values_list('user_id', flat=True)
+        )
+        batch_size = max(1, options['batch_size'])
+
+        mismatched = 0
+        for start in range(0, len(user_ids), batch_size):
+            mismatches = star_histogram.reconcile(user_ids[start:start + batch_size], fix=options['fix'])
+            for user_id, diff in mismatches.items():
+                detail = ', '.join(f'{field}: {stored} → {actual}' for field, (stored, actual) in diff.items())
+                self.stdout.write(f'Usuario {user_id}: {detail}')
+            mismatched += len(mismatches)
+
+        action = 'corregidos' if options['fix'] else 'con diferencias'
+        style = self.style.WARNING if mismatched and not options['fix'] else self.style.SUCCESS
+        self.stdout.write(style(f'Perfiles revisados: {len(user_ids)}, {action}: {mismatched}'))
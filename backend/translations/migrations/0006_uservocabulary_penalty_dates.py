@@ -0,0 +1,61 @@
+from django.db import migrations, models
+from django.db.models import Max
+from django.db.models.functions import TruncDate
+
+BATCH_SIZE = 1000
+
+
+def backfill_penalty_dates(apps, schema_editor):
+    """Última degradación y último abandono de cada palabra, tomados de ActivityLog"""
+    ActivityLog = apps.get_model('translations', 'ActivityLog')
+    UserVocabulary = apps.get_model('translations', 'UserVocabulary')
+
+    for activity_type, field in (('mastery_decreased', 'last_degraded_on'),
+                                 ('exercise_abandoned', 'last_abandoned_on')):
+        # TruncDate usa la zona horaria actual (TIME_ZONE): misma fecha local que la app
+        last_dates = ActivityLog.objects.filter(
+            activity_type=activity_type, word_learned__isnull=False
+        ).values('user_id', 'word_learned').annotate(last=Max(TruncDate('timestamp')))
+
+        pending = {}
+        for row in last_dates.iterator():
+            pending[(row['user_id'], row['word_learned'])] = row['last']
+            if len(pending) >= BATCH_SIZE:
+                _apply_dates(UserVocabulary, field, pending)
+                pending = {}
+        _apply_dates(UserVocabulary, field, pending)
+
+
+def _apply_dates(UserVocabulary, field, dates):
+    if not dates:
+        return
+    users = {user_id for user_id, _ in dates}
+    words = {word for _, word in dates}
+    vocabs = []
+    for vocab in UserVocabulary.objects.filter(user_id__in=users, quechua_word__in=words):
+        last = dates.get((vocab.user_id, vocab.quechua_word))
+        if last is not None:
+            setattr(vocab, field, last)
+            vocabs.append(vocab)
+    UserVocabulary.objects.bulk_update(vocabs, [field], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translations', '0005_uservocabulary_previous_mastery_level'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uservocabulary',
+            name='last_abandoned_on',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='uservocabulary',
+            name='last_degraded_on',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_penalty_dates, migrations.RunPython.noop),
+    ]
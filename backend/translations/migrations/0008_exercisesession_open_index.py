@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translations', '0007_activitylog_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='exercisesession',
+            index=models.Index(condition=models.Q(('is_abandoned', False), ('is_completed', False)), fields=['user', 'start_time'], name='open_session_user_start_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('translations', '0008_exercisesession_open_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('detections', models.IntegerField(default=0)),
+                ('exercises', models.IntegerField(default=0)),
+                ('correct_answers', models.IntegerField(default=0)),
+                ('abandonments', models.IntegerField(default=0)),
+                ('distinct_words', models.IntegerField(default=0)),
+                ('words', models.JSONField(blank=True, default=list)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:28
+
+from datetime import date
+
+from django.db import migrations, models
+
+TABLE = 'translations_activitylog'
+LEGACY = 'translations_activitylog_legacy'
+SEQUENCE = 'translations_activitylog_part_id_seq'
+COLUMNS = 'id, user_id, activity_type, mode, category, word_learned, details, timestamp'
+MONTHS_AHEAD = 3
+
+
+def _next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_activity_log(apps, schema_editor):
+    """
+    PostgreSQL: convierte ActivityLog en una tabla particionada por mes en
+    timestamp (copia los datos existentes). La clave primaria pasa a ser
+    (id, timestamp), requisito de PostgreSQL; los ids siguen saliendo de una
+    secuencia. En otras bases no hace nada.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    execute = schema_editor.execute
+    execute(f'ALTER TABLE {TABLE} RENAME TO {LEGACY}')
+    execute(f'CREATE SEQUENCE {SEQUENCE}')
+    execute(f"SELECT setval('{SEQUENCE}', COALESCE((SELECT MAX(id) FROM {LEGACY}), 0) + 1, false)")
+    execute(f"""
+        CREATE TABLE {TABLE} (
+            id bigint NOT NULL DEFAULT nextval('{SEQUENCE}'),
+            user_id integer NOT NULL REFERENCES auth_user (id) DEFERRABLE INITIALLY DEFERRED,
+            activity_type varchar(50) NOT NULL,
+            mode varchar(20) NOT NULL,
+            category varchar(20) NULL,
+            word_learned varchar(100) NULL,
+            details jsonb NULL,
+            timestamp timestamp with time zone NOT NULL,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    execute(f'ALTER SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id')
+    # Red de seguridad para filas fuera de las particiones mensuales
+    execute(f'CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT')
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN(timestamp) FROM {LEGACY}')
+        oldest = cursor.fetchone()[0]
+    today = date.today()
+    month = date(oldest.year, oldest.month, 1) if oldest else date(today.year, today.month, 1)
+    last = date(today.year, today.month, 1)
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        upper = _next_month(month)
+        execute(
+            f"CREATE TABLE {TABLE}_p{month:%Y%m} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{upper.isoformat()} 00:00:00+00')"
+        )
+        month = upper
+
+    execute(f'INSERT INTO {TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM {LEGACY}')
+    execute(f'DROP TABLE {LEGACY}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translations', '0009_userdailyactivity'),
+    ]
+
+    operations = [
+        # Primero la partición: los índices se crean luego en la tabla particionada
+        migrations.RunPython(partition_activity_log, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['user', 'activity_type', 'mode'], name='actlog_user_type_mode_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['user', 'activity_type', 'word_learned', 'timestamp'], name='actlog_user_type_word_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['user', 'timestamp'], name='actlog_user_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['timestamp'], name='actlog_ts_idx'),
+        ),
+    ]
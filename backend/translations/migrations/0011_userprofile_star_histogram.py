@@ -0,0 +1,71 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:33
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_star_histogram(apps, schema_editor):
+    """Carga inicial del histograma desde UserVocabulary"""
+    UserProfile = apps.get_model('translations', 'UserProfile')
+    UserVocabulary = apps.get_model('translations', 'UserVocabulary')
+
+    counts = {}
+    for row in UserVocabulary.objects.values('user_id', 'mastery_level').annotate(n=Count('id')).order_by():
+        fields = counts.setdefault(row['user_id'], {})
+        field = f"vocab_stars_{max(min(row['mastery_level'], 5), 0)}"
+        fields[field] = fields.get(field, 0) + row['n']
+        fields['vocab_total'] = fields.get('vocab_total', 0) + row['n']
+
+    profiles = list(UserProfile.objects.filter(user_id__in=counts))
+    for profile in profiles:
+        for field, value in counts[profile.user_id].items():
+            setattr(profile, field, value)
+    UserProfile.objects.bulk_update(
+        profiles, ['vocab_total'] + [f'vocab_stars_{level}' for level in range(6)], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translations', '0010_activitylog_indexes_partitioning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='vocab_stars_0',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='vocab_stars_1',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='vocab_stars_2',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='vocab_stars_3',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='vocab_stars_4',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='vocab_stars_5',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='vocab_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_star_histogram, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:36
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def fill_origin(apps, schema_editor):
+    """
+    Palabras existentes: 'detection' si tienen una sesión de detección (el
+    criterio que usaba el listado), si no 'exercise' (agregadas al responder).
+    """
+    UserVocabulary = apps.get_model('translations', 'UserVocabulary')
+    ActivityLog = apps.get_model('translations', 'ActivityLog')
+    detected = ActivityLog.objects.filter(
+        user_id=OuterRef('user_id'), activity_type='detection_session',
+        mode='detection', word_learned=OuterRef('quechua_word')
+    )
+    UserVocabulary.objects.annotate(detected=Exists(detected)).filter(detected=True).update(origin='detection')
+    UserVocabulary.objects.exclude(origin='detection').update(origin='exercise')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translations', '0011_userprofile_star_histogram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uservocabulary',
+            name='origin',
+            field=models.CharField(choices=[('detection', 'Detección'), ('exercise', 'Ejercicio'), ('manual', 'Manual')], default='manual', max_length=20),
+        ),
+        migrations.RunPython(fill_origin, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='uservocabulary',
+            index=models.Index(fields=['user', 'origin', '-last_detected'], name='uservocab_user_origin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uservocabulary',
+            index=models.Index(fields=['user', '-last_detected', '-id'], name='uservocab_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uservocabulary',
+            index=models.Index(fields=['user', 'mastery_level', '-last_detected', '-id'], name='uservocab_user_mastery_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uservocabulary',
+            index=models.Index(fields=['user', 'spanish_word', 'id'], name='uservocab_user_alpha_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translations', '0013_changelog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exercisesession',
+            name='redis_answers',
+            field=models.IntegerField(default=0),
+        ),
+    ]
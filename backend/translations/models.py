@@ -1,12 +1,16 @@
 #translations\models.py
 
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models.functions import Least
+from django.db.models.lookups import GreaterThan, GreaterThanOrEqual
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 import random
 
+from .db import update_returning
+
 # Modelo principal
 class ObjectTranslation(models.Model):
     english_label = models.CharField(max_length=100, unique=True, db_index=True)
@@ -27,6 +31,12 @@ class ObjectTranslation(models.Model):
     def __str__(self):
         return f"{self.english_label} - {self.spanish} - {self.quechua}"
 
+@receiver(post_save, sender=ObjectTranslation)
+@receiver(post_delete, sender=ObjectTranslation)
+def bump_dictionary_version(sender, **kwargs):
+    from .services import conditional
+    conditional.bump_table('object_translation')
+
 # ACTUALIZADO - UserProfile para nuevo sistema
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -36,6 +46,15 @@ class UserProfile(models.Model):
     mastered_words = models.IntegerField(default=0)
     current_level = models.IntegerField(default=1)  # 1-10
     
+    # Histograma de estrellas del vocabulario (ver services/star_histogram.py)
+    vocab_total = models.IntegerField(default=0)
+    vocab_stars_0 = models.IntegerField(default=0)
+    vocab_stars_1 = models.IntegerField(default=0)
+    vocab_stars_2 = models.IntegerField(default=0)
+    vocab_stars_3 = models.IntegerField(default=0)
+    vocab_stars_4 = models.IntegerField(default=0)
+    vocab_stars_5 = models.IntegerField(default=0)
+    
     # Mantener campos útiles
     streak_days = models.IntegerField(default=0)
     last_activity = models.DateField(null=True, blank=True)
@@ -46,9 +65,24 @@ class UserProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Solo se escriben con UPDATE ... F() (o la reconciliación)
+    VOCAB_HISTOGRAM_FIELDS = [
+        'vocab_total', 'vocab_stars_0', 'vocab_stars_1', 'vocab_stars_2',
+        'vocab_stars_3', 'vocab_stars_4', 'vocab_stars_5',
+    ]
+
     def __str__(self):
         return f"{self.user.username}'s profile"
     
+    def save(self, *args, **kwargs):
+        """Un save() con la instancia desactualizada no pisa el histograma de estrellas"""
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.VOCAB_HISTOGRAM_FIELDS
+            ]
+        super().save(*args, **kwargs)
+    
     def get_level_title(self):
         """Devuelve el título según el nivel"""
         titles = {
@@ -65,28 +99,57 @@ class UserProfile(models.Model):
         }
         return titles.get(self.current_level, "Principiante")
     
-    def update_level(self):
-        """Actualiza el nivel basado en palabras totales y calidad"""
-        # Umbral de palabras reequilibrado para mejor progresión
-        thresholds = [0, 15, 35, 60, 100, 150, 225, 325, 450, 600]
-        
-        # Calcular bonus por dominio de palabras
-        mastery_bonus = 0
-        if self.total_words > 0:
-            mastery_percent = self.mastered_words / self.total_words
-            if mastery_percent >= 0.7:  # 70% o más palabras dominadas
-                mastery_bonus = 1  # Bonus de nivel por buen dominio
-        
+    # Umbral de palabras reequilibrado para mejor progresión (nivel = índice + 1)
+    LEVEL_THRESHOLDS = [0, 15, 35, 60, 100, 150, 225, 325, 450, 600]
+    # Bonus de un nivel con 70% o más de palabras dominadas
+    MASTERY_BONUS_PERCENT = 70
+    MAX_LEVEL = 10
+    
+    @classmethod
+    def level_for(cls, total_words, mastered_words):
+        """Nivel que corresponde a los contadores (misma regla que level_expression)"""
         # Determinar nivel base por cantidad
         base_level = 1
-        for i, threshold in enumerate(thresholds):
-            if self.total_words >= threshold:
+        for i, threshold in enumerate(cls.LEVEL_THRESHOLDS):
+            if total_words >= threshold:
                 base_level = i + 1
             else:
                 break
         
+        # Calcular bonus por dominio de palabras
+        mastery_bonus = 0
+        if total_words > 0 and mastered_words * 100 >= total_words * cls.MASTERY_BONUS_PERCENT:
+            mastery_bonus = 1
+        
         # Aplicar bonus de maestría (limitado a nivel 10)
-        final_level = min(10, base_level + mastery_bonus)
+        return min(cls.MAX_LEVEL, base_level + mastery_bonus)
+    
+    @classmethod
+    def level_expression(cls, total_words, mastered_words):
+        """CASE SQL de level_for sobre dos expresiones (p. ej. F('total_words') + 1)"""
+        base_level = models.Case(
+            *[models.When(GreaterThanOrEqual(total_words, threshold), then=models.Value(i + 1))
+              for i, threshold in reversed(list(enumerate(cls.LEVEL_THRESHOLDS)))],
+            default=models.Value(1),
+        )
+        mastery_bonus = models.Case(
+            models.When(
+                GreaterThan(total_words, 0),
+                then=models.Case(
+                    models.When(
+                        GreaterThanOrEqual(mastered_words * 100, total_words * cls.MASTERY_BONUS_PERCENT),
+                        then=models.Value(1),
+                    ),
+                    default=models.Value(0),
+                ),
+            ),
+            default=models.Value(0),
+        )
+        return Least(base_level + mastery_bonus, models.Value(cls.MAX_LEVEL))
+    
+    def update_level(self):
+        """Actualiza el nivel basado en palabras totales y calidad"""
+        final_level = self.level_for(self.total_words, self.mastered_words)
         
         # Solo actualizar si hay cambio
         if self.current_level != final_level:
@@ -96,32 +159,81 @@ class UserProfile(models.Model):
             
             # Si subió de nivel, registrar evento
             if final_level > old_level:
-                ActivityLog.objects.create(
-                    user=self.user,
-                    activity_type='level_up',
-                    details={
-                        'previous_level': old_level,
-                        'new_level': final_level,
-                        'with_mastery_bonus': mastery_bonus > 0
-                    }
-                )
+                self._log_level_up(old_level, final_level)
             return True
         return False
     
+    def increment_counters(self, words=0, mastered=0):
+        """
+        Incrementa total_words/mastered_words y recalcula current_level en un solo
+        UPDATE atómico (sin perder incrementos con peticiones concurrentes).
+        Actualiza la instancia con los valores devueltos, otorga los logros de
+        vocabulario/dominio recién cruzados y devuelve el nivel.
+        """
+        if not words and not mastered:
+            return self.current_level
+        
+        total_words = models.F('total_words') + words
+        mastered_words = models.F('mastered_words') + mastered
+        values = {
+            'total_words': total_words,
+            'mastered_words': mastered_words,
+            'current_level': self.level_expression(total_words, mastered_words),
+            'updated_at': timezone.now(),
+        }
+        queryset = UserProfile.objects.filter(pk=self.pk)
+        returning = ('total_words', 'mastered_words', 'current_level')
+        with transaction.atomic(savepoint=False):
+            # Nivel que tenía la fila (puede haberlo cambiado el admin): bloqueada
+            # hasta el UPDATE para que un incremento concurrente no lo cambie
+            old_level = queryset.select_for_update().values_list('current_level', flat=True).first()
+            if old_level is None:
+                return self.current_level
+            if connections[queryset.db].features.can_return_columns_from_insert:
+                row = update_returning(queryset, values, returning)
+            else:
+                queryset.update(**values)
+                row = queryset.values(*returning).first()
+        
+        self.total_words = row['total_words']
+        self.mastered_words = row['mastered_words']
+        self.current_level = row['current_level']
+        
+        if self.current_level > old_level:
+            self._log_level_up(old_level, self.current_level)
+        
+        from .services import achievements
+        achievements.award_crossed(
+            self.user,
+            {'vocabulary': self.total_words - words, 'mastery': self.mastered_words - mastered},
+            {'vocabulary': self.total_words, 'mastery': self.mastered_words}
+        )
+        return self.current_level
+    
+    def _log_level_up(self, old_level, new_level):
+        from .services.activity_log import log_activity
+        log_activity(
+            self.user, 'level_up',
+            details={
+                'previous_level': old_level,
+                'new_level': new_level,
+                'with_mastery_bonus': self.total_words > 0 and (
+                    self.mastered_words * 100 >= self.total_words * self.MASTERY_BONUS_PERCENT
+                )
+            }
+        )
+    
     def add_word(self):
         """Incrementa el contador de palabras y actualiza nivel"""
-        self.total_words += 1
-        self.update_level()
-        self.save()
+        self.increment_counters(words=1)
     
     def add_mastered_word(self):
         """Incrementa el contador de palabras dominadas"""
-        self.mastered_words += 1
-        self.update_level()
-        self.save()
+        self.increment_counters(mastered=1)
     
     def update_streak(self):
         """Actualiza la racha de días consecutivos"""
+        previous_streak = self.streak_days
         today = timezone.now().date()
         if self.last_activity:
             days_diff = (today - self.last_activity).days
@@ -135,6 +247,10 @@ class UserProfile(models.Model):
         self.last_activity = today
         self.save()
 
+        if self.streak_days > previous_streak:
+            from .services import achievements
+            achievements.award_crossed(self.user, {'streak': previous_streak}, {'streak': self.streak_days})
+
 # Señales para crear perfil automáticamente
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -213,35 +329,17 @@ class Achievement(models.Model):
     
     @staticmethod
     def check_achievements(user):
-        """Verifica y asigna logros automáticamente"""
-        profile = user.profile
-        
-        # Logros por vocabulario
-        vocab_achievements = Achievement.objects.filter(type='vocabulary')
-        for achievement in vocab_achievements:
-            if profile.total_words >= achievement.requirement_value:
-                UserAchievement.objects.get_or_create(
-                    user=user,
-                    achievement=achievement
-                )
-        
-        # Logros por dominio
-        mastery_achievements = Achievement.objects.filter(type='mastery')
-        for achievement in mastery_achievements:
-            if profile.mastered_words >= achievement.requirement_value:
-                UserAchievement.objects.get_or_create(
-                    user=user,
-                    achievement=achievement
-                )
-        
-        # Logros por racha
-        streak_achievements = Achievement.objects.filter(type='streak')
-        for achievement in streak_achievements:
-            if profile.streak_days >= achievement.requirement_value:
-                UserAchievement.objects.get_or_create(
-                    user=user,
-                    achievement=achievement
-                )
+        """Verifica y asigna todos los logros que el usuario ya alcanza"""
+        from .services import achievements
+        achievements.award_all(user)
+
+
+@receiver(post_save, sender=Achievement)
+@receiver(post_delete, sender=Achievement)
+def invalidate_achievement_catalogue(sender, **kwargs):
+    from .services import achievements, conditional
+    achievements.invalidate()
+    conditional.bump_table('achievement')
 
 class UserAchievement(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -268,7 +366,19 @@ class ActivityLog(models.Model):
     category = models.CharField(max_length=20, null=True, blank=True)
     word_learned = models.CharField(max_length=100, null=True, blank=True)  # Palabra aprendida
     details = models.JSONField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # default (no auto_now_add) para conservar la hora del evento al insertarlo en diferido
+    timestamp = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        # En PostgreSQL la tabla está particionada por mes en timestamp
+        # (migración 0010, services/log_partitions.py); los índices se crean en cada partición
+        indexes = [
+            models.Index(fields=['user', 'activity_type', 'mode'], name='actlog_user_type_mode_idx'),
+            models.Index(fields=['user', 'activity_type', 'word_learned', 'timestamp'],
+                         name='actlog_user_type_word_idx'),
+            models.Index(fields=['user', 'timestamp'], name='actlog_user_ts_idx'),
+            models.Index(fields=['timestamp'], name='actlog_ts_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.activity_type} - {self.timestamp}"
@@ -305,6 +415,13 @@ class UserVocabulary(models.Model):
     object_label = models.CharField(max_length=100)
     spanish_word = models.CharField(max_length=100)
     quechua_word = models.CharField(max_length=100)
+    # Cómo llegó la palabra al vocabulario (se fija al crearla)
+    ORIGIN_CHOICES = [
+        ('detection', 'Detección'),
+        ('exercise', 'Ejercicio'),
+        ('manual', 'Manual'),
+    ]
+    origin = models.CharField(max_length=20, choices=ORIGIN_CHOICES, default='manual')
     
     # Sistema de estrellas (1-5)
     mastery_level = models.IntegerField(default=1)  # 1-5 estrellas
@@ -319,16 +436,52 @@ class UserVocabulary(models.Model):
     last_detected = models.DateTimeField(auto_now=True)
     last_practiced = models.DateTimeField(null=True, blank=True)
     mastered_date = models.DateTimeField(null=True, blank=True)  # Cuando alcanza 5 estrellas
+    # Última penalización por día (fecha local): máximo una degradación y un abandono diarios
+    last_degraded_on = models.DateField(null=True, blank=True)
+    last_abandoned_on = models.DateField(null=True, blank=True)
+    
+    # Reglas del sistema de estrellas por modo (compartidas con services/answer_pipeline.py)
+    # Detección: umbrales más fáciles para el modo principal; práctica: más difíciles
+    MASTERY_THRESHOLDS = {
+        'detection': {2: 2, 3: 5, 4: 8, 5: 12},
+        'practice': {2: 3, 3: 7, 4: 12, 5: 18},
+    }
+    SUCCESS_RATE_THRESHOLDS = {'detection': 0.75, 'practice': 0.85}
+    CONSECUTIVE_FAILURES_LIMITS = {'detection': 3, 'practice': 2}
+    RECENT_WORD_DAYS = {'detection': 3, 'practice': 1}
+    MIN_EXERCISES_FOR_DEGRADATION = 5
+    # Fallos que suma abandonar un ejercicio
+    ABANDONMENT_FAILURES = {'detection': 1, 'practice': 2}
+    # Campos que cambia apply_abandonment (para bulk_update)
+    ABANDONMENT_FIELDS = [
+        'abandoned_exercises', 'previous_mastery_level', 'mastery_level',
+        'consecutive_failures', 'last_abandoned_on', 'last_degraded_on',
+    ]
     
     class Meta:
         verbose_name = "User Vocabulary"
         verbose_name_plural = "User Vocabularies"
         unique_together = ['user', 'quechua_word']
+        # Filtro por origen y órdenes del listado por cursor (services/vocabulary_listing.py)
+        indexes = [
+            models.Index(fields=['user', 'origin', '-last_detected'], name='uservocab_user_origin_idx'),
+            models.Index(fields=['user', '-last_detected', '-id'], name='uservocab_user_recent_idx'),
+            models.Index(fields=['user', 'mastery_level', '-last_detected', '-id'], name='uservocab_user_mastery_idx'),
+            models.Index(fields=['user', 'spanish_word', 'id'], name='uservocab_user_alpha_idx'),
+        ]
         
     def __str__(self):
         return f"{self.user.username} - {self.quechua_word} ({self.mastery_level}★)"
     
     # ✅ NUEVO: Método save() para normalización automática
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Nivel ya contado en el histograma de estrellas del perfil
+        if 'mastery_level' in instance.__dict__:
+            instance._counted_level = instance.mastery_level
+        return instance
+    
     def save(self, *args, **kwargs):
         """Normalizar palabras antes de guardar para evitar duplicados"""
         # Normalizar palabras
@@ -337,19 +490,60 @@ class UserVocabulary(models.Model):
         if self.spanish_word:
             self.spanish_word = self.spanish_word.strip()
         
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'mastery_level' not in update_fields:
+            super().save(*args, **kwargs)
+            return
+        
+        # Mover la palabra en el histograma de estrellas si cambió su nivel
+        before = None if self._state.adding else getattr(self, '_counted_level', self.mastery_level)
+        if before == self.mastery_level:
+            super().save(*args, **kwargs)
+        else:
+            from .services import star_histogram
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                star_histogram.shift([(self.user_id, before, self.mastery_level)])
+        self._counted_level = self.mastery_level
     
     def update_mastery(self, correct_answer, mode='practice'):
         """
         Actualiza el nivel de dominio diferenciando entre modos
         ✅ CORREGIDO: Agrega protecciones según el modo (detección vs práctica)
         """
+        mastery_info = self.apply_mastery_transition(correct_answer, mode)
+        
+        if mastery_info['reached_mastery']:
+            self.user.profile.add_mastered_word()
+        
+        if mastery_info['was_degraded']:
+            # Registrar el evento
+            from .services.activity_log import log_activity
+            log_activity(
+                self.user, 'mastery_decreased',
+                mode=mode,
+                word_learned=self.quechua_word,
+                details={
+                    'previous_level': self.previous_mastery_level,
+                    'new_level': self.mastery_level,
+                    'reason': 'consecutive_failures'
+                }
+            )
+        
+        self.save()
+        return mastery_info
+    
+    def apply_mastery_transition(self, correct_answer, mode='practice'):
+        """
+        Calcula la transición de estrellas en memoria, sin guardar ni registrar eventos
+        """
         self.exercises_completed += 1
         today = timezone.now().date()
         
         # Almacenar el nivel anterior para referencia
         self.previous_mastery_level = self.mastery_level
         was_degraded = False
+        reached_mastery = False
         
         # Verificar condiciones de protección
         is_recent_word = False
@@ -364,24 +558,9 @@ class UserVocabulary(models.Model):
             self.exercises_correct += 1
             
             # Definir umbrales específicos por modo
-            if mode == 'detection':
-                # Umbrales más fáciles para el modo principal
-                thresholds = {
-                    2: 2,  # 2 aciertos para 2 estrellas
-                    3: 5,  # 5 aciertos para 3 estrellas
-                    4: 8,  # 8 aciertos para 4 estrellas
-                    5: 12  # 12 aciertos para 5 estrellas (con 75% de precisión)
-                }
-                success_rate_threshold = 0.75  # 75% para detección
-            else:  # 'practice'
-                # Umbrales más difíciles para el modo secundario
-                thresholds = {
-                    2: 3,   # 3 aciertos para 2 estrellas (antes 2)
-                    3: 7,   # 7 aciertos para 3 estrellas (antes 5)
-                    4: 12,  # 12 aciertos para 4 estrellas (antes 8)
-                    5: 18   # 18 aciertos para 5 estrellas (antes 12)
-                }
-                success_rate_threshold = 0.85  # 85% para práctica
+            rules_mode = 'detection' if mode == 'detection' else 'practice'
+            thresholds = self.MASTERY_THRESHOLDS[rules_mode]
+            success_rate_threshold = self.SUCCESS_RATE_THRESHOLDS[rules_mode]
             
             # Sistema de progresión con umbrales específicos por modo
             if self.exercises_correct >= thresholds[5] and self.mastery_level < 5:
@@ -391,7 +570,7 @@ class UserVocabulary(models.Model):
                 if success_rate >= success_rate_threshold:
                     self.mastery_level = 5
                     self.mastered_date = timezone.now()
-                    self.user.profile.add_mastered_word()
+                    reached_mastery = True
             elif self.exercises_correct >= thresholds[4] and self.mastery_level < 4:
                 self.mastery_level = 4
             elif self.exercises_correct >= thresholds[3] and self.mastery_level < 3:
@@ -402,23 +581,13 @@ class UserVocabulary(models.Model):
             # Incrementar contador de fallos consecutivos
             self.consecutive_failures += 1
             
-            # Definir umbrales según el modo
-            if mode == 'detection':
-                # Más permisivo en modo detección
-                consecutive_failures_limit = 3
-                mastery_protected_days = 3  # Protección para palabras nuevas
-            else:  # 'practice'
-                # Más estricto en modo práctica
-                consecutive_failures_limit = 2
-                mastery_protected_days = 1  # Menor protección
+            # Definir umbrales según el modo (más permisivo en detección)
+            consecutive_failures_limit = self.CONSECUTIVE_FAILURES_LIMITS[
+                'detection' if mode == 'detection' else 'practice'
+            ]
             
             # Verificar condiciones antes de degradar
-            degraded_today = ActivityLog.objects.filter(
-                user=self.user,
-                activity_type='mastery_decreased',
-                word_learned=self.quechua_word,
-                timestamp__date=today
-            ).exists()
+            degraded_today = self.last_degraded_on == timezone.localdate()
             
             if (self.consecutive_failures >= consecutive_failures_limit and  # Límite de fallos
                 self.mastery_level > 1 and                                  # Nivel superior a 1
@@ -428,20 +597,8 @@ class UserVocabulary(models.Model):
                 
                 # Aplicar pérdida de nivel
                 self.mastery_level -= 1
+                self.last_degraded_on = timezone.localdate()
                 was_degraded = True
-                
-                # Registrar el evento
-                ActivityLog.objects.create(
-                    user=self.user,
-                    activity_type='mastery_decreased',
-                    mode=mode,
-                    word_learned=self.quechua_word,
-                    details={
-                        'previous_level': self.previous_mastery_level,
-                        'new_level': self.mastery_level,
-                        'reason': 'consecutive_failures'
-                    }
-                )
         
         # CORREGIDO: Solo resetear el contador si hubo degradación o respuesta correcta
         if was_degraded or correct_answer:
@@ -456,13 +613,13 @@ class UserVocabulary(models.Model):
             self.mastery_level = max(min(self.mastery_level, 5), 0)
         
         self.last_practiced = timezone.now()
-        self.save()
         
         # Retornar información sobre cambios en nivel para el frontend
         return {
             'previous_level': self.previous_mastery_level,
             'current_level': self.mastery_level,
             'was_degraded': was_degraded,
+            'reached_mastery': reached_mastery,
             'is_recent_word': is_recent_word,
             'is_minimally_practiced': is_minimally_practiced,
             'consecutive_failures': self.consecutive_failures,
@@ -473,49 +630,49 @@ class UserVocabulary(models.Model):
         """
         Registra y penaliza el abandono de ejercicios
         """
+        penalty = self.apply_abandonment(mode)
+        if penalty is None:
+            return False
+        
+        from .services.activity_log import log_activities
+        log_activities(penalty['events'])
+        self.save()
+        return penalty['was_degraded']
+    
+    def apply_abandonment(self, mode='practice'):
+        """
+        Calcula la penalización por abandono en memoria, sin guardar. Devuelve
+        {'was_degraded', 'events'} con los ActivityLog por registrar, o None si
+        la palabra ya se penalizó hoy por abandono.
+        """
+        # Evitar penalizar múltiples veces en el mismo día
+        local_today = timezone.localdate()
+        if self.last_abandoned_on == local_today:
+            return None
+        self.last_abandoned_on = local_today
         self.abandoned_exercises += 1
-        today = timezone.now().date()
+        rules_mode = 'detection' if mode == 'detection' else 'practice'
         
         # Guardar nivel anterior para referencia
         self.previous_mastery_level = self.mastery_level
         was_degraded = False
+        events = []
         
-        # Evitar penalizar múltiples veces en el mismo día
-        abandoned_today = ActivityLog.objects.filter(
-            user=self.user,
-            activity_type='exercise_abandoned',
-            word_learned=self.quechua_word,
-            timestamp__date=today
-        ).exists()
-        
-        if abandoned_today:
-            return False
-        
-        # Determinar penalización según el modo
-        if mode == 'detection':
-            # En modo detección, contar como un fallo
-            self.consecutive_failures += 1
-        else:  # 'practice'
-            # En modo práctica, contar como dos fallos
-            self.consecutive_failures += 2
+        # Determinar penalización según el modo (detección: un fallo; práctica: dos)
+        self.consecutive_failures += self.ABANDONMENT_FAILURES[rules_mode]
         
         # Verificar si acumuló suficientes fallos para degradar
         is_recent_word = False
         if self.first_detected:
-            days_since_added = (today - self.first_detected.date()).days
-            is_recent_word = days_since_added <= (3 if mode == 'detection' else 1)
+            days_since_added = (timezone.now().date() - self.first_detected.date()).days
+            is_recent_word = days_since_added <= self.RECENT_WORD_DAYS[rules_mode]
         
-        is_minimally_practiced = self.exercises_completed >= 5
+        is_minimally_practiced = self.exercises_completed >= self.MIN_EXERCISES_FOR_DEGRADATION
         
         # Definir límite según modo
-        consecutive_failures_limit = 3 if mode == 'detection' else 2
+        consecutive_failures_limit = self.CONSECUTIVE_FAILURES_LIMITS[rules_mode]
         
-        degraded_today = ActivityLog.objects.filter(
-            user=self.user,
-            activity_type='mastery_decreased',
-            word_learned=self.quechua_word,
-            timestamp__date=today
-        ).exists()
+        degraded_today = self.last_degraded_on == local_today
         
         if (self.consecutive_failures >= consecutive_failures_limit and
             self.mastery_level > 1 and
@@ -525,11 +682,12 @@ class UserVocabulary(models.Model):
             
             # Aplicar pérdida de nivel
             self.mastery_level -= 1
+            self.last_degraded_on = local_today
             was_degraded = True
             
             # Registrar evento de degradación
-            ActivityLog.objects.create(
-                user=self.user,
+            events.append(ActivityLog(
+                user_id=self.user_id,
                 activity_type='mastery_decreased',
                 mode=mode,
                 word_learned=self.quechua_word,
@@ -538,7 +696,7 @@ class UserVocabulary(models.Model):
                     'new_level': self.mastery_level,
                     'reason': 'abandonment'
                 }
-            )
+            ))
             
             # CORREGIDO: Solo resetear contador si hubo degradación
             self.consecutive_failures = 0
@@ -552,8 +710,8 @@ class UserVocabulary(models.Model):
             self.mastery_level = max(min(self.mastery_level, 5), 0)
         
         # Registrar evento de abandono
-        ActivityLog.objects.create(
-            user=self.user,
+        events.append(ActivityLog(
+            user_id=self.user_id,
             activity_type='exercise_abandoned',
             mode=mode,
             word_learned=self.quechua_word,
@@ -562,10 +720,9 @@ class UserVocabulary(models.Model):
                 'mastery_level': self.mastery_level,
                 'was_degraded': was_degraded
             }
-        )
+        ))
         
-        self.save()
-        return was_degraded
+        return {'was_degraded': was_degraded, 'events': events}
 
 # NUEVO - Modelo para registro de sesiones de ejercicio
 class ExerciseSession(models.Model):
@@ -577,6 +734,19 @@ class ExerciseSession(models.Model):
     mode = models.CharField(max_length=20, choices=ActivityLog.MODE_CHOICES, default='detection')
     exercises_total = models.IntegerField(default=0)
     exercises_completed = models.IntegerField(default=0)
+    # Respuestas registradas en Redis ya sumadas a exercises_completed
+    # (el volcado de services/session_state.py suma solo la diferencia)
+    redis_answers = models.IntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            # Solo sesiones abiertas: las que revisa el barrido de sesiones vencidas
+            models.Index(
+                fields=['user', 'start_time'],
+                condition=models.Q(is_completed=False, is_abandoned=False),
+                name='open_session_user_start_idx'
+            )
+        ]
     
     def __str__(self):
         status = "en progreso"
@@ -593,22 +763,105 @@ class ExerciseSession(models.Model):
         self.save()
     
     def mark_abandoned(self):
-        """Marca la sesión como abandonada y penaliza"""
-        self.is_abandoned = True
-        self.end_time = timezone.now()
-        self.save()
-        
-        # Penalizar palabras involucradas
-        for exercise_log in self.exercise_logs.all():
-            word = exercise_log.exercise.object_translation.quechua
-            try:
-                vocab = UserVocabulary.objects.get(
-                    user=self.user,
-                    quechua_word=word
+        """
+        Marca la sesión como abandonada y penaliza, en bloque: una consulta para
+        las palabras de la sesión, otra para el vocabulario, un bulk_update y un
+        solo INSERT de eventos.
+        """
+        from .services import abandonment, session_state, star_histogram, sync, user_cache
+        from .services.activity_log import log_activities
+        
+        with transaction.atomic():
+            # Avances que aún estén en Redis
+            session_state.flush([self.id])
+            self.end_time = timezone.now()
+            # Solo quien cierra la sesión penaliza (abandono manual vs. barrido de sesiones)
+            claimed = ExerciseSession.objects.filter(
+                id=self.id, is_completed=False, is_abandoned=False
+            ).update(is_abandoned=True, end_time=self.end_time)
+            self.is_abandoned = True
+            if not claimed:
+                return 0
+            
+            # Palabras involucradas, en el orden de la sesión y sin repetir
+            words = list(dict.fromkeys(
+                word.strip().lower()
+                for word in self.exercise_logs.order_by('id').values_list(
+                    'exercise__object_translation__quechua', flat=True
+                )
+                if word
+            ))
+            vocabs = {
+                vocab.quechua_word: vocab
+                for vocab in UserVocabulary.objects.select_for_update().filter(
+                    user_id=self.user_id, quechua_word__in=words
                 )
-                vocab.register_abandonment(self.mode)
-            except UserVocabulary.DoesNotExist:
-                pass
+            }
+            
+            # Penalizar palabras involucradas
+            changed = []
+            events = []
+            for word in words:
+                vocab = vocabs.get(word)
+                if vocab is None:
+                    continue
+                penalty = vocab.apply_abandonment(self.mode)
+                if penalty is not None:
+                    changed.append(vocab)
+                    events.extend(penalty['events'])
+            
+            if changed:
+                UserVocabulary.objects.bulk_update(changed, UserVocabulary.ABANDONMENT_FIELDS)
+                star_histogram.shift(star_histogram.vocabulary_transitions(changed))
+            sync.record([
+                (self.user_id, 'session', self.id, False),
+                *((self.user_id, 'vocabulary', vocab.id, False) for vocab in changed),
+            ])
+            log_activities(events)
+            abandonment.invalidate(self.id)
+            if changed:
+                user_cache.bump(self.user_id)
+        return len(changed)
+
+@receiver(post_delete, sender=UserVocabulary)
+def remove_from_star_histogram(sender, instance, **kwargs):
+    from .services import star_histogram
+    level = getattr(instance, '_counted_level', instance.mastery_level)
+    star_histogram.shift([(instance.user_id, level, None)])
+
+def _deleted_with_user(origin):
+    """Borrado en cascada desde el usuario: su ChangeLog se borra con él"""
+    return isinstance(origin, User) or getattr(origin, 'model', None) is User
+
+@receiver(post_save, sender=UserVocabulary)
+def record_vocabulary_change(sender, instance, **kwargs):
+    from .services import sync
+    sync.record([(instance.user_id, 'vocabulary', instance.id, False)])
+
+@receiver(post_delete, sender=UserVocabulary)
+def record_vocabulary_deletion(sender, instance, origin=None, **kwargs):
+    if not _deleted_with_user(origin):
+        from .services import sync
+        sync.record([(instance.user_id, 'vocabulary', instance.id, True)])
+
+@receiver(post_delete, sender=UserAchievement)
+def record_achievement_deletion(sender, instance, origin=None, **kwargs):
+    if not _deleted_with_user(origin):
+        from .services import sync
+        sync.record([(instance.user_id, 'achievement', instance.achievement_id, True)])
+
+@receiver(post_save, sender=ExerciseSession)
+def start_session_reaper(sender, instance, created, **kwargs):
+    if created:
+        from .services import session_reaper
+        session_reaper.ensure_scheduler()
+
+@receiver(post_save, sender=ExerciseSession)
+def record_closed_session(sender, instance, **kwargs):
+    # Los clientes sincronizan el resultado de las sesiones, no su avance
+    if instance.is_completed or instance.is_abandoned:
+        from .services import sync
+        sync.record([(instance.user_id, 'session', instance.id, False)])
 
 # NUEVO - Modelo para registro detallado de ejercicios en sesión
 class ExerciseSessionLog(models.Model):
@@ -624,6 +877,55 @@ class ExerciseSessionLog(models.Model):
         return f"Ejercicio {status} - {self.exercise}"
 
 # NUEVO - Modelo para metas diarias
+class DailyGoalManager(models.Manager):
+    def increment(self, user, date, detected=0, practiced=0, mastered=0):
+        """
+        Suma a los contadores de la meta del día en una sola sentencia:
+        INSERT ... ON CONFLICT (user_id, date) DO UPDATE ... RETURNING
+        (PostgreSQL y SQLite >= 3.35). Devuelve la meta actualizada.
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        columns = [field.column for field in self.model._meta.concrete_fields]
+        sql, params = self._increment_sql(connection, [(user.pk, date, detected, practiced, mastered)])
+        
+        if connection.features.can_return_columns_from_insert:
+            returning = ', '.join(qn(column) for column in columns)
+            return next(iter(self.raw(f"{sql} RETURNING {returning}", params)))
+        
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+        return self.get(user=user, date=date)
+    
+    def increment_many(self, rows):
+        """
+        Como increment, para varias metas en una sola sentencia.
+        rows: [(user_id, date, detected, practiced, mastered)], sin (user_id, date) repetidos.
+        """
+        if not rows:
+            return
+        connection = connections[self.db]
+        sql, params = self._increment_sql(connection, rows)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+    
+    def _increment_sql(self, connection, rows):
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        goals = [self.model._meta.get_field(name).default
+                 for name in ('detection_goal', 'practice_goal', 'mastery_goal')]
+        sql = (
+            f"INSERT INTO {table} (user_id, date, words_detected, words_practiced, words_mastered, "
+            f"detection_goal, practice_goal, mastery_goal) "
+            f"VALUES {', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(rows))} "
+            f"ON CONFLICT (user_id, date) DO UPDATE SET "
+            f"words_detected = {table}.words_detected + EXCLUDED.words_detected, "
+            f"words_practiced = {table}.words_practiced + EXCLUDED.words_practiced, "
+            f"words_mastered = {table}.words_mastered + EXCLUDED.words_mastered"
+        )
+        params = [value for row in rows for value in (*row, *goals)]
+        return sql, params
+
+
 class DailyGoal(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     date = models.DateField()
@@ -636,6 +938,8 @@ class DailyGoal(models.Model):
     practice_goal = models.IntegerField(default=5)   # Practicar 5 palabras
     mastery_goal = models.IntegerField(default=1)    # Dominar 1 palabra
     
+    objects = DailyGoalManager()
+    
     class Meta:
         unique_together = ('user', 'date')
         
@@ -646,4 +950,72 @@ class DailyGoal(models.Model):
         """Verifica si se completaron todas las metas"""
         return (self.words_detected >= self.detection_goal and
                 self.words_practiced >= self.practice_goal and
-                self.words_mastered >= self.mastery_goal)
\ No newline at end of file
+                self.words_mastered >= self.mastery_goal)
+
+@receiver(post_save, sender=DailyGoal)
+@receiver(post_delete, sender=DailyGoal)
+def discard_cached_daily_goal(sender, instance, **kwargs):
+    # Escritura directa (admin): la copia en Redis se vuelve a sembrar desde la base
+    from .services import daily_goals
+    daily_goals.discard([(instance.user_id, instance.date)])
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender=UserVocabulary)
+@receiver(post_delete, sender=UserVocabulary)
+@receiver(post_save, sender=UserAchievement)
+@receiver(post_delete, sender=UserAchievement)
+@receiver(post_save, sender=DailyGoal)
+@receiver(post_delete, sender=DailyGoal)
+def bump_user_cache(sender, instance, origin=None, **kwargs):
+    # Cualquier save()/delete() (el admin incluido) invalida las respuestas en caché
+    # y el ETag del usuario; las escrituras en bloque llaman a user_cache.bump
+    if not _deleted_with_user(origin):
+        from .services import user_cache
+        user_cache.bump(instance.user_id)
+
+# Resumen diario de actividad por usuario (se mantiene al escribir ActivityLog,
+# ver services/daily_activity.py)
+class UserDailyActivity(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    date = models.DateField()  # Fecha local (TIME_ZONE)
+    detections = models.IntegerField(default=0)       # detection_session
+    exercises = models.IntegerField(default=0)        # exercise_completed
+    correct_answers = models.IntegerField(default=0)  # exercise_completed con is_correct
+    abandonments = models.IntegerField(default=0)     # exercise_abandoned
+    distinct_words = models.IntegerField(default=0)
+    # Palabras del día (detecciones y ejercicios) para contar distintas al sumar
+    words = models.JSONField(default=list, blank=True)
+    
+    class Meta:
+        unique_together = ('user', 'date')
+        
+    def __str__(self):
+        return f"{self.user.username} - {self.date}"
+
+# Registro de cambios por usuario para la sincronización incremental de los
+# clientes sin conexión (ver services/sync.py)
+class ChangeLog(models.Model):
+    ENTITY_CHOICES = [
+        ('vocabulary', 'Vocabulario'),   # object_id: UserVocabulary.id
+        ('achievement', 'Logro'),        # object_id: Achievement.id
+        ('session', 'Sesión'),           # object_id: ExerciseSession.id
+    ]
+    
+    # Secuencia global y creciente: el cursor del cliente es el último id recibido
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    entity = models.CharField(max_length=20, choices=ENTITY_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        # Lectura de la sincronización: WHERE user_id = ? AND id > cursor ORDER BY id
+        indexes = [
+            models.Index(fields=['user', 'id'], name='changelog_user_seq_idx'),
+        ]
+        
+    def __str__(self):
+        action = "borrado" if self.deleted else "cambio"
+        return f"{self.user_id} - {self.entity} {self.object_id} ({action}) #{self.id}"
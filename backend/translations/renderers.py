@@ -0,0 +1,38 @@
+# translations/renderers.py
+"""
+Renderers de las respuestas en streaming (generate_by_label_stream).
+
+La vista devuelve un StreamingHttpResponse, así que estos renderers solo
+sirven para la negociación de contenido (Accept: text/event-stream,
+?format=sse / ?format=ndjson) y para los errores que se responden antes de
+empezar el stream, que salen como un evento 'error'.
+"""
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def encode_event(event, payload, sse=False):
+    """Un evento del stream: bloque SSE o línea NDJSON"""
+    if sse:
+        return f"event: {event}\ndata: {json.dumps(payload, cls=JSONEncoder)}\n\n"
+    return json.dumps({'event': event, **payload}, cls=JSONEncoder) + "\n"
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return encode_event('error', data if isinstance(data, dict) else {'error': data})
+
+
+class EventStreamRenderer(BaseRenderer):
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return encode_event('error', data if isinstance(data, dict) else {'error': data}, sse=True)
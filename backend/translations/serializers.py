@@ -98,14 +98,17 @@ class UserVocabularySerializer(serializers.ModelSerializer):
     class Meta:
         model = UserVocabulary
         fields = [
-            'id', 'object_label', 'spanish_word', 'quechua_word', 
+            'id', 'object_label', 'spanish_word', 'quechua_word', 'origin',
             'mastery_level', 'exercises_completed', 'exercises_correct',
             'times_detected', 'first_detected', 'last_detected',
             'last_practiced', 'mastered_date', 'days_since_practice'
         ]
-        read_only_fields = ('first_detected', 'last_detected', 'mastered_date')
+        read_only_fields = ('origin', 'first_detected', 'last_detected', 'mastered_date')
     
     def get_days_since_practice(self, obj):
+        # Calculado en SQL por el listado (services/vocabulary_listing.py)
+        if hasattr(obj, 'days_since_practice'):
+            return obj.days_since_practice
         if not obj.last_practiced:
             return None
         
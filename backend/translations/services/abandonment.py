@@ -0,0 +1,91 @@
+# translations/services/abandonment.py
+"""
+Vista previa de la penalización por abandonar una sesión.
+
+La app la pide cada vez que el usuario intenta salir de una sesión. El
+vocabulario afectado se obtiene con una sola consulta: las palabras de los
+ejercicios pendientes (log → ejercicio → traducción) se cruzan con el
+vocabulario del usuario por quechua_word. Las reglas son las mismas de
+UserVocabulary.apply_abandonment, evaluadas en memoria sin guardar. El
+resultado se guarda en caché por sesión y se invalida con cada respuesta de
+la sesión (submit_answer / submit_answers) y al abandonarla.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.functions import Lower, Trim
+
+from ..models import ExerciseSessionLog, UserVocabulary
+from . import session_state
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'abandonment_preview:{session_id}'
+
+
+def penalty_preview(session):
+    """Payload de check_abandonment_penalty para la sesión (desde caché si está)"""
+    key = CACHE_KEY.format(session_id=session.id)
+    preview = cache.get(key)
+    if preview is None:
+        preview = _build_preview(session)
+        cache.set(key, preview, settings.ABANDONMENT_PREVIEW_TTL)
+    return preview
+
+
+def invalidate(session_id):
+    """Descarta la vista previa de la sesión al confirmar la transacción en curso"""
+    if session_id:
+        key = CACHE_KEY.format(session_id=session_id)
+        transaction.on_commit(lambda: cache.delete(key))
+
+
+def _build_preview(session):
+    pending_words = ExerciseSessionLog.objects.filter(
+        session=session, is_completed=False
+    ).exclude(
+        # Respondidos en Redis, todavía sin volcar a la base
+        exercise_id__in=session_state.answered_exercise_ids(session.id)
+    ).annotate(
+        word=Lower(Trim('exercise__object_translation__quechua'))
+    ).values('word')
+
+    affected_words = []
+    for vocab in UserVocabulary.objects.filter(
+        user_id=session.user_id, quechua_word__in=pending_words, mastery_level__gt=1
+    ).order_by('quechua_word'):
+        current_level = vocab.mastery_level
+        # Simulación en memoria (no se guarda): mismas reglas que el abandono real
+        penalty = vocab.apply_abandonment(session.mode)
+        would_degrade = bool(penalty and penalty['was_degraded'])
+        affected_words.append({
+            'word': vocab.quechua_word,
+            'spanish': vocab.spanish_word,
+            'current_level': current_level,
+            'would_degrade': would_degrade,
+            'potential_new_level': vocab.mastery_level if would_degrade else current_level
+        })
+
+    # Construir mensaje de advertencia
+    warning_message = "Si abandonas esta sesión:"
+    if not affected_words:
+        warning_message += " No hay penalizaciones para palabras existentes."
+    else:
+        degrading_words = [word for word in affected_words if word['would_degrade']]
+        if degrading_words:
+            warning_message += f" {len(degrading_words)} palabra(s) podrían perder una estrella de dominio."
+        else:
+            warning_message += " Algunas palabras acumularán fallos, pero ninguna perderá estrellas en este momento."
+
+    rules_mode = 'detection' if session.mode == 'detection' else 'practice'
+    return {
+        'warning_message': warning_message,
+        'affected_words': affected_words,
+        'abandonment_consequence': {
+            'mode': session.mode,
+            'failure_penalty': UserVocabulary.ABANDONMENT_FAILURES[rules_mode],
+            'total_words_affected': len(affected_words)
+        }
+    }
@@ -0,0 +1,123 @@
+# translations/services/achievements.py
+"""
+Motor de logros incremental.
+
+El catálogo de logros se mantiene en memoria como umbrales ordenados por tipo.
+Con los valores de total_words, mastered_words y streak_days antes y después de
+un cambio, `bisect` encuentra solo los umbrales recién cruzados; si no se cruzó
+ninguno no se hace ninguna consulta. Los logros ganados se insertan con un solo
+bulk_create(ignore_conflicts=True), así que repetir un logro ya ganado es inofensivo.
+
+El catálogo se recarga cuando se guarda o elimina un Achievement (señales en
+models.py) y, para los demás procesos, al vencer ACHIEVEMENT_CATALOGUE_TTL.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_right
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from ..models import Achievement, UserAchievement
+from . import sync, user_cache
+
+logger = logging.getLogger(__name__)
+
+# Tipo de logro -> campo de UserProfile que lo desbloquea
+COUNTER_FIELDS = {
+    'vocabulary': 'total_words',
+    'mastery': 'mastered_words',
+    'streak': 'streak_days',
+}
+
+_lock = threading.Lock()
+_catalogue = None
+_loaded_at = 0.0
+
+
+def invalidate():
+    """Descarta el catálogo en memoria; se recarga en el siguiente uso"""
+    global _catalogue
+    with _lock:
+        _catalogue = None
+
+
+def catalogue():
+    """{tipo: (umbrales ordenados, ids alineados)} para los tipos con contador"""
+    global _catalogue, _loaded_at
+    ttl = getattr(settings, 'ACHIEVEMENT_CATALOGUE_TTL', 300)
+    current = _catalogue
+    if current is not None and time.monotonic() - _loaded_at < ttl:
+        return current
+
+    with _lock:
+        if _catalogue is None or time.monotonic() - _loaded_at >= ttl:
+            rows = Achievement.objects.filter(type__in=COUNTER_FIELDS).order_by(
+                'type', 'requirement_value', 'id'
+            ).values_list('type', 'requirement_value', 'id')
+            loaded = {kind: ([], []) for kind in COUNTER_FIELDS}
+            for kind, requirement, achievement_id in rows:
+                loaded[kind][0].append(requirement)
+                loaded[kind][1].append(achievement_id)
+            _catalogue = loaded
+            _loaded_at = time.monotonic()
+            logger.debug(f"🏆 Catálogo de logros cargado: {sum(len(t) for t, _ in loaded.values())} umbrales")
+        return _catalogue
+
+
+def snapshot(profile):
+    """Valores de los contadores del perfil que desbloquean logros"""
+    return {kind: getattr(profile, field) for kind, field in COUNTER_FIELDS.items()}
+
+
+def crossed_achievements(before, after):
+    """
+    Ids de logros cuyo umbral se cruzó al pasar de `before` a `after`
+    (before < requisito <= after). Con before=None cuenta todo lo alcanzado.
+    """
+    crossed = []
+    for kind, (thresholds, ids) in catalogue().items():
+        new_value = after.get(kind)
+        if new_value is None:
+            continue
+        old_value = before.get(kind) if before is not None else None
+        if old_value is not None and new_value <= old_value:
+            continue
+        start = bisect_right(thresholds, old_value) if old_value is not None else 0
+        crossed.extend(ids[start:bisect_right(thresholds, new_value)])
+    return crossed
+
+
+def award_crossed(user, before, after):
+    """Otorga los logros recién cruzados; devuelve sus ids (sin consultas si no hay)"""
+    achievement_ids = crossed_achievements(before, after)
+    if not achievement_ids:
+        return []
+    try:
+        with transaction.atomic():
+            _insert_awards(user, achievement_ids)
+    except IntegrityError:
+        # Catálogo desactualizado (logro eliminado en otro proceso): recargar y reintentar
+        logger.warning("⚠️ Catálogo de logros desactualizado, recargando")
+        invalidate()
+        achievement_ids = crossed_achievements(before, after)
+        if achievement_ids:
+            _insert_awards(user, achievement_ids)
+    if achievement_ids:
+        user_cache.bump(user)
+        logger.info(f"🏆 Logros para {user.username}: {achievement_ids}")
+    return achievement_ids
+
+
+def _insert_awards(user, achievement_ids):
+    UserAchievement.objects.bulk_create(
+        [UserAchievement(user=user, achievement_id=a_id) for a_id in achievement_ids],
+        ignore_conflicts=True
+    )
+    sync.record((user.id, 'achievement', a_id, False) for a_id in achievement_ids)
+
+
+def award_all(user, profile=None):
+    """Verificación completa: otorga todo lo que el perfil ya alcanza"""
+    return award_crossed(user, None, snapshot(profile or user.profile))
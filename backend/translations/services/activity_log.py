@@ -0,0 +1,219 @@
+# translations/services/activity_log.py
+"""
+Escritura diferida de ActivityLog.
+
+Los eventos se acumulan en un buffer en memoria del proceso y se insertan con
+un solo bulk_create cuando el buffer llega a ACTIVITY_LOG_BUFFER_SIZE o cada
+ACTIVITY_LOG_FLUSH_INTERVAL segundos (hilo de fondo), en la misma transacción
+que el resumen diario (services/daily_activity.py); al confirmarla se invalida
+la caché por usuario (services/user_cache.py) de los afectados. Los eventos se
+encolan recién al confirmar la transacción del request, así que un rollback no
+deja registros huérfanos.
+
+Si la base no acepta el lote, o el proceso termina con eventos pendientes
+(reciclado del worker), se guardan en una lista de Redis
+(ACTIVITY_LOG_REDIS_KEY). Cualquier worker la vacía en su siguiente flush, y
+también `manage.py flush_activity_log`. Un proceso que muere sin salir limpio
+pierde como máximo los eventos de un intervalo: lo que deba leerse
+inmediatamente después (p. ej. el id del registro) se escribe con sync=True.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import ActivityLog
+from . import daily_activity, redis_store, user_cache
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('user_id', 'activity_type', 'mode', 'category', 'word_learned', 'details')
+
+_lock = threading.Lock()
+_buffer = []
+_wakeup = threading.Event()
+_flusher = None
+_pid = None
+
+
+def log_activity(user, activity_type, sync=False, **fields):
+    """
+    Registra un evento de actividad. Con sync=True (o ACTIVITY_LOG_ASYNC=False)
+    se inserta de inmediato y el registro devuelto tiene id.
+    """
+    entry = ActivityLog(user=user, activity_type=activity_type, timestamp=timezone.now(), **fields)
+    if sync or not settings.ACTIVITY_LOG_ASYNC:
+        entry.save()
+        _record_daily_on_commit([entry])
+    else:
+        _enqueue_on_commit([entry])
+    return entry
+
+
+def log_activities(entries, sync=False):
+    """Registra varios ActivityLog ya construidos (un solo INSERT si es síncrono)"""
+    if not entries:
+        return
+    now = timezone.now()
+    for entry in entries:
+        if entry.timestamp is None:
+            entry.timestamp = now
+    if sync or not settings.ACTIVITY_LOG_ASYNC:
+        ActivityLog.objects.bulk_create(entries)
+        _record_daily_on_commit(entries)
+    else:
+        _enqueue_on_commit(entries)
+
+
+def flush(drain_limit=None):
+    """
+    Inserta lo que haya en el buffer y hasta `drain_limit` eventos de la lista
+    de Redis (default: ACTIVITY_LOG_BUFFER_SIZE). Devuelve cuántos se insertaron.
+    """
+    with _lock:
+        rows = list(_buffer)
+        _buffer.clear()
+    rows.extend(_drain_redis(settings.ACTIVITY_LOG_BUFFER_SIZE if drain_limit is None else drain_limit))
+    if not rows:
+        return 0
+
+    entries = [_from_row(row) for row in rows]
+    try:
+        with transaction.atomic():
+            ActivityLog.objects.bulk_create(entries, batch_size=500)
+            daily_activity.record(entries)
+            # El resumen diario aparece en las pantallas en caché de cada usuario
+            for user_id in {entry.user_id for entry in entries}:
+                user_cache.bump(user_id)
+    except DatabaseError as e:
+        logger.error(f"❌ No se pudieron guardar {len(rows)} registros de actividad: {e}")
+        _spill(rows)
+        return 0
+    logger.debug(f"📝 {len(rows)} registros de actividad guardados")
+    return len(rows)
+
+
+def pending_count():
+    """Eventos en el buffer de este proceso"""
+    with _lock:
+        return len(_buffer)
+
+
+def _record_daily_on_commit(entries):
+    """Resumen diario de eventos ya insertados (al confirmar, fuera del camino crítico)"""
+    def record():
+        try:
+            daily_activity.record(entries)
+        except DatabaseError as e:
+            # Se corrige con `manage.py backfill_daily_activity`
+            logger.error(f"❌ No se pudo actualizar el resumen diario: {e}")
+    transaction.on_commit(record)
+
+
+def _enqueue_on_commit(entries):
+    rows = [_to_row(entry) for entry in entries]
+    transaction.on_commit(lambda: _enqueue(rows))
+
+
+def _enqueue(rows):
+    _ensure_flusher()
+    with _lock:
+        _buffer.extend(rows)
+        overflow = len(_buffer) - settings.ACTIVITY_LOG_MAX_BUFFER
+        if overflow > 0:
+            # La base lleva tiempo rechazando lotes y Redis tampoco responde
+            del _buffer[:overflow]
+            logger.error(f"❌ Buffer de actividad lleno: se descartaron {overflow} registros")
+        full = len(_buffer) >= settings.ACTIVITY_LOG_BUFFER_SIZE
+    if full:
+        _wakeup.set()
+
+
+def _ensure_flusher():
+    """Arranca el hilo de flush (uno por proceso, también tras un fork)"""
+    global _flusher, _pid
+    if _flusher is not None and _flusher.is_alive() and _pid == os.getpid():
+        return
+    with _lock:
+        if _flusher is not None and _flusher.is_alive() and _pid == os.getpid():
+            return
+        if _pid != os.getpid():
+            # Proceso hijo: el buffer heredado pertenece al padre
+            _buffer.clear()
+        _pid = os.getpid()
+        _flusher = threading.Thread(target=_flush_loop, name='activity-log-flusher', daemon=True)
+        _flusher.start()
+
+
+def _flush_loop():
+    while True:
+        _wakeup.wait(settings.ACTIVITY_LOG_FLUSH_INTERVAL)
+        _wakeup.clear()
+        try:
+            flush()
+        except Exception as e:
+            logger.error(f"❌ Error en el flush de actividad: {e}", exc_info=True)
+        finally:
+            connection.close()
+
+
+@atexit.register
+def _flush_at_exit():
+    if _pid != os.getpid() or not pending_count():
+        return
+    try:
+        flush(drain_limit=0)
+    except Exception:
+        with _lock:
+            rows = list(_buffer)
+            _buffer.clear()
+        _spill(rows)
+
+
+def _spill(rows):
+    """Guarda en Redis los eventos que no se pudieron insertar; si no hay Redis, al buffer"""
+    if not rows:
+        return
+    client = redis_store.get_client()
+    if client is not None:
+        try:
+            client.rpush(settings.ACTIVITY_LOG_REDIS_KEY, *[json.dumps(row) for row in rows])
+            return
+        except Exception as e:
+            logger.error(f"❌ Redis no disponible para registros de actividad: {e}")
+    with _lock:
+        _buffer[:0] = rows
+
+
+def _drain_redis(limit):
+    if limit <= 0:
+        return []
+    client = redis_store.get_client()
+    if client is None:
+        return []
+    key = settings.ACTIVITY_LOG_REDIS_KEY
+    try:
+        with client.pipeline() as pipe:
+            pipe.lrange(key, 0, limit - 1)
+            pipe.ltrim(key, limit, -1)
+            raw_rows, _ = pipe.execute()
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo leer la lista de actividad en Redis: {e}")
+        return []
+    return [json.loads(raw) for raw in raw_rows]
+
+
+def _to_row(entry):
+    row = {field: getattr(entry, field) for field in FIELDS}
+    row['timestamp'] = entry.timestamp.isoformat()
+    return row
+
+
+def _from_row(row):
+    return ActivityLog(timestamp=parse_datetime(row['timestamp']), **{field: row.get(field) for field in FIELDS})
@@ -0,0 +1,693 @@
+# translations/services/answer_pipeline.py
+"""
+Pipeline de submit_answer en una sola transacción y con presupuesto de consultas.
+
+Camino normal (la palabra ya está en el vocabulario del usuario), QUERY_BUDGET = 6
+como máximo. 6 es el peor caso (ActivityLog síncrono y sin Redis); con Redis y
+ACTIVITY_LOG_ASYNC quedan 3:
+ 1. UPDATE ... RETURNING de UserVocabulary: la transición de estrellas de
+    UserVocabulary.update_mastery se expresa con CASE sobre los valores previos,
+    incluida la verificación de "ya degradada hoy" con UserVocabulary.last_degraded_on.
+ 2. Upsert de UserProgress (INSERT ... ON CONFLICT).
+ 3. UPDATE del ExerciseSessionLog.
+ 4. UPDATE ... RETURNING de ExerciseSession (contador y cierre de sesión).
+    Con Redis, 3 y 4 se reemplazan por un script sobre el hash de la sesión al
+    confirmar la transacción (ver services/session_state.py).
+ 5. Un solo INSERT con los ActivityLog del intento (ninguno si ACTIVITY_LOG_ASYNC:
+    se encolan en services/activity_log.py al confirmar la transacción).
+ 6. Upsert de DailyGoal (o HINCRBY en Redis al confirmar, ver services/daily_goals.py).
+El INSERT en ChangeLog de la palabra (y de la sesión si se cerró), para la
+sincronización de los clientes sin conexión, se hace al confirmar la
+transacción (sync.record_on_commit).
+
+Los logros y el perfil solo se tocan cuando cambian sus contadores (palabra
+nueva o palabra dominada), que es el camino poco frecuente; aun entonces el
+motor de logros solo consulta la base si se cruzó un umbral.
+"""
+import logging
+from datetime import datetime, time, timedelta
+
+from django.db import connections, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Greatest, Least
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
+
+from ..db import update_returning
+from ..models import (
+    ActivityLog, Exercise, ExerciseSession, ExerciseSessionLog,
+    UserProgress, UserVocabulary
+)
+from . import (
+    abandonment, activity_log, daily_goals, practice_exercises, session_state, star_histogram,
+    sync, user_cache
+)
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGET = 6
+
+# Máximo de respuestas por llamada a submit_answers
+MAX_BATCH_SIZE = 100
+
+VOCAB_RETURNING = (
+    'id', 'quechua_word', 'mastery_level', 'previous_mastery_level',
+    'consecutive_failures', 'exercises_completed', 'first_detected',
+)
+SESSION_RETURNING = ('id', 'mode', 'exercises_total', 'exercises_completed', 'is_completed')
+
+
+def resolve_mode(exercise, requested_mode):
+    """Modo del intento: el enviado por el cliente o el que indica el ejercicio"""
+    if requested_mode in ('detection', 'practice'):
+        return requested_mode
+    # Verificar metadata del ejercicio primero
+    if exercise.metadata and exercise.metadata.get('mode'):
+        return exercise.metadata.get('mode')
+    if exercise.metadata and exercise.metadata.get('practice_mode'):
+        return 'practice'
+    if exercise.category == 'detection':
+        return 'detection'
+    # Último recurso: por defecto es práctica
+    return 'practice'
+
+
+def check_answer(exercise, answer):
+    """Verifica la respuesta según el tipo de ejercicio"""
+    if exercise.type == 'pronunciation':
+        # Para pronunciación, siempre consideramos correcto si llegó hasta aquí
+        return True
+
+    expected = exercise.answer.lower().strip()
+    if exercise.type == 'matching' and '→' in answer:
+        # Formato "español→quechua"
+        parts = answer.split('→')
+        if len(parts) != 2:
+            logger.warning(f"🔍 Formato de matching inválido: {answer}")
+            return False
+        return parts[1].strip().lower() == expected
+
+    return answer.lower().strip() == expected
+
+
+def submit_answer(user, exercise, answer, mode):
+    """
+    Aplica un intento completo y devuelve el payload de respuesta de submit_answer.
+    `exercise` debe venir con object_translation cargado (select_related).
+    """
+    is_correct = check_answer(exercise, answer)
+    now = timezone.now()
+    normalized_quechua = exercise.object_translation.quechua.strip().lower()
+    session_id = (exercise.metadata or {}).get('session_id')
+
+    # Sin savepoint: si algo falla se revierte la transacción externa completa
+    # (evita SAVEPOINT/RELEASE por respuesta cuando se llama desde un lote)
+    with transaction.atomic(savepoint=False):
+        activity_logs = []
+        vocab = _apply_mastery(user, normalized_quechua, is_correct, mode, now)
+
+        if vocab is None:
+            vocab = _create_vocabulary(user, exercise, normalized_quechua, is_correct, mode, activity_logs)
+        elif vocab['was_degraded'] and not vocab.get('side_effects_applied'):
+            activity_logs.append(ActivityLog(
+                user=user,
+                activity_type='mastery_decreased',
+                mode=mode,
+                word_learned=normalized_quechua,
+                details={
+                    'previous_level': vocab['previous_mastery_level'],
+                    'new_level': vocab['mastery_level'],
+                    'reason': 'consecutive_failures'
+                }
+            ))
+
+        _upsert_progress(user, exercise, is_correct, now)
+
+        if session_id:
+            _update_session(user, exercise, session_id, is_correct, now)
+            abandonment.invalidate(session_id)
+
+        activity_logs.append(ActivityLog(
+            user=user,
+            activity_type='exercise_completed',
+            mode=mode,
+            category=exercise.category,
+            word_learned=normalized_quechua,
+            details={
+                'exercise_id': exercise.id,
+                'exercise_type': exercise.type,
+                'mastery_level': vocab['mastery_level'],
+                'previous_mastery_level': vocab['previous_mastery_level'],
+                'is_correct': is_correct,
+                'mode': mode,
+                'session_id': session_id
+            }
+        ))
+        activity_log.log_activities(activity_logs)
+        user_cache.bump(user)
+
+        became_mastered = vocab['mastery_level'] == 5 and vocab['mastery_updated']
+        daily_goals.increment(user, practiced=1, mastered=1 if became_mastered else 0)
+
+        # La palabra nueva ya se contó en _create_vocabulary; los logros los
+        # otorga increment_counters con cada incremento
+        if became_mastered and not vocab.get('side_effects_applied'):
+            user.profile.add_mastered_word()
+
+    return response_payload(exercise, is_correct, mode, vocab)
+
+
+def response_payload(exercise, is_correct, mode, vocab):
+    """Respuesta de submit_answer para un intento (la misma en el endpoint por lotes)"""
+    response_data = {
+        'correct': is_correct,
+        'feedback': '¡Correcto!' if is_correct else f'Incorrecto. La respuesta correcta es: {exercise.answer}',
+        'mastery_level': vocab['mastery_level'],
+        'previous_mastery_level': vocab['previous_mastery_level'],
+        'mastery_updated': vocab['mastery_updated'],
+        'mastery_decreased': vocab['was_degraded'],
+        'mode': mode,
+        'category': exercise.category,
+        'consecutive_failures': vocab['consecutive_failures'],
+        'consecutive_failures_limit': vocab['consecutive_failures_limit'],
+        'is_recent_word': vocab['is_recent_word'],
+        'is_minimally_practiced': vocab['is_minimally_practiced'],
+        'exercises_completed': vocab['exercises_completed'],
+        'exercises_needed': 5 - vocab['exercises_completed'] if vocab['exercises_completed'] < 5 else 0
+    }
+
+    # Agregar mensaje específico si hubo degradación
+    if vocab['was_degraded']:
+        response_data['degradation_message'] = "Esta palabra necesita más práctica. ¡Sigue intentándolo!"
+
+    return response_data
+
+
+# ----------------------------------------------------------------------
+# Vocabulario
+# ----------------------------------------------------------------------
+
+def _rules_mode(mode):
+    return 'detection' if mode == 'detection' else 'practice'
+
+
+def mastery_update_values(mode, is_correct, now):
+    """
+    Expresiones de UPDATE equivalentes a UserVocabulary.update_mastery.
+    Todas las condiciones se evalúan sobre los valores previos de la fila.
+    """
+    rules = _rules_mode(mode)
+    level = F('mastery_level')
+    values = {
+        'exercises_completed': F('exercises_completed') + 1,
+        'previous_mastery_level': level,
+        'last_practiced': Value(now),
+        # save() actualiza last_detected (auto_now); update() no lo hace solo
+        'last_detected': Value(now),
+    }
+
+    if is_correct:
+        thresholds = UserVocabulary.MASTERY_THRESHOLDS[rules]
+        rate_percent = round(UserVocabulary.SUCCESS_RATE_THRESHOLDS[rules] * 100)
+        # aciertos / intentos >= tasa, en enteros y con los valores ya incrementados
+        rate_ok = GreaterThanOrEqual(
+            (F('exercises_correct') + 1) * 100,
+            (F('exercises_completed') + 1) * rate_percent
+        )
+        reaches_five = Q(exercises_correct__gte=thresholds[5] - 1, mastery_level__lt=5)
+        new_level = Case(
+            When(reaches_five & rate_ok, then=Value(5)),
+            # Alcanzó los aciertos de 5 estrellas pero no la tasa: se queda igual
+            When(reaches_five, then=level),
+            When(Q(exercises_correct__gte=thresholds[4] - 1, mastery_level__lt=4), then=Value(4)),
+            When(Q(exercises_correct__gte=thresholds[3] - 1, mastery_level__lt=3), then=Value(3)),
+            When(Q(exercises_correct__gte=thresholds[2] - 1, mastery_level__lt=2), then=Value(2)),
+            default=level,
+        )
+        values['exercises_correct'] = F('exercises_correct') + 1
+        values['consecutive_failures'] = Value(0)
+        values['mastered_date'] = Case(
+            When(reaches_five & rate_ok, then=Value(now)),
+            default=F('mastered_date'),
+        )
+    else:
+        limit = UserVocabulary.CONSECUTIVE_FAILURES_LIMITS[rules]
+        recent_cutoff = datetime.combine(
+            now.date() - timedelta(days=UserVocabulary.RECENT_WORD_DAYS[rules]), time.min, tzinfo=now.tzinfo
+        )
+        local_today = timezone.localdate(now)
+        degrade = Q(
+            consecutive_failures__gte=limit - 1,
+            mastery_level__gt=1,
+            exercises_completed__gte=UserVocabulary.MIN_EXERCISES_FOR_DEGRADATION - 1,
+            first_detected__lt=recent_cutoff,
+        ) & ~Q(last_degraded_on=local_today)
+        new_level = Case(When(degrade, then=level - 1), default=level)
+        values['consecutive_failures'] = Case(
+            When(degrade, then=Value(0)),
+            default=F('consecutive_failures') + 1,
+        )
+        values['last_degraded_on'] = Case(
+            When(degrade, then=Value(local_today)),
+            default=F('last_degraded_on'),
+        )
+
+    # Detección: mínimo 1⭐ (proteger descubrimiento); práctica: mínimo 0⭐
+    floor = 1 if mode == 'detection' else 0
+    values['mastery_level'] = Greatest(Least(new_level, Value(5)), Value(floor))
+    return values
+
+
+def _apply_mastery(user, quechua_word, is_correct, mode, now):
+    """Actualiza el dominio de la palabra; None si no está en el vocabulario"""
+    queryset = UserVocabulary.objects.filter(user=user, quechua_word=quechua_word)
+    rules = _rules_mode(mode)
+
+    if connections[queryset.db].features.can_return_columns_from_insert:
+        row = update_returning(queryset, mastery_update_values(mode, is_correct, now), VOCAB_RETURNING)
+        if row is None:
+            return None
+        first_detected = row['first_detected']
+        is_recent_word = bool(first_detected) and (
+            (now.date() - first_detected.date()).days <= UserVocabulary.RECENT_WORD_DAYS[rules]
+        )
+        info = {
+            'mastery_level': row['mastery_level'],
+            'previous_mastery_level': row['previous_mastery_level'],
+            'was_degraded': not is_correct and row['mastery_level'] < row['previous_mastery_level'],
+            'consecutive_failures': row['consecutive_failures'],
+            'exercises_completed': row['exercises_completed'],
+            'is_recent_word': is_recent_word,
+            'is_minimally_practiced': row['exercises_completed'] >= UserVocabulary.MIN_EXERCISES_FOR_DEGRADATION,
+        }
+        # Solo cuando cambian las estrellas (camino poco frecuente)
+        star_histogram.shift([(user.id, row['previous_mastery_level'], row['mastery_level'])])
+        # Sin save(): la signal de UserVocabulary no se dispara
+        sync.record_on_commit([(user.id, 'vocabulary', row['id'], False)])
+    else:
+        # Motores sin RETURNING: bloquear la fila y usar la lógica del modelo
+        vocab = queryset.select_for_update().first()
+        if vocab is None:
+            return None
+        mastery_info = vocab.update_mastery(is_correct, mode)
+        info = {
+            'mastery_level': vocab.mastery_level,
+            'previous_mastery_level': vocab.previous_mastery_level,
+            'was_degraded': mastery_info['was_degraded'],
+            'consecutive_failures': mastery_info['consecutive_failures'],
+            'exercises_completed': vocab.exercises_completed,
+            'is_recent_word': mastery_info['is_recent_word'],
+            'is_minimally_practiced': mastery_info['is_minimally_practiced'],
+        }
+        # update_mastery ya registró la degradación y la palabra dominada
+        info['side_effects_applied'] = True
+
+    info['created'] = False
+    info['mastery_updated'] = info['mastery_level'] > info['previous_mastery_level']
+    info['consecutive_failures_limit'] = UserVocabulary.CONSECUTIVE_FAILURES_LIMITS[rules]
+    return info
+
+
+def _create_vocabulary(user, exercise, normalized_quechua, is_correct, mode, activity_logs):
+    """Agrega la palabra al vocabulario cuando el usuario no la tenía"""
+    if mode == 'detection':
+        # Crear palabra automáticamente si no existe en detección
+        logger.warning(f"⚠️ Palabra '{normalized_quechua}' no encontrada en vocabulario de detección")
+        vocab_count = UserVocabulary.objects.filter(user=user).count()
+        activity_logs.append(_word_auto_created_log(user, exercise, normalized_quechua, vocab_count))
+
+    vocab = UserVocabulary.objects.create(
+        user=user, **_new_vocabulary_values(exercise, normalized_quechua, is_correct, mode)
+    )
+    user.profile.add_word()
+    logger.info(f"✅ Palabra creada en modo {mode}: '{normalized_quechua}'")
+
+    return {
+        'created': True,
+        'mastery_level': vocab.mastery_level,
+        'previous_mastery_level': vocab.previous_mastery_level,
+        'mastery_updated': False,
+        'was_degraded': False,
+        'consecutive_failures': 0,
+        'consecutive_failures_limit': UserVocabulary.CONSECUTIVE_FAILURES_LIMITS[_rules_mode(mode)],
+        'is_recent_word': False,
+        'is_minimally_practiced': False,
+        'exercises_completed': vocab.exercises_completed,
+    }
+
+
+# ----------------------------------------------------------------------
+# Progreso, sesión y meta diaria
+# ----------------------------------------------------------------------
+
+def _new_vocabulary_values(exercise, normalized_quechua, is_correct, mode):
+    """Valores de una palabra que entra al vocabulario por un ejercicio (intento suelto o lote)"""
+    translation = exercise.object_translation
+    values = {
+        'object_label': translation.english_label,
+        'spanish_word': translation.spanish.strip(),
+        'quechua_word': normalized_quechua,
+        'origin': 'exercise',
+        'mastery_level': 1,
+        'previous_mastery_level': 1,
+        'exercises_completed': 1,
+        'exercises_correct': 1 if is_correct else 0,
+    }
+    if mode == 'detection':
+        values['times_detected'] = 1  # Marcar como detectada una vez
+    return values
+
+
+def _word_auto_created_log(user, exercise, normalized_quechua, vocab_count):
+    return ActivityLog(
+        user=user,
+        activity_type='word_auto_created',
+        mode='detection',
+        word_learned=normalized_quechua,
+        details={
+            'reason': 'missing_from_vocab',
+            'exercise_id': exercise.id,
+            'auto_created': True,
+            'original_word': exercise.object_translation.quechua,
+            'vocab_count_before': vocab_count
+        }
+    )
+
+
+def _upsert_progress(user, exercise, is_correct, now):
+    connection = connections[UserProgress.objects.db]
+    qn = connection.ops.quote_name
+    table = qn(UserProgress._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (user_id, exercise_id, attempts, correct, completed, last_attempt) "
+            f"VALUES (%s, %s, 1, %s, %s, %s) "
+            f"ON CONFLICT (user_id, exercise_id) DO UPDATE SET "
+            f"attempts = {table}.attempts + 1, "
+            f"correct = {table}.correct OR EXCLUDED.correct, "
+            f"completed = {table}.completed OR EXCLUDED.completed, "
+            f"last_attempt = EXCLUDED.last_attempt",
+            [user.id, exercise.id, is_correct, is_correct, now]
+        )
+
+
+def _update_session(user, exercise, session_id, is_correct, now):
+    if session_state.enabled():
+        # Al confirmar: un rollback del intento no debe contar en la sesión.
+        # robust: si falla, el intento ya está guardado y el request sigue con su 200
+        transaction.on_commit(
+            lambda: _record_session_answer(user, exercise, session_id, is_correct, now), robust=True
+        )
+        return None
+    return _update_session_db(user, exercise, session_id, is_correct, now)
+
+
+def _record_session_answer(user, exercise, session_id, is_correct, now):
+    session = session_state.record_answer(user, session_id, exercise.id, is_correct, now)
+    if session is session_state.UNTRACKED:
+        with transaction.atomic():
+            _update_session_db(user, exercise, session_id, is_correct, now)
+    elif session is not None:
+        practice_exercises.maybe_prefetch_next_session(user, session, exercise.category)
+
+
+def _update_session_db(user, exercise, session_id, is_correct, now):
+    updated = ExerciseSessionLog.objects.filter(
+        session_id=session_id,
+        exercise=exercise
+    ).update(is_completed=True, is_correct=is_correct, end_time=now)
+    if not updated:
+        return None
+
+    # Si todos los ejercicios están completos, marcar como completada
+    finishes = Q(exercises_completed__gte=F('exercises_total') - 1)
+    row = update_returning(
+        ExerciseSession.objects.filter(id=session_id),
+        {
+            'exercises_completed': F('exercises_completed') + 1,
+            'is_completed': Case(When(finishes, then=Value(True)), default=F('is_completed')),
+            'end_time': Case(When(finishes, then=Value(now)), default=F('end_time')),
+        },
+        SESSION_RETURNING
+    )
+    if row is None:
+        return None
+    if row['is_completed']:
+        sync.record_on_commit([(user.id, 'session', row['id'], False)])
+
+    session = ExerciseSession(user=user, **row)
+    # Preparar la siguiente sesión de práctica cuando los datos ya estén confirmados
+    transaction.on_commit(
+        lambda: practice_exercises.maybe_prefetch_next_session(user, session, exercise.category), robust=True
+    )
+    return session
+
+
+# ----------------------------------------------------------------------
+# Lotes: sesión completa o reenvío de respuestas hechas sin conexión
+# ----------------------------------------------------------------------
+
+VOCAB_BATCH_FIELDS = [
+    'mastery_level', 'previous_mastery_level', 'exercises_completed', 'exercises_correct',
+    'consecutive_failures', 'last_practiced', 'last_detected', 'mastered_date', 'last_degraded_on',
+]
+
+
+def submit_answers(user, session_id, items, default_mode=None):
+    """
+    Aplica en orden una lista de intentos de una sesión:
+    [{'exercise_id': 1, 'answer': '...', 'client_timestamp': '...', 'mode': opcional}, ...]
+
+    Las transiciones de dominio se calculan en memoria, en el orden recibido, y
+    se persisten con operaciones en bloque en una sola transacción: el número de
+    consultas no depende del tamaño del lote.
+
+    Devuelve (session, results): un resultado por intento en el mismo orden, con
+    el payload de submit_answer más 'exercise_id', o {'exercise_id', 'error'}.
+    Si la sesión ya está cerrada (completada o abandonada) no se aplica ningún intento.
+    Lanza ExerciseSession.DoesNotExist si la sesión no es del usuario.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        # Avances de la sesión que aún están en Redis: a la base antes de seguir
+        session_state.flush([session_id])
+        session = ExerciseSession.objects.select_for_update().get(id=session_id, user=user)
+        if session.is_completed or session.is_abandoned:
+            # Reenvío tardío: la sesión ya se cerró y sus respuestas no se aplican
+            logger.info(f"Lote descartado: la sesión {session.id} ya está cerrada")
+            return session, [
+                {'exercise_id': item.get('exercise_id'), 'error': 'La sesión ya está cerrada'}
+                for item in items
+            ]
+
+        exercise_ids = set()
+        for item in items:
+            try:
+                exercise_ids.add(int(item.get('exercise_id')))
+            except (TypeError, ValueError):
+                pass
+        exercises = Exercise.objects.select_related('object_translation').in_bulk(exercise_ids)
+        words = {e.object_translation.quechua.strip().lower() for e in exercises.values()}
+
+        vocabs = {
+            v.quechua_word: v
+            for v in UserVocabulary.objects.select_for_update().filter(user=user, quechua_word__in=words)
+        }
+        progress = {p.exercise_id: p for p in UserProgress.objects.filter(user=user, exercise_id__in=exercises)}
+        session_logs = {
+            log.exercise_id: log
+            for log in ExerciseSessionLog.objects.filter(session=session, exercise_id__in=exercises)
+        }
+
+        new_vocabs = {}
+        changed_vocabs = {}
+        new_progress = {}
+        changed_progress = {}
+        changed_logs = {}
+        activity_logs = []
+        results = []
+        practiced = mastered = mastered_words = 0
+        vocab_count = None
+
+        for item in items:
+            exercise = exercises.get(_as_int(item.get('exercise_id')))
+            answer = item.get('answer')
+            if exercise is None:
+                results.append({'exercise_id': item.get('exercise_id'), 'error': 'Ejercicio no encontrado'})
+                continue
+            if not answer:
+                results.append({'exercise_id': exercise.id, 'error': 'Se requiere una respuesta'})
+                continue
+
+            mode = resolve_mode(exercise, item.get('mode') or default_mode)
+            rules = _rules_mode(mode)
+            is_correct = check_answer(exercise, answer)
+            word = exercise.object_translation.quechua.strip().lower()
+
+            # Dominio de la palabra (en memoria)
+            vocab = vocabs.get(word) or new_vocabs.get(word)
+            if vocab is None:
+                if mode == 'detection':
+                    if vocab_count is None:
+                        vocab_count = UserVocabulary.objects.filter(user=user).count()
+                    activity_logs.append(
+                        _word_auto_created_log(user, exercise, word, vocab_count + len(new_vocabs))
+                    )
+                vocab = _new_vocabulary(user, exercise, word, is_correct, mode, now)
+                new_vocabs[word] = vocab
+                info = {
+                    'created': True,
+                    'mastery_level': vocab.mastery_level,
+                    'previous_mastery_level': vocab.previous_mastery_level,
+                    'mastery_updated': False,
+                    'was_degraded': False,
+                    'consecutive_failures': 0,
+                    'is_recent_word': False,
+                    'is_minimally_practiced': False,
+                    'exercises_completed': vocab.exercises_completed,
+                }
+            else:
+                mastery_info = vocab.apply_mastery_transition(is_correct, mode)
+                vocab.last_detected = now
+                if vocab.pk:
+                    changed_vocabs[word] = vocab
+                if mastery_info['reached_mastery']:
+                    mastered_words += 1
+                if mastery_info['was_degraded']:
+                    activity_logs.append(ActivityLog(
+                        user=user,
+                        activity_type='mastery_decreased',
+                        mode=mode,
+                        word_learned=word,
+                        details={
+                            'previous_level': vocab.previous_mastery_level,
+                            'new_level': vocab.mastery_level,
+                            'reason': 'consecutive_failures'
+                        }
+                    ))
+                info = {
+                    'created': False,
+                    'mastery_level': vocab.mastery_level,
+                    'previous_mastery_level': vocab.previous_mastery_level,
+                    'mastery_updated': vocab.mastery_level > vocab.previous_mastery_level,
+                    'was_degraded': mastery_info['was_degraded'],
+                    'consecutive_failures': mastery_info['consecutive_failures'],
+                    'is_recent_word': mastery_info['is_recent_word'],
+                    'is_minimally_practiced': mastery_info['is_minimally_practiced'],
+                    'exercises_completed': vocab.exercises_completed,
+                }
+            info['consecutive_failures_limit'] = UserVocabulary.CONSECUTIVE_FAILURES_LIMITS[rules]
+
+            # Progreso del ejercicio
+            record = progress.get(exercise.id) or new_progress.get(exercise.id)
+            if record is None:
+                new_progress[exercise.id] = UserProgress(
+                    user=user, exercise=exercise, attempts=1,
+                    correct=is_correct, completed=is_correct, last_attempt=now
+                )
+            else:
+                record.attempts += 1
+                record.correct = is_correct or record.correct
+                record.completed = is_correct or record.completed
+                record.last_attempt = now
+                if record.pk:
+                    changed_progress[exercise.id] = record
+
+            # Log de la sesión
+            session_log = session_logs.get(exercise.id)
+            if session_log:
+                session_log.is_completed = True
+                session_log.is_correct = is_correct
+                session_log.end_time = now
+                changed_logs[exercise.id] = session_log
+                session.exercises_completed += 1
+                session_category = exercise.category
+
+            activity_logs.append(ActivityLog(
+                user=user,
+                activity_type='exercise_completed',
+                mode=mode,
+                category=exercise.category,
+                word_learned=word,
+                details={
+                    'exercise_id': exercise.id,
+                    'exercise_type': exercise.type,
+                    'mastery_level': info['mastery_level'],
+                    'previous_mastery_level': info['previous_mastery_level'],
+                    'is_correct': is_correct,
+                    'mode': mode,
+                    'session_id': session.id,
+                    'client_timestamp': item.get('client_timestamp'),
+                    'batch': True
+                }
+            ))
+
+            practiced += 1
+            if info['mastery_level'] == 5 and info['mastery_updated']:
+                mastered += 1
+
+            results.append({'exercise_id': exercise.id, **response_payload(exercise, is_correct, mode, info)})
+
+        # Persistir todo en bloque
+        star_transitions = star_histogram.vocabulary_transitions([*new_vocabs.values(), *changed_vocabs.values()])
+        if new_vocabs:
+            UserVocabulary.objects.bulk_create(new_vocabs.values())
+        if changed_vocabs:
+            UserVocabulary.objects.bulk_update(changed_vocabs.values(), VOCAB_BATCH_FIELDS)
+        star_histogram.shift(star_transitions)
+        # La sesión, si se cerró, la registra su save() (signal)
+        sync.record(
+            (user.id, 'vocabulary', vocab.id, False)
+            for vocab in [*new_vocabs.values(), *changed_vocabs.values()]
+        )
+        if new_progress:
+            UserProgress.objects.bulk_create(new_progress.values())
+        if changed_progress:
+            UserProgress.objects.bulk_update(
+                changed_progress.values(), ['attempts', 'correct', 'completed', 'last_attempt']
+            )
+        if changed_logs:
+            ExerciseSessionLog.objects.bulk_update(
+                changed_logs.values(), ['is_completed', 'is_correct', 'end_time']
+            )
+            # Si todos los ejercicios están completos, marcar como completada
+            if session.exercises_completed >= session.exercises_total:
+                session.is_completed = True
+                session.end_time = now
+            session.save(update_fields=['exercises_completed', 'is_completed', 'end_time'])
+            abandonment.invalidate(session.id)
+        if activity_logs:
+            activity_log.log_activities(activity_logs)
+            user_cache.bump(user)
+        if practiced:
+            daily_goals.increment(user, practiced=practiced, mastered=mastered)
+
+        # El perfil (y con él los logros) solo cambia con palabras nuevas o dominadas
+        if new_vocabs or mastered_words:
+            user.profile.increment_counters(words=len(new_vocabs), mastered=mastered_words)
+
+        if changed_logs:
+            transaction.on_commit(
+                lambda: practice_exercises.maybe_prefetch_next_session(user, session, session_category),
+                robust=True
+            )
+
+    return session, results
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _new_vocabulary(user, exercise, word, is_correct, mode, now):
+    return UserVocabulary(
+        user=user,
+        **_new_vocabulary_values(exercise, word, is_correct, mode),
+        # auto_now_add lo fija al insertar; hace falta antes para las transiciones del lote
+        first_detected=now,
+        last_detected=now
+    )
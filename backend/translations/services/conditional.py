@@ -0,0 +1,134 @@
+# translations/services/conditional.py
+"""
+GET condicionales (ETag / Last-Modified) para la API de lectura.
+
+El ETag de una respuesta se deriva de los contadores de versión de los que
+depende, sin ejecutar la vista:
+ - por usuario: 'user_version:<id>' de services/user_cache.py, que sube con
+   cada escritura del usuario;
+ - por tabla: 'table_version:<tabla>', que sube al guardar o borrar filas de
+   tablas compartidas (diccionario de traducciones, catálogo de logros).
+
+Junto con la ruta completa (incluidos los parámetros) y la fecha local, esos
+contadores forman un ETag fuerte. Si el cliente envía If-None-Match (o
+If-Modified-Since) y nada cambió, se responde 304 después de una sola lectura
+de caché (get_many). Las vistas sin datos variables (p. ej. las categorías
+de práctica) calculan el ETag del cuerpo.
+
+Sin Redis disponible las vistas responden normalmente, sin validadores.
+"""
+import functools
+import hashlib
+import json
+import logging
+from datetime import datetime, time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.utils.encoders import JSONEncoder
+
+from .user_cache import MODIFIED_KEY, VERSION_KEY, increment_version, initial_version
+
+logger = logging.getLogger(__name__)
+
+TABLE_VERSION_KEY = 'table_version:{table}'
+TABLE_MODIFIED_KEY = 'table_modified:{table}'
+
+
+def bump_table(table):
+    """Nueva versión de una tabla compartida (al confirmar la transacción en curso)"""
+    transaction.on_commit(lambda: increment_version(
+        TABLE_VERSION_KEY.format(table=table), TABLE_MODIFIED_KEY.format(table=table)
+    ))
+
+
+def conditional_get(per_user=True, tables=()):
+    """
+    Decorador para vistas GET: ETag/Last-Modified y 304. Va encima de
+    @cached_per_user para responder 304 antes de leer la respuesta guardada.
+    """
+
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if hasattr(arg, 'query_params'))
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(*args, **kwargs)
+
+            user_id = request.user.pk if request.user.is_authenticated else None
+            scopes = [(TABLE_VERSION_KEY.format(table=t), TABLE_MODIFIED_KEY.format(table=t)) for t in tables]
+            if per_user and user_id is not None:
+                scopes.append((VERSION_KEY.format(user_id=user_id), MODIFIED_KEY.format(user_id=user_id)))
+            if not scopes:
+                return _content_validated(request, view_func(*args, **kwargs))
+
+            validators = _validators(request, user_id, scopes)
+            if validators is None:
+                return view_func(*args, **kwargs)
+            etag, last_modified = validators
+
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                _set_validators(not_modified, etag, last_modified)
+                return not_modified
+
+            response = view_func(*args, **kwargs)
+            if response.status_code == 200:
+                _set_validators(response, etag, last_modified)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _validators(request, user_id, scopes):
+    """(ETag, Last-Modified) a partir de los contadores; None si la caché no responde"""
+    values = cache.get_many([key for scope in scopes for key in scope])
+    versions = []
+    modified = []
+    for version_key, modified_key in scopes:
+        version = values.get(version_key)
+        if version is None:
+            # Primera lectura (o contador desalojado)
+            version = initial_version(version_key, modified_key)
+            if version is None:
+                return None
+            values[modified_key] = cache.get(modified_key)
+        versions.append(version)
+        modified.append(values.get(modified_key))
+
+    today = timezone.localdate()
+    seed = json.dumps([request.get_full_path(), user_id, today.isoformat(), versions])
+    etag = f'"{hashlib.sha256(seed.encode("utf-8")).hexdigest()[:32]}"'
+    # Sin hora conocida para algún contador: solo ETag
+    last_modified = None
+    if all(m is not None for m in modified):
+        # Las vistas por usuario cambian al pasar la medianoche local (actividad semanal)
+        day_start = timezone.make_aware(datetime.combine(today, time.min)).timestamp()
+        last_modified = int(max(*modified, day_start))
+    return etag, last_modified
+
+
+def _content_validated(request, response):
+    """ETag del cuerpo para respuestas sin contadores (datos fijos)"""
+    if response.status_code != 200:
+        return response
+    body = json.dumps(response.data, cls=JSONEncoder, sort_keys=True)
+    etag = f'"{hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]}"'
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        response = not_modified
+    _set_validators(response, etag, None)
+    return response
+
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # El cliente debe revalidar siempre; respuestas privadas por usuario
+    patch_cache_control(response, private=True, no_cache=True)
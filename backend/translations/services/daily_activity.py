@@ -0,0 +1,129 @@
+# translations/services/daily_activity.py
+"""
+Resumen diario de actividad por usuario (UserDailyActivity).
+
+Cada fila (usuario, fecha local) guarda cuántas detecciones, ejercicios,
+respuestas correctas y abandonos hubo ese día y cuántas palabras distintas se
+tocaron (detecciones y ejercicios). Los gráficos semanales y diarios leen un
+rango de fechas de esta tabla con una sola consulta, en lugar de agregar
+ActivityLog día por día.
+
+La tabla se mantiene al escribir ActivityLog (services/activity_log.py): cada
+lote de eventos suma sus contadores a las filas de sus días con tres consultas
+(crear las filas que falten, bloquearlas y un bulk_update). `manage.py
+backfill_daily_activity` la reconstruye desde ActivityLog.
+"""
+import logging
+from datetime import datetime, time
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import ActivityLog, UserDailyActivity
+
+logger = logging.getLogger(__name__)
+
+# Tipo de evento -> contador
+COUNTER_TYPES = {
+    'detection_session': 'detections',
+    'exercise_completed': 'exercises',
+    'exercise_abandoned': 'abandonments',
+}
+COUNTERS = ('detections', 'exercises', 'correct_answers', 'abandonments')
+# Eventos cuyas palabras cuentan como "palabras del día"
+WORD_TYPES = ('detection_session', 'exercise_completed')
+
+
+def record(entries):
+    """Suma un lote de ActivityLog a los resúmenes de sus días; devuelve las filas tocadas"""
+    deltas = {}
+    for entry in entries:
+        counter = COUNTER_TYPES.get(entry.activity_type)
+        if counter is None:
+            continue
+        key = (entry.user_id, _local_date(entry.timestamp))
+        delta = deltas.setdefault(key, {**dict.fromkeys(COUNTERS, 0), 'words': []})
+        delta[counter] += 1
+        if entry.activity_type == 'exercise_completed' and (entry.details or {}).get('is_correct'):
+            delta['correct_answers'] += 1
+        if entry.activity_type in WORD_TYPES and entry.word_learned:
+            delta['words'].append(entry.word_learned)
+    if not deltas:
+        return 0
+
+    keys = Q()
+    for user_id, date in deltas:
+        keys |= Q(user_id=user_id, date=date)
+
+    with transaction.atomic(savepoint=False):
+        UserDailyActivity.objects.bulk_create(
+            [UserDailyActivity(user_id=user_id, date=date) for user_id, date in deltas],
+            ignore_conflicts=True
+        )
+        rows = list(UserDailyActivity.objects.select_for_update().filter(keys).order_by('user_id', 'date'))
+        for row in rows:
+            delta = deltas[(row.user_id, row.date)]
+            for field in COUNTERS:
+                setattr(row, field, getattr(row, field) + delta[field])
+            known = set(row.words)
+            row.words = row.words + [w for w in dict.fromkeys(delta['words']) if w not in known]
+            row.distinct_words = len(row.words)
+        UserDailyActivity.objects.bulk_update(rows, [*COUNTERS, 'distinct_words', 'words'])
+    return len(rows)
+
+
+def by_date(user, start, end):
+    """{fecha: UserDailyActivity} del usuario entre start y end (inclusive), una consulta"""
+    return {
+        row.date: row
+        for row in UserDailyActivity.objects.filter(user=user, date__range=(start, end))
+    }
+
+
+def rebuild(user_ids, since=None):
+    """
+    Recalcula desde ActivityLog los resúmenes de los usuarios (desde la fecha
+    local `since`, o completos). Devuelve cuántas filas se escribieron.
+    """
+    logs = ActivityLog.objects.filter(user_id__in=user_ids, activity_type__in=COUNTER_TYPES)
+    existing = UserDailyActivity.objects.filter(user_id__in=user_ids)
+    if since is not None:
+        logs = logs.filter(timestamp__gte=timezone.make_aware(datetime.combine(since, time.min)))
+        existing = existing.filter(date__gte=since)
+
+    # TruncDate usa la zona horaria actual (TIME_ZONE): misma fecha local que record()
+    counts = logs.annotate(day=TruncDate('timestamp')).values('user_id', 'day').annotate(
+        detections=Count('id', filter=Q(activity_type='detection_session')),
+        exercises=Count('id', filter=Q(activity_type='exercise_completed')),
+        correct_answers=Count('id', filter=Q(activity_type='exercise_completed', details__is_correct=True)),
+        abandonments=Count('id', filter=Q(activity_type='exercise_abandoned')),
+    )
+    words = {}
+    for user_id, day, word in logs.filter(
+        activity_type__in=WORD_TYPES, word_learned__isnull=False
+    ).exclude(word_learned='').annotate(day=TruncDate('timestamp')).values_list(
+        'user_id', 'day', 'word_learned'
+    ).order_by('user_id', 'day', 'word_learned').distinct():
+        words.setdefault((user_id, day), []).append(word)
+
+    rows = []
+    for row in counts:
+        day_words = words.get((row['user_id'], row['day']), [])
+        rows.append(UserDailyActivity(
+            user_id=row['user_id'], date=row['day'],
+            **{field: row[field] for field in COUNTERS},
+            distinct_words=len(day_words), words=day_words
+        ))
+
+    with transaction.atomic():
+        existing.delete()
+        UserDailyActivity.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def _local_date(value):
+    if value is None:
+        return timezone.localdate()
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
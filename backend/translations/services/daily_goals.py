@@ -0,0 +1,335 @@
+# translations/services/daily_goals.py
+"""
+Contadores de la meta diaria con escritura diferida en Redis.
+
+La meta de hoy de cada usuario vive en un hash de Redis por (usuario, fecha
+local) que se incrementa con HINCRBY dentro de un script Lua. La primera vez que
+se toca, el script lo siembra con la fila de DailyGoal, si existe. daily_goal_view
+y los paneles leen de ahí. Cada hash modificado queda en un conjunto de
+pendientes. Un hilo por proceso (cada DAILY_GOAL_FLUSH_INTERVAL segundos) o
+`manage.py flush_daily_goals` los vuelca a DailyGoal con un solo upsert por
+lote.
+
+El hash guarda, además de los contadores absolutos (para leer), los incrementos
+aún no volcados ('pending:<campo>'). El volcado saca los pendientes del conjunto
+y sus incrementos en un solo script y los suma en la base, así que no pisa lo
+que se haya escrito directo en DailyGoal mientras Redis fallaba; si la base
+rechaza el lote, los devuelve al hash.
+
+Lo que se escribe directo en DailyGoal (admin) manda: `discard` borra el hash
+de esas metas, que se vuelve a sembrar desde la base.
+
+Sin Redis (o con DAILY_GOAL_WRITE_BEHIND=False) se escribe directo en la base
+con un upsert.
+"""
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from ..models import DailyGoal
+from . import redis_store, user_cache
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ('words_detected', 'words_practiced', 'words_mastered')
+# Argumentos de DailyGoal.objects.increment para cada contador
+COUNTER_ARGS = ('detected', 'practiced', 'mastered')
+GOAL_FIELDS = ('detection_goal', 'practice_goal', 'mastery_goal')
+
+# Miembro del conjunto de pendientes: '<user_id>:<fecha>'; hash: 'daily_goal:<miembro>'
+GOAL_KEY = 'daily_goal:{member}'
+DIRTY_KEY = 'daily_goal:dirty'
+PENDING_FIELD = 'pending:{field}'
+
+# KEYS[1]: hash del día, KEYS[2]: conjunto de pendientes
+# ARGV[1]: semilla JSON ('' = sin semilla), ARGV[2]: TTL,
+# ARGV[3]: miembro pendiente ('' = ya está en la base, solo corrige la lectura),
+# ARGV[4..]: pares campo, incremento
+INCREMENT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    if ARGV[1] == '' then
+        return false
+    end
+    for field, value in pairs(cjson.decode(ARGV[1])) do
+        redis.call('HSET', KEYS[1], field, value)
+    end
+end
+for i = 4, #ARGV, 2 do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+    if ARGV[3] ~= '' then
+        redis.call('HINCRBY', KEYS[1], 'pending:' .. ARGV[i], ARGV[i + 1])
+    end
+end
+if #ARGV > 3 and ARGV[3] ~= '' then
+    redis.call('SADD', KEYS[2], ARGV[3])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return redis.call('HGETALL', KEYS[1])
+"""
+
+# KEYS[1]: conjunto de pendientes, ARGV[1]: cuántos sacar, ARGV[2]: prefijo de
+# los hashes, ARGV[3..]: contadores. Saca los miembros y sus incrementos
+# pendientes en el mismo paso: [miembro, [campo, valor, ...], ...]
+POP_PENDING_SCRIPT = """
+local taken = {}
+for _, member in ipairs(redis.call('SPOP', KEYS[1], ARGV[1])) do
+    local key = ARGV[2] .. member
+    local deltas = {}
+    for i = 3, #ARGV do
+        local value = redis.call('HGET', key, 'pending:' .. ARGV[i])
+        if value then
+            redis.call('HDEL', key, 'pending:' .. ARGV[i])
+            deltas[#deltas + 1] = ARGV[i]
+            deltas[#deltas + 1] = value
+        end
+    end
+    taken[#taken + 1] = member
+    taken[#taken + 1] = deltas
+end
+return taken
+"""
+
+_lock = threading.Lock()
+_flusher = None
+_pid = None
+
+
+def increment(user, detected=0, practiced=0, mastered=0, date=None):
+    """
+    Suma a los contadores de la meta del día (hoy, fecha local, por defecto).
+    Devuelve la meta actualizada; dentro de una transacción el incremento en
+    Redis se aplica al confirmarla y se devuelve None (ver with_increments).
+    """
+    date = date or timezone.localdate()
+    deltas = {
+        field: value for field, value in zip(COUNTER_FIELDS, (detected, practiced, mastered)) if value
+    }
+    if deltas:
+        user_cache.bump(user)
+
+    client = _client()
+    if client is None:
+        return _increment_db(user, date, deltas)
+
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _increment_redis(client, user, date, deltas))
+        return None
+    return _increment_redis(client, user, date, deltas)
+
+
+def get_today(user, date=None):
+    """Meta del día (instancia de DailyGoal, sin guardar si solo existe en Redis)"""
+    date = date or timezone.localdate()
+    client = _client()
+    if client is not None:
+        try:
+            values = client.hgetall(_key(_member(user.id, date)))
+            if not values:
+                values = _run_script(client, user, date, {})
+            return _goal_from_hash(user, date, values)
+        except Exception as e:
+            logger.warning(f"⚠️ Meta diaria no disponible en Redis, leyendo de la base: {e}")
+    goal, _ = DailyGoal.objects.get_or_create(user=user, date=date)
+    return goal
+
+
+def with_increments(goal, detected=0, practiced=0, mastered=0):
+    """Suma a la meta leída los incrementos que aún esperan el commit (sin guardar)"""
+    for field, value in zip(COUNTER_FIELDS, (detected, practiced, mastered)):
+        setattr(goal, field, getattr(goal, field) + value)
+    return goal
+
+
+def flush(limit=None):
+    """Vuelca a DailyGoal hasta `limit` metas pendientes; devuelve cuántas se procesaron"""
+    client = _client()
+    if client is None:
+        return 0
+    limit = limit or settings.DAILY_GOAL_FLUSH_BATCH
+    taken = client.eval(POP_PENDING_SCRIPT, 1, DIRTY_KEY, limit, _key(''), *COUNTER_FIELDS)
+    if not taken:
+        return 0
+
+    members = [m.decode() if isinstance(m, bytes) else m for m in taken[::2]]
+    pending = {}
+    for member, values in zip(members, taken[1::2]):
+        deltas = {field: value for field, value in _decode(values).items() if value}
+        if deltas:  # Sin pendientes: ya volcada o expiró antes del volcado
+            pending[member] = deltas
+    rows = []
+    for member, deltas in pending.items():
+        user_id, date = member.split(':', 1)
+        rows.append((int(user_id), parse_date(date), *(deltas.get(field, 0) for field in COUNTER_FIELDS)))
+
+    try:
+        DailyGoal.objects.increment_many(rows)
+    except DatabaseError as e:
+        logger.error(f"❌ No se pudieron volcar {len(rows)} metas diarias: {e}")
+        _restore_pending(client, pending)
+        return 0
+    logger.debug(f"🎯 {len(rows)} metas diarias volcadas a la base")
+    return len(members)
+
+
+def discard(goals):
+    """
+    Borra de Redis las metas (user_id, fecha) escritas directo en DailyGoal: la
+    siguiente lectura o incremento siembra el hash desde la base y los
+    incrementos aún no volcados se descartan. Dentro de una transacción se
+    aplica al confirmarla.
+    """
+    client = _client()
+    members = [_member(user_id, date) for user_id, date in goals]
+    if client is None or not members:
+        return
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _discard(client, members), robust=True)
+    else:
+        _discard(client, members)
+
+
+def _client():
+    if not settings.DAILY_GOAL_WRITE_BEHIND:
+        return None
+    return redis_store.get_client()
+
+
+def _member(user_id, date):
+    return f'{user_id}:{date.isoformat()}'
+
+
+def _key(member):
+    return GOAL_KEY.format(member=member)
+
+
+def _restore_pending(client, pending):
+    """Devuelve al hash los incrementos de un volcado que la base rechazó"""
+    if not pending:
+        return
+    try:
+        with client.pipeline() as pipe:
+            for member, deltas in pending.items():
+                for field, value in deltas.items():
+                    pipe.hincrby(_key(member), PENDING_FIELD.format(field=field), value)
+            pipe.sadd(DIRTY_KEY, *pending)
+            pipe.execute()
+    except Exception as e:
+        logger.error(f"❌ Se perdieron los incrementos de {len(pending)} metas diarias: {pending} ({e})")
+
+
+def _discard(client, members):
+    try:
+        with client.pipeline() as pipe:
+            pipe.delete(*[_key(member) for member in members])
+            pipe.srem(DIRTY_KEY, *members)
+            pipe.execute()
+    except Exception as e:
+        # El hash queda adelantado hasta que expire (DAILY_GOAL_REDIS_TTL)
+        logger.warning(f"⚠️ No se pudieron descartar {len(members)} metas diarias de Redis: {e}")
+
+
+def _increment_redis(client, user, date, deltas):
+    try:
+        values = _run_script(client, user, date, deltas)
+    except Exception as e:
+        logger.warning(f"⚠️ Redis no disponible para la meta diaria, escribiendo en la base: {e}")
+        goal = _increment_db(user, date, deltas)
+        _sync_hash(client, user, date, deltas)
+        return goal
+    if deltas:
+        _ensure_flusher()
+    return _goal_from_hash(user, date, values)
+
+
+def _run_script(client, user, date, deltas):
+    """Aplica los incrementos; siembra el hash desde la base solo si no existía"""
+    pairs = [item for field_delta in deltas.items() for item in field_delta]
+    member = _member(user.id, date)
+    args = [settings.DAILY_GOAL_REDIS_TTL, member, *pairs]
+    keys = [_key(member), DIRTY_KEY]
+    values = client.eval(INCREMENT_SCRIPT, len(keys), *keys, '', *args)
+    if values is None:
+        seed = json.dumps(_seed_from_db(user, date))
+        values = client.eval(INCREMENT_SCRIPT, len(keys), *keys, seed, *args)
+    return values
+
+
+def _sync_hash(client, user, date, deltas):
+    """
+    Tras escribir en la base por un fallo de Redis, suma lo mismo a los contadores
+    del hash (si existe) para que la lectura no quede atrasada. No lo marca como
+    pendiente: ya está en la base.
+    """
+    if not deltas:
+        return
+    pairs = [item for field_delta in deltas.items() for item in field_delta]
+    keys = [_key(_member(user.id, date)), DIRTY_KEY]
+    try:
+        client.eval(INCREMENT_SCRIPT, len(keys), *keys, '', settings.DAILY_GOAL_REDIS_TTL, '', *pairs)
+    except Exception:
+        # Sigue caído: el hash se corrige al expirar y sembrarse de nuevo
+        pass
+
+
+def _seed_from_db(user, date):
+    row = DailyGoal.objects.filter(user=user, date=date).values('id', *COUNTER_FIELDS, *GOAL_FIELDS).first()
+    if row is None:
+        row = {'id': 0, **{field: 0 for field in COUNTER_FIELDS},
+               **{field: DailyGoal._meta.get_field(field).default for field in GOAL_FIELDS}}
+    return row
+
+
+def _decode(values):
+    """HGETALL como dict (de mapping o de lista plana [campo, valor, ...]) con enteros"""
+    if not isinstance(values, dict):
+        values = dict(zip(values[::2], values[1::2]))
+    return {
+        (k.decode() if isinstance(k, bytes) else k): int(v)
+        for k, v in values.items()
+    }
+
+
+def _goal_from_hash(user, date, values):
+    values = _decode(values)
+    return DailyGoal(
+        id=values.get('id') or None, user=user, date=date,
+        **{field: values.get(field, 0) for field in COUNTER_FIELDS + GOAL_FIELDS}
+    )
+
+
+def _increment_db(user, date, deltas):
+    """Upsert directo en la base (sin Redis): una sola sentencia"""
+    return DailyGoal.objects.increment(
+        user, date, **{name: deltas.get(field, 0) for name, field in zip(COUNTER_ARGS, COUNTER_FIELDS)}
+    )
+
+
+def _ensure_flusher():
+    """Arranca el hilo de volcado (uno por proceso, también tras un fork)"""
+    global _flusher, _pid
+    if _flusher is not None and _flusher.is_alive() and _pid == os.getpid():
+        return
+    with _lock:
+        if _flusher is not None and _flusher.is_alive() and _pid == os.getpid():
+            return
+        _pid = os.getpid()
+        _flusher = threading.Thread(target=_flush_loop, name='daily-goal-flusher', daemon=True)
+        _flusher.start()
+
+
+def _flush_loop():
+    stop = threading.Event()
+    while not stop.wait(settings.DAILY_GOAL_FLUSH_INTERVAL):
+        try:
+            while flush():
+                pass
+        except Exception as e:
+            logger.error(f"❌ Error en el volcado de metas diarias: {e}", exc_info=True)
+        finally:
+            connection.close()
@@ -1,60 +1,54 @@
 # translations/services/exercise_generator.py
-import openai
 import json
 import random
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
+from django.db import connection
 from ..models import ObjectTranslation, Exercise
+from . import llm_client
 
 logger = logging.getLogger(__name__)
 
 class ExerciseGeneratorService:
+    SYSTEM_PROMPT = "Eres un profesor especializado en la enseñanza del idioma Quechua."
+
     def __init__(self):
         # Obtener clave API de OpenAI desde settings
         self.api_key = getattr(settings, 'OPENAI_API_KEY', None)
-        self.client = None
+        # ✅ Cliente compartido por proceso (pool HTTP, timeouts y circuit breaker)
+        self.client = llm_client.get_openai_client()
         
-        if self.api_key:
-            try:
-                # ✅ CORRECCIÓN: Usar directamente la nueva versión de OpenAI 1.66.3
-                self.client = openai.OpenAI(api_key=self.api_key)
-                print("Cliente OpenAI (versión 1.66.3) inicializado correctamente")
-                logger.info("Cliente OpenAI inicializado")
-            except Exception as e:
-                logger.error(f"Error al inicializar cliente OpenAI: {str(e)}")
-                print(f"Error OpenAI: {str(e)}")
-        else:
+        if not self.api_key:
             logger.warning("No se encontró API key para OpenAI")
-            print("No se encontró API key para OpenAI")
        
     def generate_exercises(self, object_translation, user_level=1):
         """Genera diferentes tipos de ejercicios para un objeto traducido"""
-        exercises = []
-        
         # Verificar que tengamos un cliente OpenAI
         if not self.client or not self.api_key:
             logger.warning("API Key de OpenAI no configurada o cliente no inicializado")
-            print(f"API Key: {'Configurada' if self.api_key else 'No configurada'}")
-            print(f"Cliente: {'Inicializado' if self.client else 'No inicializado'}")
             return self._generate_fallback_exercises(object_translation, user_level)
         
+        # Si el circuit breaker está abierto, ir directo al respaldo
+        if not llm_client.breaker.is_available():
+            logger.warning("Circuit breaker de OpenAI abierto, usando ejercicios de respaldo")
+            return self._generate_fallback_exercises(object_translation, user_level)
+        
+        # Modo de generación: serial (una llamada tras otra), concurrent (llamadas
+        # en paralelo) o single (una sola llamada que devuelve todos los ejercicios)
+        generation_mode = getattr(settings, 'EXERCISE_GENERATION_MODE', 'serial')
+        
         try:
-            # Generar ejercicios usando ChatGPT
-            multiple_choice = self._generate_multiple_choice(object_translation, user_level)
-            if multiple_choice:
-                exercises.append(multiple_choice)
-                
-            fill_blanks = self._generate_fill_blanks(object_translation, user_level)
-            if fill_blanks:
-                exercises.append(fill_blanks)
-                
-            matching = self._generate_matching(object_translation, user_level)
-            if matching:
-                exercises.append(matching)
-                
-            pronunciation = self._generate_pronunciation(object_translation, user_level)
-            if pronunciation:
-                exercises.append(pronunciation)
+            if generation_mode == 'single':
+                exercises = self._generate_single_call(object_translation, user_level)
+            elif generation_mode == 'concurrent':
+                exercises = self._generate_concurrent(object_translation, user_level)
+            else:
+                exercises = [
+                    exercise for exercise in
+                    (generate(object_translation, user_level) for generate in self._llm_generators())
+                    if exercise
+                ]
             
             if not exercises:
                 logger.warning("No se generaron ejercicios con IA, usando respaldo")
@@ -68,6 +62,157 @@ class ExerciseGeneratorService:
             # Si hay error, usar respaldo
             return self._generate_fallback_exercises(object_translation, user_level)
     
+    def _llm_generators(self):
+        return (self._generate_multiple_choice, self._generate_fill_blanks,
+                self._generate_matching, self._generate_pronunciation)
+    
+    def _generate_concurrent(self, object_translation, user_level):
+        """Lanza las llamadas al LLM en paralelo: el tiempo total es el de la más lenta"""
+        generators = self._llm_generators()
+        with ThreadPoolExecutor(max_workers=len(generators)) as executor:
+            futures = [
+                executor.submit(self._run_in_thread, generate, object_translation, user_level)
+                for generate in generators
+            ]
+            results = [future.result() for future in futures]
+        return [exercise for exercise in results if exercise]
+    
+    @staticmethod
+    def _run_in_thread(generate, object_translation, user_level):
+        try:
+            return generate(object_translation, user_level)
+        except Exception as e:
+            # Un ejercicio fallido no debe tirar los demás al respaldo
+            logger.error(f"Error en generación concurrente ({generate.__name__}): {str(e)}", exc_info=True)
+            return None
+        finally:
+            # Cada hilo abre su propia conexión a la BD
+            connection.close()
+    
+    def _generate_single_call(self, object_translation, user_level):
+        """Genera selección múltiple, completar y pronunciación con una sola llamada"""
+        try:
+            other_quechua_str = ", ".join(
+                ObjectTranslation.objects.exclude(id=object_translation.id)
+                .order_by('?').values_list('quechua', flat=True)[:5]
+            )
+            
+            prompt = f"""
+            Genera tres ejercicios para aprender la palabra '{object_translation.quechua}' 
+            en Quechua que significa '{object_translation.spanish}' en español.
+            
+            El nivel del estudiante es {user_level} (donde 1 es principiante y 5 es avanzado).
+            
+            Considera las siguientes palabras en quechua para usar como distractores: {other_quechua_str}
+            
+            Responde con la siguiente estructura:
+            {{
+                "multiple_choice": {{
+                    "question": "Una pregunta en español sobre la palabra",
+                    "correct_answer": "{object_translation.quechua}",
+                    "distractors": ["distractor1", "distractor2", "distractor3"]
+                }},
+                "fill_blanks": {{
+                    "question": "Completa la palabra en quechua: _ _ _ _ (con algunas letras ya completadas)",
+                    "answer": "{object_translation.quechua}",
+                    "hint": "Una pista útil para el estudiante"
+                }},
+                "pronunciation": {{
+                    "instructions": "Instrucciones detalladas para pronunciar esta palabra",
+                    "phonetic_guide": "Una guía fonética simple"
+                }}
+            }}
+            
+            Para completar espacios muestra aproximadamente {6 - user_level} letras de la palabra.
+            
+            Solo responde con el JSON, sin texto adicional.
+            """
+            
+            data = json.loads(self._chat_completion(prompt))
+        except Exception as e:
+            logger.error(f"Error generando ejercicios en una sola llamada: {str(e)}", exc_info=True)
+            return []
+        
+        exercises = []
+        try:
+            mc = data['multiple_choice']
+            exercises.append(Exercise(
+                type='multiple_choice',
+                object_translation=object_translation,
+                difficulty=user_level,
+                question=mc['question'],
+                answer=mc['correct_answer'],
+                distractors=mc['distractors']
+            ))
+            fb = data['fill_blanks']
+            exercises.append(Exercise(
+                type='fill_blanks',
+                object_translation=object_translation,
+                difficulty=user_level,
+                question=fb['question'],
+                answer=fb['answer'],
+                distractors={"hint": fb['hint']}
+            ))
+        except (KeyError, TypeError) as e:
+            logger.error(f"Respuesta incompleta en llamada única: {str(e)}")
+        
+        # Relacionar no necesita al LLM
+        matching = self._generate_matching(object_translation, user_level)
+        if matching:
+            exercises.append(matching)
+        
+        try:
+            pr = data['pronunciation']
+            exercises.append(Exercise(
+                type='pronunciation',
+                object_translation=object_translation,
+                difficulty=user_level,
+                question=f"Practica la pronunciación de la palabra '{object_translation.quechua}'. {pr['instructions']}",
+                answer=object_translation.quechua,
+                distractors={"phonetic_guide": pr['phonetic_guide']}
+            ))
+        except (KeyError, TypeError) as e:
+            logger.error(f"Respuesta incompleta en llamada única: {str(e)}")
+        
+        return exercises
+    
+    def iter_exercises(self, object_translation, user_level=1):
+        """
+        Genera ejercicios de forma incremental para entrega en streaming.
+        Primero los de respaldo (una sola lectura a la BD) y luego, si el LLM
+        está disponible, los mejorados con IA a medida que van llegando.
+        Produce tuplas (origen, ejercicio) con origen 'fallback' o 'llm'.
+        """
+        for exercise in self._generate_fallback_exercises(object_translation, user_level):
+            yield 'fallback', exercise
+        
+        if not self.client or not self.api_key:
+            return
+        
+        for generate in self._llm_generators():
+            # Si el breaker se abre a mitad de camino, no seguir esperando al LLM
+            if not llm_client.breaker.is_available():
+                logger.warning("Circuit breaker de OpenAI abierto, se omiten ejercicios de IA")
+                return
+            exercise = generate(object_translation, user_level)
+            if exercise:
+                yield 'llm', exercise
+    
+    def _chat_completion(self, prompt):
+        """Llama a ChatGPT a través del cliente compartido y limpia la respuesta JSON"""
+        content = llm_client.chat_completion([
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ])
+        
+        # Limpiar la respuesta para asegurar que sea JSON válido
+        content = content.strip()
+        if content.startswith("```json"):
+            content = content[7:]
+        if content.endswith("```"):
+            content = content[:-3]
+        return content.strip()
+    
     def _generate_multiple_choice(self, object_translation, user_level):
         """Genera ejercicio de selección múltiple usando ChatGPT"""
         try:
@@ -97,24 +242,7 @@ class ExerciseGeneratorService:
             Solo responde con el JSON, sin texto adicional.
             """
             
-            # ✅ CORRECCIÓN: Usar la nueva sintaxis de OpenAI 1.66.3
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "Eres un profesor especializado en la enseñanza del idioma Quechua."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7
-            )
-            content = response.choices[0].message.content
-            
-            # Limpiar la respuesta para asegurar que sea JSON válido
-            content = content.strip()
-            if content.startswith("```json"):
-                content = content[7:]
-            if content.endswith("```"):
-                content = content[:-3]
-            content = content.strip()
+            content = self._chat_completion(prompt)
             
             print(f"Respuesta de ChatGPT para ejercicio múltiple choice: {content}")
             exercise_data = json.loads(content)
@@ -157,24 +285,7 @@ class ExerciseGeneratorService:
             Solo responde con el JSON, sin texto adicional.
             """
             
-            # ✅ CORRECCIÓN: Usar la nueva sintaxis de OpenAI 1.66.3
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "Eres un profesor especializado en la enseñanza del idioma Quechua."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7
-            )
-            content = response.choices[0].message.content
-            
-            # Limpiar la respuesta para asegurar que sea JSON válido
-            content = content.strip()
-            if content.startswith("```json"):
-                content = content[7:]
-            if content.endswith("```"):
-                content = content[:-3]
-            content = content.strip()
+            content = self._chat_completion(prompt)
             
             print(f"Respuesta de ChatGPT para ejercicio fill blanks: {content}")
             exercise_data = json.loads(content)
@@ -252,24 +363,7 @@ class ExerciseGeneratorService:
             Solo responde con el JSON, sin texto adicional.
             """
             
-            # ✅ CORRECCIÓN: Usar la nueva sintaxis de OpenAI 1.66.3
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "Eres un profesor especializado en la enseñanza del idioma Quechua."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7
-            )
-            content = response.choices[0].message.content
-            
-            # Limpiar la respuesta para asegurar que sea JSON válido
-            content = content.strip()
-            if content.startswith("```json"):
-                content = content[7:]
-            if content.endswith("```"):
-                content = content[:-3]
-            content = content.strip()
+            content = self._chat_completion(prompt)
             
             print(f"Respuesta de ChatGPT para ejercicio de pronunciación: {content}")
             exercise_data = json.loads(content)
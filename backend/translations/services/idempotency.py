@@ -0,0 +1,112 @@
+# translations/services/idempotency.py
+"""
+Soporte de la cabecera Idempotency-Key para escrituras que los clientes móviles
+reintentan (submit_answer, submit_answers, detect, record_progress, sync).
+
+La primera petición con una clave la marca "en curso" con SET NX (cache.add) y,
+al terminar, guarda la respuesta serializada por IDEMPOTENCY_TTL segundos. Un
+reintento con la misma clave devuelve esa respuesta sin ejecutar la vista; si
+la primera sigue en curso responde 409. Las respuestas 5xx no se guardan, así
+que el cliente puede reintentar. Sin Redis disponible la vista se ejecuta
+normalmente.
+"""
+import functools
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+IN_FLIGHT = 'in_flight'
+
+
+def idempotent(view_method):
+    """Decorador para acciones POST de un ViewSet (debajo de @action)"""
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH or not key.isprintable():
+            return Response({'error': f'{HEADER} no válida'}, status=status.HTTP_400_BAD_REQUEST)
+
+        cache_key = _cache_key(request, key)
+        fingerprint = _fingerprint(request)
+        claimed = cache.add(
+            cache_key, {'state': IN_FLIGHT, 'fingerprint': fingerprint}, settings.IDEMPOTENCY_LOCK_TTL
+        )
+        if claimed is None:
+            # Redis caído (IGNORE_EXCEPTIONS): mejor procesar que rechazar
+            logger.warning("⚠️ Idempotencia no disponible, procesando sin clave")
+            return view_method(self, request, *args, **kwargs)
+        if not claimed:
+            return _replay(cache.get(cache_key), fingerprint)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+
+        if response.status_code >= 500 or getattr(response, 'streaming', False):
+            cache.delete(cache_key)
+            return response
+
+        cache.set(cache_key, {
+            'state': 'done',
+            'fingerprint': fingerprint,
+            'status': response.status_code,
+            'body': json.dumps(response.data, cls=JSONEncoder),
+        }, settings.IDEMPOTENCY_TTL)
+        return response
+
+    return wrapper
+
+
+def _replay(stored, fingerprint):
+    if not stored:
+        # Expiró entre el SET NX y la lectura: tratar como en curso
+        stored = {'state': IN_FLIGHT, 'fingerprint': fingerprint}
+    if stored.get('fingerprint') != fingerprint:
+        return Response(
+            {'error': f'{HEADER} ya se usó con otra petición'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    if stored['state'] == IN_FLIGHT:
+        response = Response(
+            {'error': 'La petición original todavía se está procesando'},
+            status=status.HTTP_409_CONFLICT
+        )
+        response['Retry-After'] = '1'
+        return response
+
+    response = Response(json.loads(stored['body']), status=stored['status'])
+    response[REPLAY_HEADER] = 'true'
+    return response
+
+
+def _cache_key(request, key):
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return f"idempotency:{request.user.pk}:{request.method}:{request.path}:{digest}"
+
+
+def _fingerprint(request):
+    """Huella del cuerpo: misma clave con otro contenido es un error del cliente"""
+    data = request.data
+    if hasattr(data, 'getlist'):
+        parts = {name: data.getlist(name) for name in data.keys() if name not in request.FILES}
+    else:
+        parts = data
+    files = {name: [f.name, f.size] for name, f in request.FILES.items()}
+    payload = json.dumps({'data': parts, 'files': files}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
@@ -0,0 +1,296 @@
+# translations/services/llm_client.py
+"""
+Cliente OpenAI compartido por proceso.
+
+- Un solo `openai.OpenAI` (y su pool HTTP) por worker, con timeouts explícitos.
+- Presupuesto de reintentos: los reintentos no pueden superar un porcentaje
+  de las llamadas recientes, para no multiplicar la carga cuando el proveedor falla.
+- Circuit breaker: tras varios fallos consecutivos o llamadas demasiado lentas
+  se abre y los generadores pasan directo a los ejercicios de respaldo; después
+  de un tiempo deja pasar una llamada de prueba (half-open) para detectar la
+  recuperación.
+"""
+import threading
+import time
+import logging
+from collections import deque
+
+import httpx
+import openai
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class CircuitOpenError(Exception):
+    """La llamada se rechazó porque el circuit breaker está abierto"""
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, failure_threshold=5, latency_threshold=8.0, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.latency_threshold = latency_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+        self.counters = {
+            'calls': 0,
+            'successes': 0,
+            'failures': 0,
+            'slow_calls': 0,
+            'short_circuited': 0,
+            'opened': 0,
+        }
+
+    def is_available(self):
+        """Indica si vale la pena intentar el LLM (no consume la llamada de prueba)"""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at >= self.reset_timeout
+            if self.state == self.HALF_OPEN:
+                return not self._probe_in_flight
+            return True
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.counters['short_circuited'] += 1
+                    return False
+                self._transition(self.HALF_OPEN)
+
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    self.counters['short_circuited'] += 1
+                    return False
+                self._probe_in_flight = True
+
+            self.counters['calls'] += 1
+            return True
+
+    def record_success(self, latency):
+        with self._lock:
+            self._probe_in_flight = False
+            if latency > self.latency_threshold:
+                # Una respuesta demasiado lenta cuenta como fallo para el breaker
+                self.counters['slow_calls'] += 1
+                self._register_failure()
+                return
+
+            self.counters['successes'] += 1
+            self.consecutive_failures = 0
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._probe_in_flight = False
+            self.counters['failures'] += 1
+            self._register_failure()
+
+    def _register_failure(self):
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._transition(self.OPEN)
+
+    def _transition(self, new_state):
+        if new_state == self.state:
+            return
+        logger.warning(f"🔌 Circuit breaker OpenAI: {self.state} -> {new_state}")
+        self.state = new_state
+        if new_state == self.OPEN:
+            self.opened_at = time.monotonic()
+            self.counters['opened'] += 1
+        elif new_state == self.CLOSED:
+            self.consecutive_failures = 0
+            self.opened_at = None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'state_value': self.STATE_VALUES[self.state],
+                'consecutive_failures': self.consecutive_failures,
+                'seconds_open': round(time.monotonic() - self.opened_at, 1) if self.opened_at else 0,
+                **self.counters,
+            }
+
+
+class RetryBudget:
+    """Permite reintentos solo mientras sean una fracción de las llamadas recientes"""
+
+    def __init__(self, ratio=0.2, window=60.0, min_retries=3):
+        self.ratio = ratio
+        self.window = window
+        self.min_retries = min_retries
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+        self.exhausted = 0
+
+    def _trim(self, now):
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+    def record_request(self):
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            allowed = max(self.min_retries, self.ratio * len(self._requests))
+            if len(self._retries) >= allowed:
+                self.exhausted += 1
+                return False
+            self._retries.append(now)
+            return True
+
+    def snapshot(self):
+        with self._lock:
+            self._trim(time.monotonic())
+            return {
+                'requests_in_window': len(self._requests),
+                'retries_in_window': len(self._retries),
+                'retry_budget_exhausted': self.exhausted,
+            }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+breaker = CircuitBreaker(
+    failure_threshold=getattr(settings, 'OPENAI_BREAKER_FAILURE_THRESHOLD', 5),
+    latency_threshold=getattr(settings, 'OPENAI_BREAKER_LATENCY_THRESHOLD', 8.0),
+    reset_timeout=getattr(settings, 'OPENAI_BREAKER_RESET_TIMEOUT', 30.0),
+)
+retry_budget = RetryBudget(ratio=getattr(settings, 'OPENAI_RETRY_BUDGET_RATIO', 0.2))
+
+
+def get_openai_client():
+    """Devuelve el cliente OpenAI del proceso (None si no hay API key)"""
+    global _client
+
+    if _client is not None:
+        return _client
+
+    api_key = getattr(settings, 'OPENAI_API_KEY', None)
+    if not api_key:
+        return None
+
+    with _client_lock:
+        if _client is None:
+            timeout = httpx.Timeout(
+                getattr(settings, 'OPENAI_READ_TIMEOUT', 20.0),
+                connect=getattr(settings, 'OPENAI_CONNECT_TIMEOUT', 5.0),
+            )
+            max_connections = getattr(settings, 'OPENAI_POOL_MAX_CONNECTIONS', 10)
+            http_client = httpx.Client(
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                ),
+            )
+            # Los reintentos los controla chat_completion() con el presupuesto.
+            # OPENAI_BASE_URL permite apuntar a otro transporte (p. ej. llm_standin)
+            _client = openai.OpenAI(
+                api_key=api_key,
+                base_url=getattr(settings, 'OPENAI_BASE_URL', None) or None,
+                timeout=timeout,
+                max_retries=0,
+                http_client=http_client,
+            )
+            logger.info(f"Cliente OpenAI compartido inicializado ({_client.base_url})")
+    return _client
+
+
+def reset_client():
+    """Descarta el cliente y el estado del breaker (al cambiar de configuración)"""
+    global _client, breaker, retry_budget
+
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        breaker = CircuitBreaker(
+            failure_threshold=getattr(settings, 'OPENAI_BREAKER_FAILURE_THRESHOLD', 5),
+            latency_threshold=getattr(settings, 'OPENAI_BREAKER_LATENCY_THRESHOLD', 8.0),
+            reset_timeout=getattr(settings, 'OPENAI_BREAKER_RESET_TIMEOUT', 30.0),
+        )
+        retry_budget = RetryBudget(ratio=getattr(settings, 'OPENAI_RETRY_BUDGET_RATIO', 0.2))
+
+
+def is_llm_available():
+    return get_openai_client() is not None and breaker.is_available()
+
+
+def chat_completion(messages, model="gpt-3.5-turbo", temperature=0.7):
+    """
+    Ejecuta una llamada de chat pasando por el breaker y el presupuesto de reintentos.
+    Devuelve el contenido del primer mensaje o lanza la excepción final.
+    """
+    client = get_openai_client()
+    if client is None:
+        raise CircuitOpenError("Cliente OpenAI no configurado")
+
+    max_retries = getattr(settings, 'OPENAI_MAX_RETRIES', 2)
+    retry_budget.record_request()
+    attempt = 0
+
+    while True:
+        if not breaker.allow_request():
+            raise CircuitOpenError("Circuit breaker de OpenAI abierto")
+
+        started = time.monotonic()
+        try:
+            response = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+            )
+        except RETRYABLE_ERRORS as e:
+            breaker.record_failure()
+            if attempt < max_retries and retry_budget.try_acquire():
+                attempt += 1
+                logger.warning(f"Reintentando llamada OpenAI ({attempt}/{max_retries}): {str(e)}")
+                time.sleep(min(0.25 * (2 ** attempt), 2.0))
+                continue
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+
+        breaker.record_success(time.monotonic() - started)
+        return response.choices[0].message.content
+
+
+def get_metrics():
+    """Métricas del breaker y del presupuesto de reintentos de este proceso"""
+    return {
+        'configured': get_openai_client() is not None,
+        'breaker': breaker.snapshot(),
+        'retries': retry_budget.snapshot(),
+    }
@@ -0,0 +1,249 @@
+# translations/services/llm_standin.py
+"""
+Servidor local que imita `POST /v1/chat/completions` de OpenAI.
+
+Reproduce respuestas grabadas (llm_recordings.json o un archivo propio) con
+latencia y errores configurables, para hacer benchmarks y pruebas de carga de
+ExerciseGeneratorService sin llamar a OpenAI. Se usa con OPENAI_BASE_URL
+apuntando a http://<host>:<port>/v1 (ver `manage.py llm_standin`).
+"""
+import json
+import math
+import random
+import re
+import threading
+import time
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RECORDINGS = Path(__file__).with_name('llm_recordings.json')
+
+WORD_PATTERN = re.compile(r"palabra '(?P<quechua>[^']+)'\s+en Quechua que significa '(?P<spanish>[^']+)'")
+
+
+def classify_prompt(prompt):
+    """Tipo de ejercicio que pide el prompt (clave en el archivo de grabaciones)"""
+    if 'Genera tres ejercicios' in prompt:
+        return 'single'
+    if 'selección múltiple' in prompt:
+        return 'multiple_choice'
+    if 'completar espacios' in prompt:
+        return 'fill_blanks'
+    if 'pronunciación' in prompt:
+        return 'pronunciation'
+    return 'default'
+
+
+class LatencyModel:
+    """Latencia simulada: fixed, normal o lognormal (segundos)"""
+
+    def __init__(self, distribution='lognormal', mean=1.0, stddev=0.3, rng=None):
+        self.distribution = distribution
+        self.mean = max(0.0, mean)
+        self.stddev = max(0.0, stddev)
+        self.rng = rng or random.Random()
+
+    def sample(self):
+        if self.distribution == 'fixed' or self.mean == 0 or self.stddev == 0:
+            return self.mean
+        if self.distribution == 'normal':
+            return max(0.0, self.rng.gauss(self.mean, self.stddev))
+        # lognormal con la media y desviación pedidas (cola larga, como una API real)
+        sigma2 = math.log(1 + (self.stddev / self.mean) ** 2)
+        mu = math.log(self.mean) - sigma2 / 2
+        return self.rng.lognormvariate(mu, math.sqrt(sigma2))
+
+
+class StandinConfig:
+    def __init__(self, recordings=None, latency=None, error_rate=0.0, error_statuses=(429, 500, 503),
+                 malformed_rate=0.0, stall_rate=0.0, stall_seconds=30.0, seed=None):
+        self.rng = random.Random(seed)
+        self.recordings = load_recordings(recordings or DEFAULT_RECORDINGS)
+        self.latency = latency or LatencyModel(rng=self.rng)
+        self.latency.rng = self.rng
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses) or (500,)
+        self.malformed_rate = malformed_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'errors': 0, 'malformed': 0, 'stalled': 0}
+
+    def count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def draw(self):
+        """Decide el resultado de una petición: 'ok', 'error', 'malformed' o 'stall'"""
+        with self._lock:
+            roll = self.rng.random()
+        if roll < self.error_rate:
+            return 'error'
+        roll -= self.error_rate
+        if roll < self.malformed_rate:
+            return 'malformed'
+        roll -= self.malformed_rate
+        if roll < self.stall_rate:
+            return 'stall'
+        return 'ok'
+
+    def completion_for(self, prompt):
+        kind = classify_prompt(prompt)
+        templates = self.recordings.get(kind) or self.recordings.get('default') or ['{}']
+        with self._lock:
+            content = self.rng.choice(templates)
+
+        match = WORD_PATTERN.search(prompt)
+        if match:
+            content = content.replace('{quechua}', match.group('quechua'))
+            content = content.replace('{spanish}', match.group('spanish'))
+        return content
+
+    def describe(self):
+        return {
+            'latency_distribution': self.latency.distribution,
+            'latency_mean': self.latency.mean,
+            'latency_stddev': self.latency.stddev,
+            'error_rate': self.error_rate,
+            'error_statuses': list(self.error_statuses),
+            'malformed_rate': self.malformed_rate,
+            'stall_rate': self.stall_rate,
+            'stall_seconds': self.stall_seconds,
+        }
+
+
+def load_recordings(path):
+    """
+    Carga las respuestas grabadas: {"multiple_choice": ["<contenido>", ...], ...}.
+    Los marcadores {quechua} y {spanish} se reemplazan con la palabra del prompt.
+    """
+    with open(path, encoding='utf-8') as f:
+        recordings = json.load(f)
+    return {
+        kind: [c if isinstance(c, str) else json.dumps(c, ensure_ascii=False) for c in contents]
+        for kind, contents in recordings.items()
+    }
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server_version = 'LLMStandin/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        config = self.server.config
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._send(400, {'error': {'message': 'JSON inválido', 'type': 'invalid_request_error'}})
+
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self._send(404, {'error': {'message': f'Ruta no soportada: {self.path}'}})
+
+        config.count('requests')
+        outcome = config.draw()
+        time.sleep(config.latency.sample())
+
+        if outcome == 'stall':
+            # Más allá del timeout de lectura del cliente
+            config.count('stalled')
+            time.sleep(config.stall_seconds)
+        if outcome == 'error':
+            config.count('errors')
+            status = config.rng.choice(config.error_statuses)
+            return self._send(status, {'error': {'message': 'Error simulado', 'type': 'server_error', 'code': status}})
+
+        prompt = ' '.join(m.get('content', '') for m in payload.get('messages', []) if m.get('role') == 'user')
+        if outcome == 'malformed':
+            config.count('malformed')
+            content = 'Lo siento, no puedo generar el ejercicio en este momento.'
+        else:
+            content = config.completion_for(prompt)
+
+        self._send(200, {
+            'id': f"chatcmpl-standin-{config.counters['requests']}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': payload.get('model', 'gpt-3.5-turbo'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(content) // 4,
+                      'total_tokens': (len(prompt) + len(content)) // 4},
+        })
+
+    def _send(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente se rindió (timeout): no es un error del stand-in
+            pass
+
+    def log_message(self, format, *args):
+        logger.debug(f"llm_standin: {format % args}")
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config, host='127.0.0.1', port=0):
+        super().__init__((host, port), StandinHandler)
+        self.config = config
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start_in_background(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def add_standin_arguments(parser):
+    """Opciones comunes de llm_standin y benchmark_generation"""
+    parser.add_argument('--recordings', default=str(DEFAULT_RECORDINGS),
+                        help='Archivo JSON con respuestas grabadas por tipo de ejercicio')
+    parser.add_argument('--latency-dist', choices=['fixed', 'normal', 'lognormal'], default='lognormal',
+                        help='Distribución de la latencia simulada (default: lognormal)')
+    parser.add_argument('--latency-mean', type=float, default=1.0,
+                        help='Latencia media por llamada en segundos (default: 1.0)')
+    parser.add_argument('--latency-stddev', type=float, default=0.3,
+                        help='Desviación estándar de la latencia en segundos (default: 0.3)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fracción de llamadas que responden con error HTTP (default: 0)')
+    parser.add_argument('--error-statuses', default='429,500,503',
+                        help='Códigos HTTP de error, separados por coma (default: 429,500,503)')
+    parser.add_argument('--malformed-rate', type=float, default=0.0,
+                        help='Fracción de respuestas con contenido que no es JSON (default: 0)')
+    parser.add_argument('--stall-rate', type=float, default=0.0,
+                        help='Fracción de llamadas que se cuelgan más allá del timeout (default: 0)')
+    parser.add_argument('--stall-seconds', type=float, default=30.0,
+                        help='Duración de una llamada colgada en segundos (default: 30)')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Semilla para que las corridas sean reproducibles')
+
+
+def config_from_options(options):
+    return StandinConfig(
+        recordings=options['recordings'],
+        latency=LatencyModel(options['latency_dist'], options['latency_mean'], options['latency_stddev']),
+        error_rate=options['error_rate'],
+        error_statuses=[int(code) for code in options['error_statuses'].split(',') if code.strip()],
+        malformed_rate=options['malformed_rate'],
+        stall_rate=options['stall_rate'],
+        stall_seconds=options['stall_seconds'],
+        seed=options['seed'],
+    )
@@ -0,0 +1,150 @@
+# translations/services/log_partitions.py
+"""
+Particiones mensuales de ActivityLog (PostgreSQL).
+
+La migración 0010 convierte translations_activitylog en una tabla particionada
+por rango de timestamp: una partición por mes (translations_activitylog_pAAAAMM,
+límites en UTC) y una DEFAULT para lo que caiga fuera. Este módulo crea las
+particiones de los meses que vienen y retira las vencidas: borrar los registros
+de hace más de ACTIVITY_LOG_RETENTION_DAYS días es entonces un DETACH/DROP de
+tablas enteras en lugar de un DELETE fila por fila. `manage.py
+activity_log_partitions` lo ejecuta (pensado para un cron mensual).
+
+En otras bases (SQLite en desarrollo) la tabla no está particionada y cleanup()
+borra por lotes.
+"""
+import logging
+import re
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from ..models import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+TABLE = ActivityLog._meta.db_table
+PARTITION_NAME = re.compile(rf'^{TABLE}_p(\d{{4}})(\d{{2}})$')
+DELETE_BATCH = 5000
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s", [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def partitions():
+    """{mes (date del día 1): nombre} de las particiones mensuales existentes"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s", [TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    months = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return months
+
+
+def ensure_partitions(months_ahead=None):
+    """Crea las particiones del mes actual y de los `months_ahead` siguientes; devuelve las creadas"""
+    if not is_partitioned():
+        return []
+    if months_ahead is None:
+        months_ahead = settings.ACTIVITY_LOG_PARTITIONS_AHEAD
+
+    existing = partitions()
+    month = _month_start(timezone.now())
+    created = []
+    for _ in range(months_ahead + 1):
+        upper = _next_month(month)
+        if month not in existing:
+            name = f'{TABLE}_p{month:%Y%m}'
+            try:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(
+                        f"CREATE TABLE {name} PARTITION OF {TABLE} "
+                        f"FOR VALUES FROM ('{_bound(month).isoformat()}') TO ('{_bound(upper).isoformat()}')"
+                    )
+                created.append(name)
+            except DatabaseError as e:
+                # Normalmente: la partición DEFAULT ya tiene filas de ese mes
+                logger.error(f"❌ No se pudo crear la partición {name}: {e}")
+        month = upper
+
+    if created:
+        logger.info(f"🗂️ Particiones de ActivityLog creadas: {', '.join(created)}")
+    return created
+
+
+def drop_partitions_before(cutoff, detach_only=False):
+    """
+    Retira las particiones mensuales que terminan antes de `cutoff`: DETACH y
+    DROP, o solo DETACH (quedan como tablas sueltas para archivarlas).
+    Devuelve sus nombres.
+    """
+    if not is_partitioned():
+        return []
+
+    removed = []
+    for month, name in sorted(partitions().items()):
+        if _bound(_next_month(month)) > cutoff:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {name}')
+            if not detach_only:
+                cursor.execute(f'DROP TABLE {name}')
+        removed.append(name)
+
+    if removed:
+        action = 'separadas' if detach_only else 'eliminadas'
+        logger.info(f"🗑️ Particiones de ActivityLog {action}: {', '.join(removed)}")
+    return removed
+
+
+def cleanup(cutoff=None, detach_only=False):
+    """
+    Elimina los registros anteriores a `cutoff` (default: hace
+    ACTIVITY_LOG_RETENTION_DAYS días). Particionada: retira los meses
+    completos y borra solo el resto del mes del corte. Devuelve
+    {'partitions': [...], 'rows': filas borradas con DELETE}.
+    """
+    if cutoff is None:
+        cutoff = timezone.now() - timedelta(days=settings.ACTIVITY_LOG_RETENTION_DAYS)
+
+    removed = drop_partitions_before(cutoff, detach_only=detach_only) if is_partitioned() else []
+    rows = 0
+    while True:
+        ids = list(
+            ActivityLog.objects.filter(timestamp__lt=cutoff).values_list('id', flat=True)[:DELETE_BATCH]
+        )
+        if not ids:
+            break
+        rows += ActivityLog.objects.filter(id__in=ids).delete()[0]
+
+    return {'partitions': removed, 'rows': rows}
+
+
+def _month_start(value):
+    value = value.astimezone(dt_timezone.utc)
+    return date(value.year, value.month, 1)
+
+
+def _next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _bound(month):
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
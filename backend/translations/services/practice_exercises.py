@@ -0,0 +1,264 @@
+# translations/services/practice_exercises.py
+"""
+Construcción de sesiones de práctica por categoría y prefetch especulativo.
+
+Cuando una sesión de práctica supera cierto porcentaje de avance, se prepara en
+segundo plano la siguiente sesión probable (misma categoría y modo, priorizando
+las palabras con menos dominio del usuario) y se guarda en caché con un TTL
+corto. La siguiente llamada a get_exercises_by_category / random_exercises
+solo tiene que sacarla de la caché e insertarla.
+"""
+import random
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.functions import Lower
+
+from ..models import ObjectTranslation, Exercise, ExerciseSession, ExerciseSessionLog, UserVocabulary
+
+logger = logging.getLogger(__name__)
+
+# Tipo de ejercicio fijo por categoría de práctica
+CATEGORY_EXERCISE_TYPES = {
+    'vocabulary': 'anagram',
+    'phrases': 'fill_blanks',
+    'memory': 'matching',
+    'pronunciation': 'pronunciation',
+}
+
+TIME_LIMITS = {
+    'multiple_choice': 30,
+    'fill_blanks': 45,
+    'anagram': 60,
+    'pronunciation': 60,
+    'matching': 90
+}
+
+PREFETCH_KEY = 'practice_prefetch:{user_id}:{category}:{mode}'
+PREFETCH_LOCK_KEY = 'practice_prefetch:lock:{session_id}'
+
+# Tamaño de sesión que se prepara por adelantado (cubre ambos endpoints)
+PREFETCH_SESSION_SIZE = 10
+
+
+def exercise_type_for(category):
+    return CATEGORY_EXERCISE_TYPES.get(category, 'multiple_choice')
+
+
+def generate_question(exercise_type, translation):
+    questions = {
+        'multiple_choice': f"¿Cómo se dice '{translation.spanish}' en quechua?",
+        'fill_blanks': f"Completa la palabra en quechua para '{translation.spanish}'",
+        'anagram': f"Ordena las letras para formar la palabra en quechua que significa '{translation.spanish}'",
+        'pronunciation': f"Practica la pronunciación de la palabra '{translation.quechua}' que significa '{translation.spanish}'",
+        'matching': f"Relaciona las palabras en español con su traducción en quechua"
+    }
+    return questions.get(exercise_type, "Práctica de quechua")
+
+
+def generate_distractors(exercise_type, translation, pool=None):
+    """
+    Distractores del ejercicio. Si se pasa `pool` (traducciones ya cargadas)
+    se eligen de ahí en lugar de hacer una consulta aleatoria por ejercicio.
+    """
+    if exercise_type not in ('multiple_choice', 'matching'):
+        if exercise_type == 'fill_blanks':
+            return {'hint': f"La palabra tiene {len(translation.quechua)} letras"}
+        return None
+
+    if pool is None:
+        others = list(ObjectTranslation.objects.exclude(id=translation.id).order_by('?')[:3])
+    else:
+        candidates = [t for t in pool if t.id != translation.id]
+        others = random.sample(candidates, min(3, len(candidates)))
+
+    if exercise_type == 'multiple_choice':
+        return [t.quechua for t in others]
+
+    # Cada par con un ID único
+    pairs = [{'id': 1, 'spanish': translation.spanish, 'quechua': translation.quechua}]
+    for i, trans in enumerate(others, start=2):
+        pairs.append({'id': i, 'spanish': trans.spanish, 'quechua': trans.quechua})
+    return {'pairs': pairs}
+
+
+def get_time_limit(exercise_type):
+    return TIME_LIMITS.get(exercise_type, 30)
+
+
+def select_translations(category, count, user=None, phrases_only=False, exclude_ids=()):
+    """
+    Elige las traducciones de la sesión. Con `user`, la mitad de la sesión se
+    llena con las palabras que menos domina (las que más necesita practicar).
+    """
+    base = ObjectTranslation.objects.exclude(id__in=exclude_ids)
+    if phrases_only:
+        base = base.filter(spanish__contains=' ')
+
+    selected = []
+    if user is not None:
+        weak_words = list(
+            UserVocabulary.objects.filter(user=user, mastery_level__lte=2)
+            .order_by('mastery_level', 'last_practiced')
+            .values_list('quechua_word', flat=True)[:count * 2]
+        )
+        if weak_words:
+            weak = list(
+                base.annotate(quechua_lower=Lower('quechua'))
+                .filter(quechua_lower__in=weak_words)
+                .order_by('?')[:(count + 1) // 2]
+            )
+            selected.extend(weak)
+
+    remaining = count - len(selected)
+    if remaining > 0:
+        selected.extend(base.exclude(id__in=[t.id for t in selected]).order_by('?')[:remaining])
+
+    random.shuffle(selected)
+    return selected
+
+
+def build_exercise_specs(translations, category, mode, difficulty):
+    """Valores de cada ejercicio (sin guardar), serializables para la caché"""
+    exercise_type = exercise_type_for(category)
+    pool = None
+    if exercise_type in ('multiple_choice', 'matching'):
+        # Una sola consulta para los distractores de toda la sesión
+        pool = list(ObjectTranslation.objects.order_by('?')[:len(translations) + 4])
+
+    specs = []
+    for trans in translations:
+        specs.append({
+            'type': exercise_type,
+            'category': category,
+            'object_translation_id': trans.id,
+            'difficulty': difficulty,
+            'question': generate_question(exercise_type, trans),
+            'answer': trans.quechua,
+            'distractors': generate_distractors(exercise_type, trans, pool),
+            'metadata': {
+                'category': category,
+                'time_limit': get_time_limit(exercise_type),
+                'practice_mode': True,
+                'mode': mode
+            }
+        })
+    return specs
+
+
+def create_session_exercises(user, specs, mode):
+    """
+    Inserta los ejercicios y, si hay usuario autenticado, la sesión con sus logs.
+    Devuelve (session, exercises).
+    """
+    session = None
+    if user is not None and user.is_authenticated:
+        session = ExerciseSession.objects.create(
+            user=user,
+            mode=mode,
+            exercises_total=len(specs)
+        )
+
+    exercises = []
+    for spec in specs:
+        metadata = dict(spec['metadata'])
+        if session:
+            metadata['session_id'] = session.id
+        exercises.append(Exercise(**{**spec, 'metadata': metadata}))
+    exercises = Exercise.objects.bulk_create(exercises)
+
+    if session:
+        ExerciseSessionLog.objects.bulk_create([
+            ExerciseSessionLog(session=session, exercise=exercise) for exercise in exercises
+        ])
+
+    return session, exercises
+
+
+def session_specs(user, category, mode, count, phrases_only=False):
+    """
+    Ejercicios (sin guardar) de una sesión nueva: los preparados por adelantado
+    y, si no alcanzan, se completan con traducciones que no estén ya en la sesión.
+    """
+    specs = pop_prefetched_specs(user, category, mode, count) or []
+    if len(specs) < count:
+        translations = select_translations(
+            category, count - len(specs), phrases_only=phrases_only,
+            exclude_ids=[spec['object_translation_id'] for spec in specs]
+        )
+        difficulty = user.profile.current_level if user is not None and user.is_authenticated else 1
+        specs += build_exercise_specs(translations, category, mode, difficulty)
+    return specs
+
+
+# ----------------------------------------------------------------------
+# Prefetch especulativo
+# ----------------------------------------------------------------------
+
+def pop_prefetched_specs(user, category, mode, count):
+    """
+    Saca de la caché hasta `count` ejercicios de la sesión preparada por
+    adelantado (None si no hay); puede devolver menos de `count`.
+    """
+    if not getattr(settings, 'PRACTICE_PREFETCH_ENABLED', True):
+        return None
+    if user is None or not user.is_authenticated:
+        return None
+
+    key = PREFETCH_KEY.format(user_id=user.id, category=category, mode=mode)
+    specs = cache.get(key)
+    # Solo quien logra borrar la clave usa la sesión (evita entregarla dos veces)
+    if not specs or not cache.delete(key):
+        return None
+
+    logger.info(f"⚡ Sesión de práctica prefetch usada: usuario {user.id}, {category}/{mode} "
+                f"({min(len(specs), count)}/{count} ejercicios)")
+    return specs[:count]
+
+
+def maybe_prefetch_next_session(user, session, category):
+    """
+    Programa la preparación de la siguiente sesión si la actual superó el
+    porcentaje de avance configurado. Solo se dispara una vez por sesión.
+    """
+    if not getattr(settings, 'PRACTICE_PREFETCH_ENABLED', True):
+        return
+    if category not in CATEGORY_EXERCISE_TYPES or not session.exercises_total:
+        return
+
+    ratio = session.exercises_completed / session.exercises_total
+    if ratio < getattr(settings, 'PRACTICE_PREFETCH_COMPLETION_RATIO', 0.7):
+        return
+
+    ttl = getattr(settings, 'PRACTICE_PREFETCH_TTL', 600)
+    if not cache.add(PREFETCH_LOCK_KEY.format(session_id=session.id), 1, timeout=ttl):
+        return
+
+    count = max(session.exercises_total, PREFETCH_SESSION_SIZE)
+    thread = threading.Thread(
+        target=_prefetch_session,
+        args=(user, category, session.mode, count, ttl),
+        daemon=True
+    )
+    thread.start()
+
+
+def _prefetch_session(user, category, mode, count, ttl):
+    try:
+        translations = select_translations(
+            category, count, user=user, phrases_only=(category == 'phrases')
+        )
+        if not translations:
+            return
+        specs = build_exercise_specs(translations, category, mode, user.profile.current_level)
+        key = PREFETCH_KEY.format(user_id=user.id, category=category, mode=mode)
+        cache.set(key, specs, timeout=ttl)
+        logger.info(f"⚡ Siguiente sesión de práctica preparada: usuario {user.id}, {category}/{mode} ({len(specs)} ejercicios)")
+    except Exception as e:
+        logger.error(f"Error preparando la siguiente sesión de práctica: {str(e)}", exc_info=True)
+    finally:
+        # El hilo usa su propia conexión a la BD: cerrarla al terminar
+        connection.close()
@@ -0,0 +1,15 @@
+# translations/services/redis_store.py
+"""Acceso directo a Redis (listas, hashes, scripts) fuera de la API de caché"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def get_client():
+    """Cliente de Redis de la caché 'default'; None si la caché no es Redis o no responde"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except Exception:
+        # Caché sin Redis (desarrollo) o Redis caído
+        return None
@@ -0,0 +1,145 @@
+# translations/services/session_reaper.py
+"""
+Barrido de sesiones de ejercicio vencidas.
+
+Cuando el usuario simplemente cierra la app, su ExerciseSession queda abierta
+(is_completed=False, is_abandoned=False) para siempre. El barrido busca las
+sesiones abiertas con más de STALE_SESSION_AFTER segundos. La búsqueda usa el
+índice parcial open_session_user_start_idx, que solo contiene sesiones
+abiertas. Las sesiones procesadas salen del índice, así que cada lote empieza
+desde el principio sin OFFSET.
+
+- Primero se vuelca el estado en Redis de cada sesión del lote
+  (services/session_state.py), si lo tiene.
+- Sesión con todos sus ejercicios respondidos: se marca completada.
+- Resto: se abandona con ExerciseSession.mark_abandoned, que aplica las
+  penalizaciones en bloque y solo penaliza si fue quien cerró la sesión.
+
+Se ejecuta con `manage.py reap_stale_sessions` (cron) o, si
+STALE_SESSION_SWEEP_INTERVAL > 0, en un hilo por proceso. Un candado en la
+caché evita que varios workers barran a la vez.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from ..models import ExerciseSession
+from . import session_state, sync
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = 'session_reaper:lock'
+
+_lock = threading.Lock()
+_scheduler = None
+_pid = None
+
+
+def stale_sessions(older_than=None):
+    """Sesiones abiertas que empezaron hace más de `older_than` segundos"""
+    older_than = settings.STALE_SESSION_AFTER if older_than is None else older_than
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return ExerciseSession.objects.filter(
+        is_completed=False, is_abandoned=False, start_time__lt=cutoff
+    )
+
+
+def sweep(batch_size=None, max_batches=None, older_than=None):
+    """
+    Cierra o abandona sesiones vencidas en lotes acotados. Devuelve
+    {'completed', 'abandoned', 'failed', 'backlog', 'duration'}; backlog son las
+    sesiones vencidas que quedaron para el siguiente barrido.
+    """
+    batch_size = batch_size or settings.STALE_SESSION_BATCH
+    max_batches = max_batches or settings.STALE_SESSION_MAX_BATCHES
+    started = time.monotonic()
+    report = {'completed': 0, 'abandoned': 0, 'failed': 0}
+    failed_ids = set()
+
+    for _ in range(max_batches):
+        sessions = list(
+            stale_sessions(older_than).exclude(id__in=failed_ids)
+            .only('id', 'user_id', 'mode', 'exercises_total', 'exercises_completed')
+            .order_by('start_time')[:batch_size]
+        )
+        if not sessions:
+            break
+
+        # Avances que aún estén en Redis (worker caído o app cerrada a mitad de sesión);
+        # el volcado ya marca completas las que terminaron
+        states = session_state.flush([s.id for s in sessions])
+        finished = []
+        for s in sessions:
+            if s.id in states:
+                s.exercises_completed = states[s.id]['exercises_completed']
+                if states[s.id]['finished']:
+                    finished.append(s.id)
+                    report['completed'] += 1
+                    continue
+            if s.exercises_total and s.exercises_completed >= s.exercises_total:
+                finished.append(s.id)
+        pending_finished = [session_id for session_id in finished if session_id not in states]
+        if pending_finished:
+            report['completed'] += ExerciseSession.objects.filter(
+                id__in=pending_finished, is_completed=False, is_abandoned=False
+            ).update(is_completed=True, end_time=timezone.now())
+            sync.record_sessions(pending_finished)
+
+        for session in sessions:
+            if session.id in finished:
+                continue
+            try:
+                session.mark_abandoned()
+                report['abandoned'] += 1
+            except Exception as e:
+                failed_ids.add(session.id)
+                report['failed'] += 1
+                logger.error(f"❌ No se pudo abandonar la sesión vencida {session.id}: {e}", exc_info=True)
+
+        if len(sessions) < batch_size:
+            break
+
+    report['backlog'] = stale_sessions(older_than).count()
+    report['duration'] = round(time.monotonic() - started, 3)
+    if report['completed'] or report['abandoned'] or report['failed']:
+        logger.info(
+            f"🧹 Barrido de sesiones: {report['completed']} completadas, {report['abandoned']} abandonadas, "
+            f"{report['failed']} con error, {report['backlog']} pendientes ({report['duration']}s)"
+        )
+    return report
+
+
+def ensure_scheduler():
+    """Arranca el barrido periódico en este proceso si STALE_SESSION_SWEEP_INTERVAL > 0"""
+    global _scheduler, _pid
+    if settings.STALE_SESSION_SWEEP_INTERVAL <= 0:
+        return
+    if _scheduler is not None and _scheduler.is_alive() and _pid == os.getpid():
+        return
+    with _lock:
+        if _scheduler is not None and _scheduler.is_alive() and _pid == os.getpid():
+            return
+        _pid = os.getpid()
+        _scheduler = threading.Thread(target=_sweep_loop, name='session-reaper', daemon=True)
+        _scheduler.start()
+
+
+def _sweep_loop():
+    stop = threading.Event()
+    while not stop.wait(settings.STALE_SESSION_SWEEP_INTERVAL):
+        # Un solo worker por intervalo; sin caché disponible (None) se barre igual
+        if cache.add(LOCK_KEY, os.getpid(), max(1, int(settings.STALE_SESSION_SWEEP_INTERVAL))) is False:
+            continue
+        try:
+            sweep()
+        except Exception as e:
+            logger.error(f"❌ Error en el barrido de sesiones: {e}", exc_info=True)
+        finally:
+            connection.close()
@@ -0,0 +1,355 @@
+# translations/services/session_state.py
+"""
+Estado en vivo de las sesiones de ejercicio en Redis.
+
+Mientras una sesión está abierta, sus avances viven en un hash de Redis
+'exercise_session:<id>' en lugar de ExerciseSession y ExerciseSessionLog:
+
+    user_id, mode, exercises_total, exercises_completed, start_time, redis_answers
+    log:<exercise_id> -> ids de ExerciseSessionLog ("12" o "12,15")
+    res:<exercise_id> -> "<1|0>|<fin ISO>"  (respondido, correcto, hora)
+
+La primera respuesta siembra el hash desde la base. Cada respuesta es un script
+Lua atómico que se ejecuta al confirmar la transacción del intento. El hash es
+la fuente de verdad hasta que se vuelca a la base con un solo lote
+(bulk_update de los logs y del contador). Eso ocurre cuando la sesión se
+completa, al abandonarla (mark_abandoned), en el barrido de sesiones vencidas,
+o antes de procesar un lote de respuestas (submit_answers). El TTL
+(SESSION_STATE_TTL) supera a STALE_SESSION_AFTER: si un worker muere, el
+barrido encuentra el hash y lo vuelca.
+
+El contador no se vuelca como valor absoluto: si Redis falló a mitad de sesión,
+las respuestas de entretanto se sumaron directo en la base. redis_answers
+cuenta las respuestas registradas en Redis y ExerciseSession.redis_answers las
+ya volcadas; el volcado suma la diferencia y actualiza las dos columnas en el
+mismo UPDATE, así que repetirlo (o revertirlo con la transacción) no cuenta dos
+veces.
+
+Sin Redis (o con SESSION_STATE_REDIS=False), o si la sesión ya está cerrada en la
+base, el pipeline escribe directo en la base como antes. enabled() hace un PING y
+recuerda el resultado AVAILABILITY_TTL segundos; un error de Redis al registrar
+una respuesta lo da por caído hasta el siguiente PING.
+"""
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import ExerciseSession, ExerciseSessionLog
+from . import redis_store, sync
+
+logger = logging.getLogger(__name__)
+
+SESSION_KEY = 'exercise_session:{session_id}'
+ACTIVE_KEY = 'exercise_session:active'
+
+# Sesión no gestionada en Redis (cerrada en la base o Redis no disponible)
+UNTRACKED = object()
+
+# Segundos que se recuerda el resultado del PING de enabled()
+AVAILABILITY_TTL = 5.0
+# (momento del último PING, respondió)
+_availability = (float('-inf'), False)
+
+# KEYS[1]: hash de la sesión, KEYS[2]: conjunto de sesiones activas
+# ARGV[1]: semilla JSON ('' = sin semilla), ARGV[2]: TTL, ARGV[3]: id de ejercicio,
+# ARGV[4]: resultado "<1|0>|<fin>", ARGV[5]: id de sesión
+ANSWER_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    if ARGV[1] == '' then
+        return false
+    end
+    for field, value in pairs(cjson.decode(ARGV[1])) do
+        redis.call('HSET', KEYS[1], field, value)
+    end
+    redis.call('SADD', KEYS[2], ARGV[5])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+if redis.call('HEXISTS', KEYS[1], 'log:' .. ARGV[3]) == 0 then
+    return {}
+end
+redis.call('HSET', KEYS[1], 'res:' .. ARGV[3], ARGV[4])
+redis.call('HINCRBY', KEYS[1], 'exercises_completed', 1)
+redis.call('HINCRBY', KEYS[1], 'redis_answers', 1)
+return redis.call('HGETALL', KEYS[1])
+"""
+
+# Ejercicio agregado a una sesión en curso (generación en streaming)
+# KEYS[1]: hash de la sesión; ARGV[1]: id de ejercicio, ARGV[2]: id de log
+ADD_EXERCISE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+local field = 'log:' .. ARGV[1]
+local current = redis.call('HGET', KEYS[1], field)
+if current then
+    redis.call('HSET', KEYS[1], field, current .. ',' .. ARGV[2])
+else
+    redis.call('HSET', KEYS[1], field, ARGV[2])
+end
+redis.call('HINCRBY', KEYS[1], 'exercises_total', 1)
+return 1
+"""
+
+# Borra el hash ya volcado, salvo que haya llegado otra respuesta entretanto
+# KEYS[1]: hash, KEYS[2]: activas; ARGV[1]: exercises_completed volcado, ARGV[2]: id
+FORGET_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'exercises_completed') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('SREM', KEYS[2], ARGV[2])
+return 1
+"""
+
+
+def enabled():
+    """Redis configurado y respondiendo: el pipeline puede dejarle la sesión"""
+    global _availability
+    client = _client()
+    if client is None:
+        return False
+    checked_at, available = _availability
+    now = time.monotonic()
+    if now - checked_at >= AVAILABILITY_TTL:
+        try:
+            available = bool(client.ping())
+        except Exception as e:
+            logger.warning(f"⚠️ Redis no responde, las sesiones se escriben en la base: {e}")
+            available = False
+        _availability = (now, available)
+    return available
+
+
+def record_answer(user, session_id, exercise_id, is_correct, now):
+    """
+    Registra la respuesta en el hash de la sesión. Devuelve la sesión (sin
+    guardar) con sus contadores, None si el ejercicio no es de la sesión o
+    UNTRACKED si hay que escribir en la base. Si la sesión queda completa se
+    vuelca de inmediato.
+    """
+    client = _client()
+    if client is None:
+        return UNTRACKED
+    key = _key(session_id)
+    args = [settings.SESSION_STATE_TTL, exercise_id, f"{int(is_correct)}|{now.isoformat()}", session_id]
+    try:
+        values = client.eval(ANSWER_SCRIPT, 2, key, ACTIVE_KEY, '', *args)
+        if values is None:
+            seed = _seed_from_db(session_id)
+            if seed is None:
+                return UNTRACKED
+            values = client.eval(ANSWER_SCRIPT, 2, key, ACTIVE_KEY, json.dumps(seed), *args)
+    except Exception as e:
+        logger.warning(f"⚠️ Redis no disponible para la sesión {session_id}, escribiendo en la base: {e}")
+        _mark_unavailable()
+        return UNTRACKED
+    if not values:
+        return None
+
+    state = _parse(values)
+    session = ExerciseSession(
+        id=session_id, user=user, mode=state['mode'],
+        exercises_total=state['exercises_total'],
+        exercises_completed=state['exercises_completed'],
+        is_completed=state['finished'],
+    )
+    if state['finished']:
+        flush([session_id])
+    return session
+
+
+def add_exercise(session_id, exercise_id, log_id):
+    """Agrega un ejercicio a una sesión que ya tiene estado en Redis"""
+    client = _client()
+    if client is None:
+        return
+    try:
+        client.eval(ADD_EXERCISE_SCRIPT, 1, _key(session_id), exercise_id, log_id)
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo agregar el ejercicio {exercise_id} a la sesión {session_id} en Redis: {e}")
+
+
+def answered_exercise_ids(session_id):
+    """Ejercicios respondidos en Redis que todavía no están en la base"""
+    client = _client()
+    if client is None:
+        return set()
+    try:
+        fields = client.hkeys(_key(session_id))
+    except Exception:
+        return set()
+    fields = [f.decode() if isinstance(f, bytes) else f for f in fields]
+    return {int(f[4:]) for f in fields if f.startswith('res:')}
+
+
+def flush(session_ids):
+    """
+    Vuelca a la base el estado en Redis de las sesiones: un bulk_update de los
+    logs respondidos, uno del contador (solo lo que no se volcó antes) y un
+    UPDATE para las que quedaron completas en la base. Devuelve {id de sesión:
+    estado} de las que tenían estado.
+    """
+    client = _client()
+    if client is None or not session_ids:
+        return {}
+    try:
+        with client.pipeline(transaction=False) as pipe:
+            for session_id in session_ids:
+                pipe.hgetall(_key(session_id))
+            hashes = pipe.execute()
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo leer el estado de sesiones en Redis: {e}")
+        return {}
+
+    states = {}
+    logs = []
+    for session_id, values in zip(session_ids, hashes):
+        if not values:
+            continue
+        state = states[session_id] = _parse(values)
+        for exercise_id, (is_correct, end_time) in state['results'].items():
+            logs.extend(
+                ExerciseSessionLog(id=log_id, is_completed=True, is_correct=is_correct, end_time=end_time)
+                for log_id in state['logs'].get(exercise_id, ())
+            )
+    if not states:
+        return {}
+
+    with transaction.atomic():
+        if logs:
+            ExerciseSessionLog.objects.bulk_update(logs, ['is_completed', 'is_correct', 'end_time'])
+        ExerciseSession.objects.bulk_update(
+            [
+                # Greatest: un volcado con un estado más viejo que el ya volcado no resta
+                ExerciseSession(
+                    id=session_id,
+                    exercises_completed=F('exercises_completed') + Greatest(
+                        Value(state['redis_answers']) - F('redis_answers'), Value(0)
+                    ),
+                    redis_answers=Greatest(F('redis_answers'), Value(state['redis_answers'])),
+                )
+                for session_id, state in states.items()
+            ],
+            ['exercises_completed', 'redis_answers']
+        )
+        # Completa según la base: también cuenta las respuestas escritas sin Redis
+        finished = list(ExerciseSession.objects.filter(
+            id__in=list(states), is_completed=False, is_abandoned=False,
+            exercises_completed__gte=F('exercises_total')
+        ).values_list('id', flat=True))
+        if finished:
+            ExerciseSession.objects.filter(id__in=finished).update(is_completed=True, end_time=timezone.now())
+            sync.record_sessions(finished)
+        for session_id, state in states.items():
+            state['finished'] = state['finished'] or session_id in finished
+        transaction.on_commit(lambda: _forget(client, states))
+
+    logger.debug(f"💾 Estado de {len(states)} sesiones volcado a la base ({len(logs)} ejercicios)")
+    return states
+
+
+def flush_active(batch_size=None):
+    """
+    Vuelca, en una pasada, todas las sesiones del conjunto de activas (antes de
+    apagar Redis, por ejemplo); devuelve cuántas tenían estado.
+    """
+    client = _client()
+    if client is None:
+        return 0
+    batch_size = batch_size or settings.STALE_SESSION_BATCH
+    flushed = 0
+    batch = []
+    for member in client.sscan_iter(ACTIVE_KEY, count=batch_size):
+        batch.append(int(member.decode() if isinstance(member, bytes) else member))
+        if len(batch) >= batch_size:
+            flushed += _flush_members(client, batch)
+            batch = []
+    if batch:
+        flushed += _flush_members(client, batch)
+    return flushed
+
+
+def _flush_members(client, session_ids):
+    states = flush(session_ids)
+    expired = [session_id for session_id in session_ids if session_id not in states]
+    if expired:
+        # Hash vencido o ya volcado por otro proceso
+        client.srem(ACTIVE_KEY, *expired)
+    return len(states)
+
+
+def _client():
+    if not settings.SESSION_STATE_REDIS:
+        return None
+    return redis_store.get_client()
+
+
+def _mark_unavailable():
+    global _availability
+    _availability = (time.monotonic(), False)
+
+
+def _key(session_id):
+    return SESSION_KEY.format(session_id=session_id)
+
+
+def _seed_from_db(session_id):
+    """Campos iniciales del hash; None si la sesión ya no está abierta"""
+    session = ExerciseSession.objects.filter(
+        id=session_id, is_completed=False, is_abandoned=False
+    ).values('user_id', 'mode', 'exercises_total', 'exercises_completed', 'start_time', 'redis_answers').first()
+    if session is None:
+        return None
+    seed = dict(session, start_time=session['start_time'].isoformat())
+    for log_id, exercise_id in ExerciseSessionLog.objects.filter(
+        session_id=session_id
+    ).order_by('id').values_list('id', 'exercise_id'):
+        field = f'log:{exercise_id}'
+        seed[field] = f"{seed[field]},{log_id}" if field in seed else str(log_id)
+    return seed
+
+
+def _parse(values):
+    """HGETALL (mapping o lista plana) como estado de la sesión"""
+    if not isinstance(values, dict):
+        values = dict(zip(values[::2], values[1::2]))
+    values = {
+        (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+        for k, v in values.items()
+    }
+    logs = {}
+    results = {}
+    for field, value in values.items():
+        if field.startswith('log:'):
+            logs[int(field[4:])] = [int(log_id) for log_id in value.split(',')]
+        elif field.startswith('res:'):
+            correct, end_time = value.split('|', 1)
+            results[int(field[4:])] = (correct == '1', parse_datetime(end_time))
+    exercises_total = int(values.get('exercises_total', 0))
+    exercises_completed = int(values.get('exercises_completed', 0))
+    return {
+        'mode': values.get('mode'),
+        'exercises_total': exercises_total,
+        'exercises_completed': exercises_completed,
+        'redis_answers': int(values.get('redis_answers', 0)),
+        # Misma condición que el UPDATE del pipeline en la base
+        'finished': exercises_completed >= exercises_total,
+        'logs': logs,
+        'results': results,
+    }
+
+
+def _forget(client, states):
+    try:
+        for session_id, state in states.items():
+            client.eval(FORGET_SCRIPT, 2, _key(session_id), ACTIVE_KEY, state['exercises_completed'], session_id)
+    except Exception as e:
+        # El hash vence solo; un volcado repetido escribe los mismos valores
+        logger.warning(f"⚠️ No se pudo limpiar el estado de sesiones en Redis: {e}")
@@ -0,0 +1,133 @@
+# translations/services/star_histogram.py
+"""
+Histograma de estrellas del vocabulario, desnormalizado en UserProfile.
+
+UserProfile guarda cuántas palabras tiene el usuario con 0..5 estrellas
+(vocab_stars_0..vocab_stars_5) y el total (vocab_total). Los resúmenes de
+vocabulario, progreso y panel leen esos contadores de la fila del perfil en
+lugar de agregar UserVocabulary.
+
+Cada cambio de mastery_level mueve una unidad de un contador a otro con un
+UPDATE con F() en la misma transacción que la escritura de la palabra:
+ - UserVocabulary.save() y el borrado (signal) lo hacen solos, comparando con
+   el nivel leído de la base.
+ - Las escrituras en bloque (answer_pipeline, mark_abandoned, acciones del
+   admin) llaman a shift() con sus transiciones.
+
+`manage.py reconcile_star_histogram` compara los contadores con UserVocabulary
+y corrige las diferencias.
+"""
+import logging
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from ..models import UserProfile, UserVocabulary
+
+logger = logging.getLogger(__name__)
+
+LEVELS = range(0, 6)
+STAR_FIELDS = {level: f'vocab_stars_{level}' for level in LEVELS}
+TOTAL_FIELD = 'vocab_total'
+FIELDS = UserProfile.VOCAB_HISTOGRAM_FIELDS
+
+
+def shift(transitions):
+    """
+    Aplica transiciones (user_id, nivel antes, nivel después); None = la
+    palabra no existía o se borró. Un UPDATE por usuario con cambios.
+    """
+    deltas = defaultdict(Counter)
+    for user_id, before, after in transitions:
+        if before == after:
+            continue
+        delta = deltas[user_id]
+        if before is None:
+            delta[TOTAL_FIELD] += 1
+        else:
+            delta[_field(before)] -= 1
+        if after is None:
+            delta[TOTAL_FIELD] -= 1
+        else:
+            delta[_field(after)] += 1
+
+    for user_id, delta in deltas.items():
+        values = {field: F(field) + amount for field, amount in delta.items() if amount}
+        if values:
+            UserProfile.objects.filter(user_id=user_id).update(**values)
+
+
+def vocabulary_transitions(vocabs):
+    """
+    Transiciones de instancias de UserVocabulary por guardar en bloque
+    (bulk_create/bulk_update); marca el nivel actual como ya contado.
+    """
+    transitions = []
+    for vocab in vocabs:
+        before = None if vocab._state.adding else getattr(vocab, '_counted_level', vocab.mastery_level)
+        transitions.append((vocab.user_id, before, vocab.mastery_level))
+        vocab._counted_level = vocab.mastery_level
+    return transitions
+
+
+def histogram(profile):
+    """{'total', 'stars': {0..5: n}} leído de la fila del perfil"""
+    return {
+        'total': getattr(profile, TOTAL_FIELD),
+        'stars': {level: getattr(profile, field) for level, field in STAR_FIELDS.items()},
+    }
+
+
+def count_between(hist, low, high):
+    """Palabras con entre low y high estrellas (inclusive)"""
+    return sum(hist['stars'][level] for level in LEVELS if low <= level <= high)
+
+
+def compute(user_ids):
+    """Histogramas reales desde UserVocabulary: {user_id: {campo: n}}"""
+    counts = {user_id: dict.fromkeys(FIELDS, 0) for user_id in user_ids}
+    for row in UserVocabulary.objects.filter(user_id__in=user_ids).values(
+        'user_id', 'mastery_level'
+    ).annotate(n=Count('id')).order_by():
+        fields = counts[row['user_id']]
+        fields[_field(row['mastery_level'])] += row['n']
+        fields[TOTAL_FIELD] += row['n']
+    return counts
+
+
+def reconcile(user_ids, fix=False):
+    """
+    Compara los contadores de los perfiles con UserVocabulary. Devuelve
+    {user_id: {campo: (guardado, real)}} con las diferencias; con fix=True
+    las corrige en un bulk_update.
+    """
+    with transaction.atomic():
+        profiles = UserProfile.objects.filter(user_id__in=user_ids)
+        if fix:
+            profiles = profiles.select_for_update()
+        profiles = list(profiles.order_by('user_id'))
+        actual = compute([profile.user_id for profile in profiles])
+
+        mismatches = {}
+        for profile in profiles:
+            diff = {
+                field: (getattr(profile, field), value)
+                for field, value in actual[profile.user_id].items()
+                if getattr(profile, field) != value
+            }
+            if diff:
+                mismatches[profile.user_id] = diff
+                for field, (_, value) in diff.items():
+                    setattr(profile, field, value)
+
+        if fix and mismatches:
+            UserProfile.objects.bulk_update(
+                [p for p in profiles if p.user_id in mismatches], FIELDS
+            )
+            logger.warning(f"🔧 Histograma de estrellas corregido para {len(mismatches)} usuarios")
+    return mismatches
+
+
+def _field(level):
+    return STAR_FIELDS[max(min(level, 5), 0)]
@@ -0,0 +1,313 @@
+# translations/services/sync.py
+"""
+Sincronización incremental para los clientes móviles sin conexión.
+
+Cada escritura que el cliente guarda localmente deja una fila en ChangeLog
+(usuario, entidad, id, borrado) en la misma transacción:
+ - vocabulario: UserVocabulary.save()/delete (signals) y las escrituras en
+   bloque (answer_pipeline, mark_abandoned, acciones del admin);
+ - logros: achievements._insert_awards y el borrado de UserAchievement;
+ - sesiones: al cerrarse (completada o abandonada).
+La excepción es submit_answer, que registra la palabra y la sesión al
+confirmar (record_on_commit) para no pasar de su presupuesto de consultas.
+
+El id de ChangeLog es una secuencia global y el cursor del cliente es el
+último id recibido: la lectura es un solo recorrido del índice (user, id)
+desde el cursor. Las entradas repetidas de un mismo objeto se agrupan y se
+devuelve su estado actual con una consulta por entidad; lo que ya no existe
+vuelve como lápida (id en 'deleted').
+
+Los ids se asignan al insertar y las transacciones confirman en otro orden,
+así que el cursor devuelto solo avanza sobre entradas de más de
+SYNC_SETTLE_SECONDS: las más recientes se envían igual y se repiten en la
+siguiente sincronización (el cliente aplica los cambios por id, es
+idempotente). Un cursor 0, o anterior a las entradas ya purgadas
+(SYNC_CHANGELOG_RETENTION_DAYS), recibe el estado completo con reset=True.
+
+La meta diaria vive en Redis (services/daily_goals.py) y cambia con cada
+respuesta; no pasa por ChangeLog y se envía siempre la de hoy.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import ChangeLog, ExerciseSession, UserAchievement
+from . import activity_log, answer_pipeline, daily_goals, user_cache, vocabulary_listing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 2000
+# Sesiones cerradas que recibe un cliente sin cursor (las más recientes)
+SNAPSHOT_SESSIONS = 50
+SESSION_FIELDS = (
+    'id', 'mode', 'start_time', 'end_time', 'is_completed', 'is_abandoned',
+    'exercises_total', 'exercises_completed',
+)
+# Máximo de cambios del cliente por llamada
+MAX_MUTATIONS = 50
+MUTATION_KEY = 'sync_mutation:{user_id}:{mutation_id}'
+DELETE_BATCH = 5000
+
+
+def record(entries):
+    """
+    Registra cambios (user_id, entidad, object_id, borrado) con un solo INSERT.
+    Va dentro de la transacción de la escritura: si se revierte, no queda rastro.
+    """
+    rows = [
+        ChangeLog(user_id=user_id, entity=entity, object_id=object_id, deleted=deleted)
+        for user_id, entity, object_id, deleted in entries
+    ]
+    if rows:
+        ChangeLog.objects.bulk_create(rows)
+
+
+def record_on_commit(entries):
+    """
+    Como record(), pero el INSERT se hace al confirmar la transacción (fuera del
+    presupuesto de consultas de answer_pipeline, como el resumen diario de
+    activity_log). El id se asigna al insertar, así que un cliente que sincronizó
+    entre medio no lo salta; si el INSERT falla, el cambio llega con el siguiente
+    de ese objeto.
+    """
+    entries = list(entries)
+    if entries:
+        transaction.on_commit(lambda: record(entries), robust=True)
+
+
+def record_sessions(session_ids):
+    """Cambios de sesiones cerradas con UPDATE en bloque (sin el usuario a mano)"""
+    if session_ids:
+        record(
+            (user_id, 'session', session_id, False)
+            for session_id, user_id in ExerciseSession.objects.filter(
+                id__in=session_ids
+            ).values_list('id', 'user_id')
+        )
+
+
+def changes(user, cursor=0, limit=None):
+    """
+    Cambios del usuario posteriores al cursor:
+    {'cursor', 'reset', 'has_more', 'vocabulary': [UserVocabulary],
+     'achievements': [dict], 'sessions': [dict], 'deleted': {entidad: [ids]}}
+    """
+    limit = max(1, min(int(limit or DEFAULT_LIMIT), MAX_LIMIT))
+    horizon = timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    if not cursor or _expired(cursor):
+        return _snapshot(user, horizon)
+
+    entries = list(
+        ChangeLog.objects.filter(user=user, id__gt=cursor).order_by('id').values_list(
+            'id', 'entity', 'object_id', 'deleted', 'created_at'
+        )[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    next_cursor = cursor
+    for entry_id, _, _, _, created_at in entries:
+        if created_at > horizon:
+            break
+        next_cursor = entry_id
+
+    # Última entrada de cada objeto
+    latest = {}
+    for _, entity, object_id, deleted, _ in entries:
+        latest[(entity, object_id)] = deleted
+    live = {entity: set() for entity, _ in ChangeLog.ENTITY_CHOICES}
+    for (entity, object_id), deleted in latest.items():
+        if not deleted:
+            live[entity].add(object_id)
+
+    result = _load(user, live['vocabulary'], live['achievement'], live['session'])
+    result['deleted'] = {
+        entity: sorted(
+            object_id for (kind, object_id), deleted in latest.items()
+            if kind == entity and (deleted or object_id not in result['found'][entity])
+        )
+        for entity, _ in ChangeLog.ENTITY_CHOICES
+    }
+    del result['found']
+    result.update(cursor=next_cursor, reset=False, has_more=has_more and next_cursor > cursor)
+    return result
+
+
+def apply_mutations(user, mutations):
+    """
+    Aplica en orden los cambios que el cliente hizo sin conexión; cada uno en
+    su propio savepoint. Un id de cliente repetido no se vuelve a aplicar.
+    Devuelve un resultado por mutación.
+    """
+    results = []
+    for mutation in mutations:
+        mutation_id = mutation.get('id')
+        result = {'id': mutation_id, 'type': mutation.get('type')}
+        key = MUTATION_KEY.format(user_id=user.id, mutation_id=mutation_id) if mutation_id else None
+        # add devuelve None sin Redis: se aplica igual
+        if key and cache.add(key, True, settings.IDEMPOTENCY_TTL) is False:
+            results.append(dict(result, status='duplicate'))
+            continue
+        try:
+            with transaction.atomic():
+                result.update(status='applied', **_apply(user, mutation))
+        except ExerciseSession.DoesNotExist:
+            result.update(status='rejected', error='Sesión no encontrada')
+        except ValueError as e:
+            result.update(status='rejected', error=str(e))
+        except Exception as e:
+            logger.error(f"❌ Error al aplicar mutación de sincronización {mutation_id}: {e}", exc_info=True)
+            result.update(status='error', error='Error interno al aplicar el cambio')
+            # El cliente puede reintentarla
+            if key:
+                cache.delete(key)
+        results.append(result)
+    return results
+
+
+def record_progress(user, mode, category=None, client_timestamp=None, completed_exercises=0):
+    """Sesión terminada en el cliente: racha, actividad y meta diaria (record_progress)"""
+    user.profile.update_streak()
+    user_cache.bump(user)
+
+    # Síncrono: la respuesta devuelve su id
+    activity = activity_log.log_activity(
+        user, 'session_completed',
+        sync=True,
+        mode=mode,
+        category=category,
+        details={
+            'mode': mode,
+            'category': category,
+            'client_timestamp': client_timestamp,
+            'recorded_at': timezone.now().isoformat()
+        }
+    )
+
+    # En práctica cuenta los ejercicios de la sesión (no por palabra individual)
+    if mode == 'practice':
+        daily_goals.increment(user, practiced=completed_exercises)
+    return activity
+
+
+def prune(cutoff=None):
+    """
+    Borra por lotes las entradas anteriores a `cutoff` (por defecto, hace
+    SYNC_CHANGELOG_RETENTION_DAYS días). Devuelve cuántas se borraron.
+    """
+    if cutoff is None:
+        cutoff = timezone.now() - timedelta(days=settings.SYNC_CHANGELOG_RETENTION_DAYS)
+    boundary = _last_id_before(cutoff)
+    if boundary is None:
+        return 0
+
+    rows = 0
+    while True:
+        ids = list(
+            ChangeLog.objects.filter(id__lte=boundary).order_by('id').values_list('id', flat=True)[:DELETE_BATCH]
+        )
+        if not ids:
+            break
+        rows += ChangeLog.objects.filter(id__in=ids).delete()[0]
+    logger.info(f"🧹 ChangeLog: {rows} entradas anteriores a {cutoff:%Y-%m-%d} borradas")
+    return rows
+
+
+def _apply(user, mutation):
+    kind = mutation.get('type')
+    if kind == 'answers':
+        try:
+            session_id = int(mutation.get('session_id'))
+        except (TypeError, ValueError):
+            raise ValueError('ID de sesión debe ser un número')
+        answers = mutation.get('answers')
+        if not isinstance(answers, list) or not answers or not all(isinstance(a, dict) for a in answers):
+            raise ValueError('Se requiere una lista de respuestas')
+        if len(answers) > answer_pipeline.MAX_BATCH_SIZE:
+            raise ValueError(f'Máximo {answer_pipeline.MAX_BATCH_SIZE} respuestas por envío')
+        session, results = answer_pipeline.submit_answers(
+            user, session_id, answers, default_mode=mutation.get('mode')
+        )
+        return {'session_id': session.id, 'results': results}
+
+    if kind == 'progress':
+        mode = mutation.get('mode')
+        if mode not in ('detection', 'practice'):
+            mode = 'practice'
+        try:
+            completed_exercises = int(mutation.get('completed_exercises', 0))
+        except (TypeError, ValueError):
+            completed_exercises = 0
+        activity = record_progress(
+            user, mode, category=mutation.get('category'),
+            client_timestamp=mutation.get('timestamp'), completed_exercises=completed_exercises
+        )
+        return {'activity_id': activity.id}
+
+    raise ValueError(f"Tipo de cambio no soportado: {kind}")
+
+
+def _snapshot(user, horizon):
+    """Estado completo: todo el vocabulario y los logros, y las últimas sesiones cerradas"""
+    cursor = _last_id_before(horizon) or 0
+    vocabulary = list(vocabulary_listing.vocabulary_queryset(user).order_by('id'))
+    achievements = list(
+        UserAchievement.objects.filter(user=user).order_by('achievement_id').values('achievement_id', 'earned_at')
+    )
+    sessions = list(
+        ExerciseSession.objects.filter(user=user).exclude(is_completed=False, is_abandoned=False)
+        .order_by('-id').values(*SESSION_FIELDS)[:SNAPSHOT_SESSIONS]
+    )
+    return {
+        'cursor': cursor,
+        'reset': True,
+        'has_more': False,
+        'vocabulary': vocabulary,
+        'achievements': achievements,
+        'sessions': sessions,
+        'deleted': {entity: [] for entity, _ in ChangeLog.ENTITY_CHOICES},
+    }
+
+
+def _load(user, vocabulary_ids, achievement_ids, session_ids):
+    """Estado actual de los objetos cambiados (una consulta por entidad con cambios)"""
+    vocabulary = achievements = sessions = []
+    if vocabulary_ids:
+        vocabulary = list(
+            vocabulary_listing.vocabulary_queryset(user).filter(id__in=vocabulary_ids).order_by('id')
+        )
+    if achievement_ids:
+        achievements = list(
+            UserAchievement.objects.filter(user=user, achievement_id__in=achievement_ids)
+            .order_by('achievement_id').values('achievement_id', 'earned_at')
+        )
+    if session_ids:
+        sessions = list(
+            ExerciseSession.objects.filter(user=user, id__in=session_ids).order_by('id').values(*SESSION_FIELDS)
+        )
+    return {
+        'vocabulary': vocabulary,
+        'achievements': achievements,
+        'sessions': sessions,
+        'found': {
+            'vocabulary': {vocab.id for vocab in vocabulary},
+            'achievement': {row['achievement_id'] for row in achievements},
+            'session': {row['id'] for row in sessions},
+        },
+    }
+
+
+def _expired(cursor):
+    """Cursor anterior a las entradas purgadas: el cliente pudo perder cambios"""
+    first_id = ChangeLog.objects.order_by('id').values_list('id', flat=True).first()
+    return first_id is not None and cursor < first_id - 1
+
+
+def _last_id_before(moment):
+    # Recorre la clave primaria desde el final (ids y fechas crecen juntos)
+    return ChangeLog.objects.filter(created_at__lte=moment).order_by('-id').values_list('id', flat=True).first()
@@ -0,0 +1,113 @@
+# translations/services/user_cache.py
+"""
+Caché de respuestas por usuario con número de versión.
+
+Las pantallas de progreso, panel y vocabulario solo cambian cuando el usuario
+hace algo. Cada usuario tiene un contador 'user_version:<id>' que sube (INCR)
+con cada escritura suya: detección, respuestas, abandono, record_progress,
+metas diarias, logros y cambios de vocabulario o perfil (también los del
+admin: signals en models.py y las acciones en bloque). Las respuestas se
+guardan por (endpoint, parámetros, fecha local) junto con la versión con la
+que se calcularon. Una lectura trae versión y respuesta en un solo MGET y la
+sirve si la versión coincide. La fecha local en la clave evita servir la
+semana de ayer después de medianoche.
+
+Sin Redis disponible las vistas se calculan normalmente.
+"""
+import functools
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'user_version:{user_id}'
+# Hora (epoch) del último cambio, para Last-Modified (services/conditional.py)
+MODIFIED_KEY = 'user_modified:{user_id}'
+RESPONSE_KEY = 'user_response:{user_id}:{endpoint}:{date}:{params}'
+# Cualquier vencimiento es seguro: se reinicia con un valor que no coincide
+VERSION_TTL = 60 * 60 * 24 * 7
+
+
+def bump(user):
+    """Invalida las respuestas en caché del usuario (al confirmar la transacción en curso)"""
+    user_id = getattr(user, 'pk', user)
+    if user_id is not None:
+        transaction.on_commit(lambda: _increment(user_id))
+
+
+def cached_per_user(endpoint):
+    """Decorador para vistas GET (debajo de @action / @permission_classes)"""
+
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if hasattr(arg, 'query_params'))
+            if request.method != 'GET' or not request.user.is_authenticated:
+                return view_func(*args, **kwargs)
+
+            user_id = request.user.pk
+            response_key = _response_key(user_id, endpoint, request)
+            version_key = VERSION_KEY.format(user_id=user_id)
+            cached = cache.get_many([version_key, response_key])
+            version = cached.get(version_key)
+            if version is None:
+                version = initial_version(version_key, MODIFIED_KEY.format(user_id=user_id))
+            stored = cached.get(response_key)
+            if version is not None and stored and stored.get('version') == version:
+                return Response(json.loads(stored['body']))
+
+            response = view_func(*args, **kwargs)
+            if version is not None and response.status_code == 200:
+                cache.set(response_key, {
+                    'version': version,
+                    'body': json.dumps(response.data, cls=JSONEncoder),
+                }, settings.USER_CACHE_TTL)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _increment(user_id):
+    increment_version(VERSION_KEY.format(user_id=user_id), MODIFIED_KEY.format(user_id=user_id))
+
+
+def increment_version(key, modified_key=None):
+    """INCR de un contador de versión (y su hora de cambio)"""
+    if modified_key:
+        cache.set(modified_key, int(time.time()), VERSION_TTL)
+    try:
+        if cache.incr(key) is not None:
+            return
+    except ValueError:
+        pass
+    # Sin contador (vencido o desalojado): uno nuevo que no coincida con versiones viejas
+    cache.set(key, time.time_ns(), VERSION_TTL)
+
+
+def initial_version(key, modified_key=None):
+    version = time.time_ns()
+    added = cache.add(key, version, VERSION_TTL)
+    if added is None:
+        return None  # Redis caído (IGNORE_EXCEPTIONS)
+    if added and modified_key:
+        cache.set(modified_key, version // 10 ** 9, VERSION_TTL)
+    return version if added else cache.get(key)
+
+
+def _response_key(user_id, endpoint, request):
+    params = json.dumps(sorted(request.query_params.lists()))
+    digest = hashlib.sha256(params.encode('utf-8')).hexdigest()[:16]
+    return RESPONSE_KEY.format(
+        user_id=user_id, endpoint=endpoint, date=timezone.localdate().isoformat(), params=digest
+    )
@@ -0,0 +1,130 @@
+# translations/services/vocabulary_listing.py
+"""
+Listado del vocabulario personal (PracticeViewSet.user_vocabulary).
+
+ - El filtro por origen usa la columna UserVocabulary.origin (fijada al crear
+   la palabra) en lugar de buscar las palabras en ActivityLog.
+ - Solo se leen las columnas que devuelve UserVocabularySerializer, y
+   days_since_practice se calcula en SQL (DaysSince).
+ - Paginación por cursor (keyset): el cursor codifica los valores de orden de
+   la última fila y la página siguiente se pide con WHERE (orden) > (cursor),
+   que recorre el índice del orden sin OFFSET. Cada orden termina en id para
+   que la posición sea única.
+"""
+import base64
+import json
+import logging
+
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import UserVocabulary
+
+logger = logging.getLogger(__name__)
+
+# sort_by -> orden del listado (cada uno con su índice en UserVocabulary.Meta)
+ORDERINGS = {
+    'recent': ('-last_detected', '-id'),
+    'mastery': ('-mastery_level', '-last_detected', '-id'),
+    'needs_practice': ('mastery_level', '-last_detected', '-id'),
+    'alphabetical': ('spanish_word', 'id'),
+}
+DEFAULT_SORT = 'recent'
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Columnas de UserVocabularySerializer
+LIST_FIELDS = (
+    'id', 'object_label', 'spanish_word', 'quechua_word', 'origin',
+    'mastery_level', 'exercises_completed', 'exercises_correct',
+    'times_detected', 'first_detected', 'last_detected',
+    'last_practiced', 'mastered_date',
+)
+DATETIME_FIELDS = {'last_detected'}
+
+
+class DaysSince(models.Func):
+    """Días completos entre una fecha y `now` (NULL si la fecha es NULL)"""
+    output_field = models.IntegerField()
+    # PostgreSQL: now - fecha es un interval
+    template = 'EXTRACT(DAY FROM (%(expressions)s))::integer'
+    arg_joiner = ' - '
+
+    def __init__(self, expression, now, **extra):
+        super().__init__(models.Value(now, output_field=models.DateTimeField()), expression, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)', arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+
+def vocabulary_queryset(user, sort_by=None, mastery_min=None, mastery_max=None, origin=None):
+    """Vocabulario del usuario filtrado, ordenado y con days_since_practice"""
+    queryset = UserVocabulary.objects.filter(user=user)
+    if origin:
+        queryset = queryset.filter(origin=origin)
+    if mastery_min is not None:
+        queryset = queryset.filter(mastery_level__gte=int(mastery_min))
+    if mastery_max is not None:
+        queryset = queryset.filter(mastery_level__lte=int(mastery_max))
+    return queryset.only(*LIST_FIELDS).annotate(
+        days_since_practice=DaysSince('last_practiced', timezone.now())
+    ).order_by(*ORDERINGS.get(sort_by, ORDERINGS[DEFAULT_SORT]))
+
+
+def paginate(queryset, sort_by, cursor=None, page_size=None):
+    """
+    Una página del listado: (filas, cursor siguiente o None). Lanza ValueError
+    si el cursor no es válido para este orden.
+    """
+    ordering = ORDERINGS.get(sort_by, ORDERINGS[DEFAULT_SORT])
+    page_size = max(1, min(int(page_size or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+    if cursor:
+        queryset = queryset.filter(_after(ordering, decode_cursor(cursor, ordering)))
+
+    rows = list(queryset[:page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor(rows[-1], ordering)
+
+
+def encode_cursor(row, ordering):
+    values = []
+    for key in ordering:
+        value = getattr(row, key.lstrip('-'))
+        values.append(value.isoformat() if key.lstrip('-') in DATETIME_FIELDS else value)
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, ordering):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError('Cursor inválido') from e
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise ValueError('Cursor inválido')
+    for i, key in enumerate(ordering):
+        if key.lstrip('-') in DATETIME_FIELDS:
+            values[i] = parse_datetime(values[i]) if isinstance(values[i], str) else None
+            if values[i] is None:
+                raise ValueError('Cursor inválido')
+    return values
+
+
+def _after(ordering, values):
+    """Filas posteriores a `values` en el orden: (a > x) OR (a = x AND b > y) OR ..."""
+    condition = Q()
+    for i, key in enumerate(ordering):
+        field = key.lstrip('-')
+        lookup = 'lt' if key.startswith('-') else 'gt'
+        step = Q(**{f'{field}__{lookup}': values[i]})
+        for previous, value in zip(ordering[:i], values[:i]):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
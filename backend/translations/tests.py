@@ -1,3 +1,1539 @@
-from django.test import TestCase
+import json
+import time
+import unittest
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import viewsets
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .admin import DailyGoalAdmin, UserProfileAdmin
+from .models import (
+    Achievement, ActivityLog, ChangeLog, DailyGoal, Exercise, ExerciseSession, ExerciseSessionLog,
+    ObjectTranslation, UserAchievement, UserDailyActivity, UserProfile, UserProgress, UserVocabulary
+)
+from .services import (
+    abandonment, achievements, activity_log, answer_pipeline, conditional, daily_activity, daily_goals, exercise_generator,
+    llm_client, log_partitions, practice_exercises, session_reaper, session_state, star_histogram, sync, user_cache, vocabulary_listing
+)
+from .services.conditional import conditional_get
+from .services.idempotency import idempotent
+from .services.user_cache import cached_per_user
+
+import fakeredis
+try:
+    # views.py inicializa Firebase y carga YOLO al importarse
+    from . import views
+except (ImportError, ImproperlyConfigured):
+    views = None
+
+# Caché en memoria para las pruebas que no ejercitan Redis (la de settings es django_redis)
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(ACTIVITY_LOG_ASYNC=False, DAILY_GOAL_WRITE_BEHIND=False, SESSION_STATE_REDIS=False)
+class AnswerPipelineTests(TestCase):
+    """submit_answer en una transacción con presupuesto de consultas"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='estudiante', password='x')
+        self.translation = ObjectTranslation.objects.create(
+            english_label='dog', spanish='perro', quechua='Allqu'
+        )
+        self.session = ExerciseSession.objects.create(user=self.user, mode='practice', exercises_total=2)
+        self.exercise = self._exercise()
+        self.vocab = UserVocabulary.objects.create(
+            user=self.user, object_label='dog', spanish_word='perro', quechua_word='allqu'
+        )
+
+    def _exercise(self):
+        exercise = Exercise.objects.create(
+            type='multiple_choice', category='vocabulary', object_translation=self.translation,
+            question='¿Cómo se dice perro?', answer='Allqu', distractors=['misi', 'wasi', 'yaku'],
+            metadata={'mode': 'practice', 'session_id': self.session.id}
+        )
+        ExerciseSessionLog.objects.create(session=self.session, exercise=exercise)
+        return Exercise.objects.select_related('object_translation').get(id=exercise.id)
+
+    def test_correct_answer_within_query_budget(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(answer_pipeline.QUERY_BUDGET):
+                data = answer_pipeline.submit_answer(self.user, self.exercise, 'allqu', 'practice')
+
+        self.assertTrue(data['correct'])
+        self.assertEqual(data['exercises_completed'], 1)
+        self.vocab.refresh_from_db()
+        self.assertEqual(self.vocab.exercises_correct, 1)
+        self.assertEqual(UserProgress.objects.get(user=self.user, exercise=self.exercise).attempts, 1)
+        self.assertEqual(DailyGoal.objects.get(user=self.user).words_practiced, 1)
+        self.assertTrue(ExerciseSessionLog.objects.get(exercise=self.exercise).is_correct)
+        self.assertEqual(ActivityLog.objects.filter(activity_type='exercise_completed').count(), 1)
+        # El cambio para la sincronización se registra al confirmar, fuera del presupuesto
+        self.assertTrue(ChangeLog.objects.filter(user=self.user, entity='vocabulary', object_id=self.vocab.id).exists())
+
+    def test_wrong_answer_within_query_budget(self):
+        with self.assertNumQueries(answer_pipeline.QUERY_BUDGET):
+            data = answer_pipeline.submit_answer(self.user, self.exercise, 'misi', 'practice')
+
+        self.assertFalse(data['correct'])
+        self.assertEqual(data['consecutive_failures'], 1)
+        self.assertEqual(data['consecutive_failures_limit'], 2)
+
+    def test_repeated_answers_upsert_progress_and_complete_session(self):
+        second = self._exercise()
+        answer_pipeline.submit_answer(self.user, self.exercise, 'misi', 'practice')
+        answer_pipeline.submit_answer(self.user, self.exercise, 'allqu', 'practice')
+
+        progress = UserProgress.objects.get(user=self.user, exercise=self.exercise)
+        self.assertEqual(progress.attempts, 2)
+        self.assertTrue(progress.correct)
+
+        answer_pipeline.submit_answer(self.user, second, 'allqu', 'practice')
+        self.session.refresh_from_db()
+        self.assertTrue(self.session.is_completed)
+        self.assertIsNotNone(self.session.end_time)
+        self.assertEqual(DailyGoal.objects.get(user=self.user).words_practiced, 3)
+
+    def test_missing_word_is_added_to_vocabulary(self):
+        self.vocab.delete()
+        data = answer_pipeline.submit_answer(self.user, self.exercise, 'allqu', 'practice')
+
+        self.assertEqual(data['mastery_level'], 1)
+        self.assertTrue(UserVocabulary.objects.filter(user=self.user, quechua_word='allqu').exists())
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.total_words, 1)
+
+    def test_transitions_match_update_mastery(self):
+        """Las transiciones en SQL deben coincidir con UserVocabulary.update_mastery"""
+        other = User.objects.create_user(username='referencia', password='x')
+        reference = UserVocabulary.objects.create(
+            user=other, object_label='dog', spanish_word='perro', quechua_word='allqu'
+        )
+        # Palabras antiguas para que la protección de palabra reciente no aplique
+        old = timezone.now() - timedelta(days=10)
+        UserVocabulary.objects.filter(id__in=[self.vocab.id, reference.id]).update(first_detected=old)
+        reference.refresh_from_db()
+
+        answers = [True] * 20 + [False] * 3 + [True] + [False] * 2
+        for mode in ('practice', 'detection'):
+            for correct in answers:
+                data = answer_pipeline.submit_answer(
+                    self.user, self.exercise, 'allqu' if correct else 'misi', mode
+                )
+                info = reference.update_mastery(correct, mode)
+                self.assertEqual(data['mastery_level'], reference.mastery_level)
+                self.assertEqual(data['previous_mastery_level'], reference.previous_mastery_level)
+                self.assertEqual(data['mastery_decreased'], info['was_degraded'])
+                self.assertEqual(data['consecutive_failures'], info['consecutive_failures'])
+                self.assertEqual(data['is_minimally_practiced'], info['is_minimally_practiced'])
+                self.assertEqual(data['is_recent_word'], info['is_recent_word'])
+
+        self.vocab.refresh_from_db()
+        self.assertIsNotNone(self.vocab.mastered_date)
+        self.assertIsNotNone(reference.mastered_date)
+        self.assertTrue(ActivityLog.objects.filter(user=self.user, activity_type='mastery_decreased').exists())
+
+    def test_degradation_and_abandonment_once_per_day(self):
+        old = timezone.now() - timedelta(days=10)
+        UserVocabulary.objects.filter(id=self.vocab.id).update(
+            first_detected=old, mastery_level=3, exercises_completed=10, exercises_correct=8
+        )
+        for _ in range(4):
+            answer_pipeline.submit_answer(self.user, self.exercise, 'misi', 'practice')
+
+        self.vocab.refresh_from_db()
+        self.assertEqual(self.vocab.mastery_level, 2)
+        self.assertEqual(self.vocab.last_degraded_on, timezone.localdate())
+
+        self.assertFalse(self.vocab.register_abandonment('practice'))
+        self.assertEqual(self.vocab.last_abandoned_on, timezone.localdate())
+        self.assertFalse(self.vocab.register_abandonment('practice'))
+        self.assertEqual(ActivityLog.objects.filter(activity_type='exercise_abandoned').count(), 1)
+
+    def test_star_histogram_follows_mastery_changes(self):
+        def stars():
+            profile = UserProfile.objects.get(user=self.user)
+            return profile.vocab_total, [getattr(profile, f'vocab_stars_{level}') for level in range(6)]
+
+        stale_profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(stars(), (1, [0, 1, 0, 0, 0, 0]))
+        for _ in range(3):
+            self._exercise()
+            answer_pipeline.submit_answer(self.user, self.exercise, 'allqu', 'practice')
+        self.assertEqual(stars(), (1, [0, 0, 1, 0, 0, 0]))
+
+        # Un save() del perfil desactualizado no pisa el histograma
+        stale_profile.save()
+        self.assertEqual(stars(), (1, [0, 0, 1, 0, 0, 0]))
+
+        vocab = UserVocabulary.objects.get(id=self.vocab.id)
+        vocab.mastery_level = 1
+        vocab.save()
+        self.assertEqual(stars(), (1, [0, 1, 0, 0, 0, 0]))
+        self.assertEqual(star_histogram.reconcile([self.user.id]), {})
+
+        vocab.delete()
+        self.assertEqual(stars(), (0, [0] * 6))
+        UserProfile.objects.filter(user=self.user).update(vocab_total=3, vocab_stars_4=3)
+        self.assertEqual(
+            star_histogram.reconcile([self.user.id], fix=True),
+            {self.user.id: {'vocab_total': (3, 0), 'vocab_stars_4': (3, 0)}}
+        )
+        self.assertEqual(stars(), (0, [0] * 6))
+
+    def test_mark_abandoned_is_set_based(self):
+        self._exercise()
+        old = timezone.now() - timedelta(days=10)
+        UserVocabulary.objects.filter(id=self.vocab.id).update(
+            first_detected=old, mastery_level=3, exercises_completed=10, consecutive_failures=1
+        )
+        # Guardar sesión, palabras, vocabulario, bulk_update, histograma, ChangeLog, eventos (+ savepoint)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.session.mark_abandoned(), 1)
+        self.assertLessEqual(len(queries), 9)
+
+        self.vocab.refresh_from_db()
+        self.assertEqual(self.vocab.mastery_level, 2)
+        self.assertEqual(self.vocab.abandoned_exercises, 1)
+        self.assertEqual(self.vocab.last_abandoned_on, timezone.localdate())
+        self.assertEqual(ActivityLog.objects.filter(activity_type='exercise_abandoned').count(), 1)
+        self.assertEqual(ActivityLog.objects.filter(activity_type='mastery_decreased').count(), 1)
+        self.assertTrue(ExerciseSession.objects.get(id=self.session.id).is_abandoned)
+
+    def test_failing_after_commit_work_does_not_fail_the_answer(self):
+        error = RuntimeError('Redis caído')
+        with mock.patch.object(practice_exercises, 'maybe_prefetch_next_session', side_effect=error):
+            with self.captureOnCommitCallbacks(execute=True):
+                data = answer_pipeline.submit_answer(self.user, self.exercise, 'allqu', 'practice')
+        self.assertEqual(data['exercises_completed'], 1)
+
+        with mock.patch.object(session_state, 'enabled', return_value=True), \
+                mock.patch.object(session_state, 'record_answer', side_effect=error):
+            with self.captureOnCommitCallbacks(execute=True):
+                data = answer_pipeline.submit_answer(self.user, self.exercise, 'allqu', 'practice')
+        self.assertTrue(data['correct'])
+        self.assertEqual(UserProgress.objects.get(user=self.user, exercise=self.exercise).attempts, 2)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_abandonment_preview_single_query_and_invalidation(self):
+        self.addCleanup(cache.clear)
+        old = timezone.now() - timedelta(days=10)
+        UserVocabulary.objects.filter(id=self.vocab.id).update(
+            first_detected=old, mastery_level=3, exercises_completed=10
+        )
+        with self.assertNumQueries(1):
+            preview = abandonment.penalty_preview(self.session)
+        self.assertEqual(preview['affected_words'][0]['word'], 'allqu')
+        self.assertTrue(preview['affected_words'][0]['would_degrade'])
+        self.assertEqual(preview['affected_words'][0]['potential_new_level'], 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(abandonment.penalty_preview(self.session), preview)
+
+        # Responder el único ejercicio pendiente invalida la vista previa
+        with self.captureOnCommitCallbacks(execute=True):
+            answer_pipeline.submit_answer(self.user, self.exercise, 'allqu', 'practice')
+        self.assertEqual(abandonment.penalty_preview(self.session)['affected_words'], [])
+        self.vocab.refresh_from_db()
+        self.assertEqual(self.vocab.abandoned_exercises, 0)
+
+
+class DailyGoalIncrementTests(TestCase):
+    """DailyGoal.objects.increment: upsert en una sola sentencia"""
+
+    def test_increment_creates_then_adds(self):
+        user = User.objects.create_user(username='metas', password='x')
+        today = timezone.localdate()
+        with self.assertNumQueries(1):
+            goal = DailyGoal.objects.increment(user, today, detected=1)
+        self.assertEqual((goal.words_detected, goal.practice_goal, goal.date), (1, 5, today))
+
+        with self.assertNumQueries(1):
+            goal = DailyGoal.objects.increment(user, today, practiced=3, mastered=1)
+        self.assertEqual((goal.id, goal.words_detected, goal.words_practiced, goal.words_mastered),
+                         (DailyGoal.objects.get().id, 1, 3, 1))
+
+
+@override_settings(DAILY_GOAL_WRITE_BEHIND=True)
+class DailyGoalRedisTests(TestCase):
+    """Meta diaria en Redis (fakeredis): incremento, lectura y volcado a la base"""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        self.user = User.objects.create_user(username='metas-redis', password='x')
+        for target, attribute, value in (
+            (daily_goals.redis_store, 'get_client', mock.Mock(return_value=self.redis)),
+            (daily_goals, '_ensure_flusher', mock.Mock()),
+        ):
+            patcher = mock.patch.object(target, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _counters(self, goal):
+        return goal.words_detected, goal.words_practiced, goal.words_mastered
+
+    def _increment(self, **counters):
+        # Dentro de TestCase el incremento en Redis espera al commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertIsNone(daily_goals.increment(self.user, **counters))
+
+    def test_increment_applies_on_commit_and_flush_writes_to_db(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            daily_goals.increment(self.user, practiced=2, mastered=1)
+            self.assertEqual(self._counters(daily_goals.get_today(self.user)), (0, 0, 0))
+        self.assertEqual(self._counters(daily_goals.get_today(self.user)), (0, 2, 1))
+        self.assertFalse(DailyGoal.objects.exists())
+
+        self.assertEqual(daily_goals.flush(), 1)
+        self.assertEqual(self._counters(DailyGoal.objects.get(user=self.user)), (0, 2, 1))
+        # Volcar de nuevo no suma dos veces
+        self.assertEqual(daily_goals.flush(), 0)
+        self._increment(practiced=1)
+        daily_goals.flush()
+        self.assertEqual(self._counters(DailyGoal.objects.get(user=self.user)), (0, 3, 1))
+
+    def test_hash_is_seeded_from_existing_row(self):
+        DailyGoal.objects.increment(self.user, timezone.localdate(), detected=1, practiced=4)
+        self._increment(practiced=1)
+        goal = daily_goals.get_today(self.user)
+        self.assertEqual(self._counters(goal), (1, 5, 0))
+        self.assertEqual(goal.id, DailyGoal.objects.get().id)
+
+        daily_goals.flush()
+        self.assertEqual(self._counters(DailyGoal.objects.get()), (1, 5, 0))
+
+    def test_db_fallback_is_not_overwritten_by_flush(self):
+        self._increment(practiced=1)
+        with mock.patch.object(self.redis, 'eval', side_effect=ConnectionError('caído')):
+            self._increment(practiced=2)
+        self.assertEqual(self._counters(DailyGoal.objects.get()), (0, 2, 0))
+
+        daily_goals.flush()
+        self.assertEqual(self._counters(DailyGoal.objects.get()), (0, 3, 0))
+
+    def test_db_fallback_also_updates_the_hash_when_possible(self):
+        self._increment(practiced=1)
+        real_eval = self.redis.eval
+        errors = iter([ConnectionError('caído')])
+
+        def eval_failing_once(*args):
+            # Falla solo el script del incremento; la corrección de la lectura sí llega
+            for error in errors:
+                raise error
+            return real_eval(*args)
+
+        with mock.patch.object(self.redis, 'eval', side_effect=eval_failing_once):
+            self._increment(mastered=1)
+        self.assertEqual(self._counters(daily_goals.get_today(self.user)), (0, 1, 1))
+
+        daily_goals.flush()
+        self.assertEqual(self._counters(DailyGoal.objects.get()), (0, 1, 1))
+
+    def test_flush_returns_increments_to_the_hash_when_the_db_fails(self):
+        self._increment(practiced=2)
+        with mock.patch.object(DailyGoal.objects, 'increment_many', side_effect=DatabaseError('caída')):
+            self.assertEqual(daily_goals.flush(), 0)
+        self.assertFalse(DailyGoal.objects.exists())
+
+        self.assertEqual(daily_goals.flush(), 1)
+        self.assertEqual(self._counters(DailyGoal.objects.get()), (0, 2, 0))
+
+    def test_direct_writes_discard_the_redis_copy(self):
+        self._increment(practiced=2)
+        daily_goals.flush()
+        self._increment(practiced=1)
+
+        goal_admin = DailyGoalAdmin(DailyGoal, admin.site)
+        with mock.patch.object(goal_admin, 'message_user'), self.captureOnCommitCallbacks(execute=True):
+            goal_admin.reset_goals(None, DailyGoal.objects.filter(user=self.user))
+        self.assertEqual(self._counters(daily_goals.get_today(self.user)), (0, 0, 0))
+        daily_goals.flush()
+        self.assertEqual(self._counters(DailyGoal.objects.get()), (0, 0, 0))
+
+        goal = DailyGoal.objects.get()
+        goal.words_detected = 4
+        with self.captureOnCommitCallbacks(execute=True):
+            goal.save()
+        self.assertEqual(self._counters(daily_goals.get_today(self.user)), (4, 0, 0))
+
+    @unittest.skipIf(views is None, 'views.py no se puede importar en este entorno')
+    def test_view_post_counts_the_pending_increment(self):
+        request = APIRequestFactory().post('/api/daily-goal/', {'action': 'word_practiced'}, format='json')
+        force_authenticate(request, user=self.user)
+        response = views.daily_goal_view(request)
+        self.assertEqual(response.data['words_practiced'], 1)
+
+
+@override_settings(ACTIVITY_LOG_ASYNC=False, DAILY_GOAL_WRITE_BEHIND=False, SESSION_STATE_REDIS=True)
+class SessionStateRedisTests(TestCase):
+    """Estado en vivo de la sesión en Redis (fakeredis): scripts y volcado"""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        for target, attribute, value in (
+            (session_state.redis_store, 'get_client', mock.Mock(return_value=self.redis)),
+            # Sin PING recordado de otra prueba
+            (session_state, '_availability', (float('-inf'), False)),
+        ):
+            patcher = mock.patch.object(target, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username='en-vivo', password='x')
+        self.translation = ObjectTranslation.objects.create(english_label='dog', spanish='perro', quechua='Allqu')
+        self.session, self.exercises, self.logs = self._session(2)
+        self.now = timezone.now()
+
+    def _session(self, count):
+        session = ExerciseSession.objects.create(user=self.user, mode='practice', exercises_total=count)
+        exercises, logs = [], []
+        for _ in range(count):
+            exercise, log = self._exercise(session)
+            exercises.append(exercise)
+            logs.append(log)
+        return session, exercises, logs
+
+    def _exercise(self, session):
+        exercise = Exercise.objects.create(
+            type='multiple_choice', category='vocabulary', object_translation=self.translation,
+            question='¿Cómo se dice perro?', answer='Allqu',
+            metadata={'mode': 'practice', 'session_id': session.id}
+        )
+        return exercise, ExerciseSessionLog.objects.create(session=session, exercise=exercise)
+
+    def _answer(self, exercise, is_correct=True, session=None):
+        session = session or self.session
+        return session_state.record_answer(self.user, session.id, exercise.id, is_correct, self.now)
+
+    def _hash(self, session=None):
+        return session_state._parse(self.redis.hgetall(session_state._key((session or self.session).id)))
+
+    def test_answer_script_seeds_and_counts(self):
+        session = self._answer(self.exercises[0])
+        self.assertEqual((session.exercises_completed, session.is_completed), (1, False))
+        self.assertEqual(self._hash()['results'], {self.exercises[0].id: (True, self.now)})
+        self.assertTrue(self.redis.sismember(session_state.ACTIVE_KEY, self.session.id))
+        # La base no se toca hasta el volcado
+        self.assertFalse(ExerciseSessionLog.objects.get(id=self.logs[0].id).is_completed)
+        self.assertEqual(session_state.answered_exercise_ids(self.session.id), {self.exercises[0].id})
+
+        # Ejercicio ajeno a la sesión: no cuenta
+        other = Exercise.objects.create(type='multiple_choice', object_translation=self.translation,
+                                        question='?', answer='Allqu')
+        self.assertIsNone(self._answer(other))
+        self.assertEqual(self._hash()['exercises_completed'], 1)
+
+    def test_closed_session_is_untracked(self):
+        ExerciseSession.objects.filter(id=self.session.id).update(is_abandoned=True)
+        self.assertIs(self._answer(self.exercises[0]), session_state.UNTRACKED)
+        self.assertFalse(self.redis.exists(session_state._key(self.session.id)))
+
+    def test_add_exercise_script_extends_live_session(self):
+        exercise, log = self._exercise(self.session)
+        ExerciseSession.objects.filter(id=self.session.id).update(exercises_total=3)
+        # Sin estado en Redis no hace nada (la semilla lo tomará de la base)
+        session_state.add_exercise(self.session.id, exercise.id, log.id)
+        self.assertFalse(self.redis.exists(session_state._key(self.session.id)))
+
+        self._answer(self.exercises[0])
+        extra, extra_log = self._exercise(self.session)
+        session_state.add_exercise(self.session.id, extra.id, extra_log.id)
+        state = self._hash()
+        self.assertEqual(state['exercises_total'], 4)
+        self.assertEqual(state['logs'][extra.id], [extra_log.id])
+
+    def test_last_answer_flushes_and_forgets(self):
+        self._answer(self.exercises[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            session = self._answer(self.exercises[1], is_correct=False)
+        self.assertTrue(session.is_completed)
+
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.exercises_completed, self.session.is_completed), (2, True))
+        self.assertEqual(
+            list(ExerciseSessionLog.objects.filter(session=self.session).order_by('id')
+                 .values_list('is_completed', 'is_correct')),
+            [(True, True), (True, False)]
+        )
+        self.assertFalse(self.redis.exists(session_state._key(self.session.id)))
+        self.assertFalse(self.redis.sismember(session_state.ACTIVE_KEY, self.session.id))
+
+    def test_forget_keeps_hash_when_an_answer_arrives_after_flush(self):
+        self._answer(self.exercises[0])
+        with self.captureOnCommitCallbacks() as callbacks:
+            session_state.flush([self.session.id])
+        self.assertEqual(ExerciseSession.objects.get(id=self.session.id).exercises_completed, 1)
+
+        self._answer(self.exercises[1])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self._hash()['exercises_completed'], 2)
+
+    def test_flush_adds_to_answers_written_during_a_redis_outage(self):
+        session, exercises, _ = self._session(3)
+        self._answer(exercises[0], session=session)
+        # Redis falla a mitad de sesión: esta respuesta va directo a la base
+        with mock.patch.object(self.redis, 'eval', side_effect=ConnectionError('caído')):
+            answer_pipeline._record_session_answer(self.user, exercises[1], session.id, True, self.now)
+        self.assertEqual(ExerciseSession.objects.get(id=session.id).exercises_completed, 1)
+        self._answer(exercises[2], session=session)
+
+        # Volcar dos veces (sin limpiar el hash entre medio) no cuenta dos veces
+        with self.captureOnCommitCallbacks():
+            session_state.flush([session.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            session_state.flush([session.id])
+
+        session.refresh_from_db()
+        self.assertEqual((session.exercises_completed, session.is_completed), (3, True))
+        self.assertEqual(ExerciseSessionLog.objects.filter(session=session, is_completed=True).count(), 3)
+        self.assertFalse(self.redis.exists(session_state._key(session.id)))
+
+    def test_flush_active_drains_live_and_expired_sessions(self):
+        other, other_exercises, _ = self._session(3)
+        self._answer(self.exercises[0])
+        self._answer(other_exercises[0], session=other)
+        self._answer(other_exercises[1], is_correct=False, session=other)
+        self.redis.sadd(session_state.ACTIVE_KEY, 999999)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(session_state.flush_active(batch_size=2), 2)
+
+        self.assertEqual(
+            dict(ExerciseSession.objects.filter(id__in=[self.session.id, other.id])
+                 .values_list('id', 'exercises_completed')),
+            {self.session.id: 1, other.id: 2}
+        )
+        self.assertEqual(ExerciseSessionLog.objects.filter(is_completed=True).count(), 3)
+        self.assertEqual(self.redis.scard(session_state.ACTIVE_KEY), 0)
+
+    def test_pipeline_writes_to_db_when_redis_does_not_answer(self):
+        exercise = Exercise.objects.select_related('object_translation').get(id=self.exercises[0].id)
+        with mock.patch.object(self.redis, 'ping', side_effect=ConnectionError('caído')):
+            self.assertFalse(session_state.enabled())
+            answer_pipeline.submit_answer(self.user, exercise, 'allqu', 'practice')
+        # Sin esperar al commit: el intento ya está en la base
+        self.assertEqual(ExerciseSession.objects.get(id=self.session.id).exercises_completed, 1)
+        self.assertFalse(self.redis.exists(session_state._key(self.session.id)))
+
+    def test_script_error_falls_back_to_db(self):
+        self.assertTrue(session_state.enabled())
+        exercise = Exercise.objects.select_related('object_translation').get(id=self.exercises[0].id)
+        with mock.patch.object(self.redis, 'eval', side_effect=ConnectionError('caído')):
+            with self.captureOnCommitCallbacks(execute=True):
+                answer_pipeline.submit_answer(self.user, exercise, 'allqu', 'practice')
+        self.assertEqual(ExerciseSession.objects.get(id=self.session.id).exercises_completed, 1)
+        self.assertTrue(ExerciseSessionLog.objects.get(id=self.logs[0].id).is_completed)
+        # Hasta el siguiente PING las respuestas van directo a la base
+        self.assertFalse(session_state.enabled())
+
+
+@override_settings(ACTIVITY_LOG_ASYNC=False, DAILY_GOAL_WRITE_BEHIND=False, SESSION_STATE_REDIS=False)
+class AnswerBatchTests(TestCase):
+    """submit_answers: mismo resultado que respuestas individuales, en bloque"""
+
+    def setUp(self):
+        self.translations = [
+            ObjectTranslation.objects.create(english_label=label, spanish=spanish, quechua=quechua)
+            for label, spanish, quechua in [('dog', 'perro', 'Allqu'), ('cat', 'gato', 'Misi')]
+        ]
+
+    def _session(self, user, count):
+        session = ExerciseSession.objects.create(user=user, mode='practice', exercises_total=count)
+        exercises = []
+        for i in range(count):
+            exercise = Exercise.objects.create(
+                type='multiple_choice', category='vocabulary',
+                object_translation=self.translations[i % 2],
+                question='?', answer=self.translations[i % 2].quechua,
+                metadata={'mode': 'practice', 'session_id': session.id}
+            )
+            ExerciseSessionLog.objects.create(session=session, exercise=exercise)
+            exercises.append(Exercise.objects.select_related('object_translation').get(id=exercise.id))
+        return session, exercises
+
+    def test_batch_matches_single_submissions(self):
+        single_user = User.objects.create_user(username='individual', password='x')
+        batch_user = User.objects.create_user(username='lote', password='x')
+        answers = [True, False, True, True, False, True]
+
+        _, single_exercises = self._session(single_user, len(answers))
+        expected = [
+            answer_pipeline.submit_answer(
+                single_user, exercise, exercise.answer if correct else 'wasi', 'practice'
+            )
+            for exercise, correct in zip(single_exercises, answers)
+        ]
+
+        session, batch_exercises = self._session(batch_user, len(answers))
+        session, results = answer_pipeline.submit_answers(batch_user, session.id, [
+            {'exercise_id': exercise.id, 'answer': exercise.answer if correct else 'wasi',
+             'client_timestamp': '2024-01-01T10:00:00Z'}
+            for exercise, correct in zip(batch_exercises, answers)
+        ], default_mode='practice')
+
+        self.assertEqual([{k: v for k, v in r.items() if k != 'exercise_id'} for r in results], expected)
+        self.assertTrue(session.is_completed)
+        self.assertEqual(UserVocabulary.objects.filter(user=batch_user).count(), 2)
+        self.assertEqual(DailyGoal.objects.get(user=batch_user).words_practiced, len(answers))
+        batch_user.profile.refresh_from_db()
+        self.assertEqual(batch_user.profile.total_words, 2)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        counts = []
+        for size in (4, 10):
+            user = User.objects.create_user(username=f'lote{size}', password='x')
+            for translation in self.translations:
+                # A un acierto de 2 estrellas: ambos lotes mueven el histograma (un UPDATE)
+                UserVocabulary.objects.create(
+                    user=user, object_label=translation.english_label,
+                    spanish_word=translation.spanish, quechua_word=translation.quechua,
+                    exercises_completed=2, exercises_correct=2
+                )
+            session, exercises = self._session(user, size)
+            items = [{'exercise_id': e.id, 'answer': e.answer} for e in exercises]
+            with CaptureQueriesContext(connection) as queries:
+                answer_pipeline.submit_answers(user, session.id, items, default_mode='practice')
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_unknown_exercise_reports_error(self):
+        user = User.objects.create_user(username='errores', password='x')
+        session, exercises = self._session(user, 1)
+        _, results = answer_pipeline.submit_answers(user, session.id, [
+            {'exercise_id': 999999, 'answer': 'x'},
+            {'exercise_id': exercises[0].id, 'answer': ''},
+        ])
+        self.assertEqual(results[0]['error'], 'Ejercicio no encontrado')
+        self.assertEqual(results[1]['error'], 'Se requiere una respuesta')
+
+    def test_new_words_match_single_submission_defaults(self):
+        fields = (
+            'object_label', 'spanish_word', 'quechua_word', 'origin', 'mastery_level', 'previous_mastery_level',
+            'exercises_completed', 'exercises_correct', 'consecutive_failures', 'times_detected', 'last_practiced',
+        )
+        for mode in ('practice', 'detection'):
+            single_user = User.objects.create_user(username=f'individual-{mode}', password='x')
+            batch_user = User.objects.create_user(username=f'lote-{mode}', password='x')
+            _, (single_exercise,) = self._session(single_user, 1)
+            answer_pipeline.submit_answer(single_user, single_exercise, 'wasi', mode)
+            session, (batch_exercise,) = self._session(batch_user, 1)
+            answer_pipeline.submit_answers(batch_user, session.id, [
+                {'exercise_id': batch_exercise.id, 'answer': 'wasi'}
+            ], default_mode=mode)
+
+            single, batch = (
+                UserVocabulary.objects.filter(user=user).values(*fields).get()
+                for user in (single_user, batch_user)
+            )
+            self.assertEqual(batch, single, mode)
+            if mode == 'detection':
+                single_log, batch_log = (
+                    ActivityLog.objects.get(user=user, activity_type='word_auto_created').details
+                    for user in (single_user, batch_user)
+                )
+                self.assertEqual(batch_log['vocab_count_before'], single_log['vocab_count_before'])
+
+    def test_closed_session_rejects_answers(self):
+        user = User.objects.create_user(username='cerrada', password='x')
+        session, exercises = self._session(user, 2)
+        items = [{'exercise_id': e.id, 'answer': e.answer} for e in exercises]
+        answer_pipeline.submit_answers(user, session.id, items, default_mode='practice')
+        attempts = list(UserProgress.objects.filter(user=user).values_list('attempts', flat=True))
+
+        session, results = answer_pipeline.submit_answers(user, session.id, items, default_mode='practice')
+        self.assertEqual([r['error'] for r in results], ['La sesión ya está cerrada'] * 2)
+        self.assertEqual(session.exercises_completed, 2)
+        self.assertEqual(list(UserProgress.objects.filter(user=user).values_list('attempts', flat=True)), attempts)
+        self.assertEqual(UserVocabulary.objects.get(user=user, quechua_word='allqu').exercises_completed, 1)
+
+        ExerciseSession.objects.filter(id=session.id).update(is_completed=False, is_abandoned=True)
+        _, results = answer_pipeline.submit_answers(user, session.id, items[:1], default_mode='practice')
+        self.assertEqual(results, [{'exercise_id': exercises[0].id, 'error': 'La sesión ya está cerrada'}])
+
+
+class AchievementEngineTests(TestCase):
+    """Solo los umbrales recién cruzados generan logros"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='logros', password='x')
+        for kind, value in [('vocabulary', 1), ('vocabulary', 10), ('mastery', 1), ('streak', 3)]:
+            Achievement.objects.create(
+                name=f'{kind} {value}', description='', type=kind, requirement_value=value, icon='star'
+            )
+        achievements.invalidate()
+        self.addCleanup(achievements.invalidate)
+
+    def _earned(self):
+        return sorted(UserAchievement.objects.filter(user=self.user).values_list('achievement__name', flat=True))
+
+    def test_no_threshold_crossed_costs_no_queries(self):
+        achievements.catalogue()
+        with self.assertNumQueries(0):
+            awarded = achievements.award_crossed(
+                self.user, {'vocabulary': 2, 'mastery': 0, 'streak': 1},
+                {'vocabulary': 3, 'mastery': 0, 'streak': 2}
+            )
+        self.assertEqual(awarded, [])
+
+    def test_awards_only_crossed_thresholds(self):
+        achievements.award_crossed(self.user, {'vocabulary': 0, 'mastery': 0}, {'vocabulary': 10, 'mastery': 0})
+        self.assertEqual(self._earned(), ['vocabulary 1', 'vocabulary 10'])
+
+        self.user.profile.streak_days = 2
+        self.user.profile.last_activity = timezone.now().date() - timedelta(days=1)
+        self.user.profile.update_streak()
+        self.assertEqual(self._earned(), ['streak 3', 'vocabulary 1', 'vocabulary 10'])
+
+    def test_catalogue_reloads_when_achievement_changes(self):
+        achievements.catalogue()
+        Achievement.objects.create(name='mastery 5', description='', type='mastery', requirement_value=5, icon='star')
+        achievements.award_crossed(self.user, {'mastery': 4}, {'mastery': 5})
+        self.assertEqual(self._earned(), ['mastery 5'])
+
+    def test_full_check_is_idempotent(self):
+        self.user.profile.total_words = 5
+        self.user.profile.save()
+        Achievement.check_achievements(self.user)
+        Achievement.check_achievements(self.user)
+        self.assertEqual(self._earned(), ['vocabulary 1'])
+
+    def test_counter_increments_award_crossed_thresholds(self):
+        self.user.profile.increment_counters(words=1, mastered=1)
+        self.assertEqual(self._earned(), ['mastery 1', 'vocabulary 1'])
+
+    @unittest.skipIf(views is None, 'views.py necesita Firebase y ultralytics configurados')
+    @override_settings(CACHES=LOCMEM_CACHES, ACTIVITY_LOG_ASYNC=False, DAILY_GOAL_WRITE_BEHIND=False)
+    def test_detection_awards_vocabulary_achievement(self):
+        ObjectTranslation.objects.create(english_label='dog', spanish='perro', quechua='allqu')
+        self.client.force_login(self.user)
+        image = SimpleUploadedFile('perro.jpg', b'\xff\xd8\xff', content_type='image/jpeg')
+        detections = [{'label': 'dog', 'confidence': 0.9, 'bbox': [0, 0, 10, 10]}]
+        with mock.patch.object(views.ObjectDetectionService, 'detect_objects', return_value=detections):
+            response = self.client.post('/api/detection/detect/', {'image': image})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._earned(), ['vocabulary 1'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ACTIVITY_LOG_ASYNC=True, ACTIVITY_LOG_BUFFER_SIZE=1000)
+class ActivityLogWriterTests(TestCase):
+    """Registros en diferido: se encolan al confirmar y se insertan en bloque"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='registro', password='x')
+        # Sin red ni hilo de fondo: la lista de respaldo vive en fakeredis y el flush es explícito
+        for target, attribute, value in (
+            (activity_log.redis_store, 'get_client', mock.Mock(return_value=fakeredis.FakeRedis())),
+            (activity_log, '_ensure_flusher', mock.Mock()),
+        ):
+            patcher = mock.patch.object(target, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(activity_log.flush)
+
+    def test_buffered_events_keep_their_timestamp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            entry = activity_log.log_activity(self.user, 'detection_session', mode='detection', word_learned='allqu')
+        self.assertIsNone(entry.pk)
+        self.assertEqual(activity_log.pending_count(), 1)
+        self.assertFalse(ActivityLog.objects.exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(activity_log.flush(), 1)
+        # Un solo INSERT para el lote; el resumen diario se actualiza en la misma transacción
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "translations_activitylog"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(ActivityLog.objects.get().timestamp, entry.timestamp)
+        self.assertEqual(UserDailyActivity.objects.get(user=self.user).detections, 1)
+
+    def test_flush_invalidates_cached_responses_of_affected_users(self):
+        self.addCleanup(cache.clear)
+        other = User.objects.create_user(username='ajeno', password='x')
+        version_key = user_cache.VERSION_KEY.format(user_id=self.user.id)
+        other_key = user_cache.VERSION_KEY.format(user_id=other.id)
+        cache.set_many({version_key: 1, other_key: 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            activity_log.log_activity(self.user, 'detection_session', mode='detection', word_learned='allqu')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            activity_log.flush()
+        self.assertEqual(cache.get(version_key), 2)
+        self.assertEqual(cache.get(other_key), 1)
+
+    def test_sync_events_are_written_immediately(self):
+        entry = activity_log.log_activity(self.user, 'session_completed', sync=True, mode='practice')
+        self.assertIsNotNone(entry.pk)
+        self.assertEqual(activity_log.pending_count(), 0)
+
+
+@override_settings(ACTIVITY_LOG_ASYNC=False)
+class ProfileCounterTests(TestCase):
+    """Contadores del perfil con F() y nivel recalculado en el mismo UPDATE"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='contador', password='x')
+        self.profile = self.user.profile
+
+    def test_level_expression_matches_level_for(self):
+        for total, mastered in [(0, 0), (14, 0), (15, 0), (20, 14), (20, 13), (100, 70), (600, 420), (599, 0)]:
+            UserProfile.objects.filter(pk=self.profile.pk).update(total_words=0, mastered_words=0)
+            self.profile.increment_counters(words=total, mastered=mastered)
+            self.assertEqual(self.profile.current_level, UserProfile.level_for(total, mastered), (total, mastered))
+
+    def test_increment_is_atomic_and_logs_level_up_once(self):
+        UserProfile.objects.filter(pk=self.profile.pk).update(total_words=14, current_level=1)
+        stale = UserProfile.objects.get(pk=self.profile.pk)
+
+        with self.assertNumQueries(3):  # nivel previo (FOR UPDATE) + UPDATE ... RETURNING + registro de level_up
+            self.profile.add_word()
+        stale.add_word()
+
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.total_words, 16)
+        self.assertEqual(self.profile.current_level, 2)
+        self.assertEqual(ActivityLog.objects.filter(user=self.user, activity_type='level_up').count(), 1)
+
+    def test_level_up_compares_against_the_stored_level(self):
+        # El admin subió el nivel a mano (boost_level): la palabra 15 no es una subida
+        UserProfile.objects.filter(pk=self.profile.pk).update(total_words=14, current_level=3)
+        self.profile.add_word()
+        self.assertEqual(self.profile.current_level, 2)
+        self.assertFalse(ActivityLog.objects.filter(user=self.user, activity_type='level_up').exists())
+
+        UserProfile.objects.filter(pk=self.profile.pk).update(total_words=34, current_level=1)
+        self.profile.add_word()
+        details = ActivityLog.objects.get(user=self.user, activity_type='level_up').details
+        self.assertEqual((details['previous_level'], details['new_level']), (1, 3))
+
+
+class CountingViewSet(viewsets.ViewSet):
+    calls = 0
+
+    @idempotent
+    def create(self, request):
+        CountingViewSet.calls += 1
+        return Response({'calls': CountingViewSet.calls}, status=201 if request.data.get('ok') else 500)
+
+
+class CachedSummaryViewSet(viewsets.ViewSet):
+    calls = 0
+
+    @cached_per_user('resumen')
+    def list(self, request):
+        CachedSummaryViewSet.calls += 1
+        return Response({'calls': CachedSummaryViewSet.calls, 'limit': request.query_params.get('limit')})
+
+
+class ConditionalSummaryViewSet(viewsets.ViewSet):
+    calls = 0
+
+    @conditional_get(tables=['achievement'])
+    def list(self, request):
+        ConditionalSummaryViewSet.calls += 1
+        return Response({'calls': ConditionalSummaryViewSet.calls})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class UserCacheTests(TestCase):
+    """Respuestas por usuario en caché hasta que el usuario escribe algo"""
+
+    def setUp(self):
+        cache.clear()
+        CachedSummaryViewSet.calls = 0
+        self.user = User.objects.create_user(username='cacheado', password='x')
+        self.view = CachedSummaryViewSet.as_view({'get': 'list'})
+
+    def _get(self, user, **params):
+        request = APIRequestFactory().get('/resumen/', params)
+        force_authenticate(request, user=user)
+        return self.view(request).data['calls']
+
+    def test_version_bump_invalidates_only_that_user(self):
+        other = User.objects.create_user(username='otro', password='x')
+        self.assertEqual(self._get(self.user), 1)
+        self.assertEqual(self._get(self.user), 1)
+        self.assertEqual(self._get(self.user, limit=5), 2)
+        self.assertEqual(self._get(other), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user_cache.bump(self.user)
+        self.assertEqual(self._get(self.user), 4)
+        self.assertEqual(self._get(other), 3)
+
+    def test_admin_writes_invalidate_the_user(self):
+        self.assertEqual(self._get(self.user), 1)
+        # Acción en bloque (UPDATE sin signals)
+        profile_admin = UserProfileAdmin(UserProfile, admin.site)
+        with mock.patch.object(profile_admin, 'message_user'), self.captureOnCommitCallbacks(execute=True):
+            profile_admin.reset_streak(None, UserProfile.objects.filter(user=self.user))
+        self.assertEqual(self._get(self.user), 2)
+
+        # Formulario del admin: save() de un modelo del usuario
+        with self.captureOnCommitCallbacks(execute=True):
+            DailyGoal.objects.create(user=self.user, date=timezone.localdate())
+        self.assertEqual(self._get(self.user), 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConditionalGetTests(TestCase):
+    """ETag desde los contadores de versión: 304 sin ejecutar la vista"""
+
+    def setUp(self):
+        cache.clear()
+        ConditionalSummaryViewSet.calls = 0
+        self.user = User.objects.create_user(username='condicional', password='x')
+        self.view = ConditionalSummaryViewSet.as_view({'get': 'list'})
+
+    def _get(self, **headers):
+        request = APIRequestFactory().get('/resumen/', **headers)
+        force_authenticate(request, user=self.user)
+        return self.view(request)
+
+    def test_unchanged_data_returns_304_until_a_version_bumps(self):
+        first = self._get()
+        etag = first['ETag']
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self._get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(ConditionalSummaryViewSet.calls, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            conditional.bump_table('achievement')
+        changed = self._get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user_cache.bump(self.user)
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=changed['ETag']).status_code, 200)
+        self.assertEqual(ConditionalSummaryViewSet.calls, 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class IdempotencyTests(TestCase):
+    """Idempotency-Key: un reintento devuelve la respuesta guardada"""
+
+    def setUp(self):
+        cache.clear()
+        CountingViewSet.calls = 0
+        self.user = User.objects.create_user(username='reintentos', password='x')
+        self.view = CountingViewSet.as_view({'post': 'create'})
+
+    def _post(self, key, data):
+        request = APIRequestFactory().post('/contador/', data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+        force_authenticate(request, user=self.user)
+        return self.view(request)
+
+    def test_replay_returns_stored_response(self):
+        first = self._post('k1', {'ok': True})
+        replay = self._post('k1', {'ok': True})
+
+        self.assertEqual(CountingViewSet.calls, 1)
+        self.assertEqual((replay.status_code, replay.data), (first.status_code, first.data))
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(self._post('k1', {'ok': True, 'otro': 1}).status_code, 422)
+
+    def test_server_errors_are_not_stored(self):
+        self.assertEqual(self._post('k2', {}).status_code, 500)
+        self.assertEqual(self._post('k2', {}).status_code, 500)
+        self.assertEqual(CountingViewSet.calls, 2)
+
+
+@override_settings(ACTIVITY_LOG_ASYNC=False, STALE_SESSION_AFTER=3600, SESSION_STATE_REDIS=False)
+class SessionReaperTests(TestCase):
+    """Barrido de sesiones abiertas vencidas"""
+
+    def test_sweep_closes_finished_and_abandons_the_rest(self):
+        user = User.objects.create_user(username='dormido', password='x')
+        translation = ObjectTranslation.objects.create(english_label='cat', spanish='gato', quechua='Misi')
+        UserVocabulary.objects.create(
+            user=user, object_label='cat', spanish_word='gato', quechua_word='misi'
+        )
+        stale = ExerciseSession.objects.create(user=user, mode='practice', exercises_total=1)
+        exercise = Exercise.objects.create(
+            type='multiple_choice', category='vocabulary', object_translation=translation,
+            question='¿Cómo se dice gato?', answer='Misi', distractors=['allqu', 'wasi', 'yaku']
+        )
+        ExerciseSessionLog.objects.create(session=stale, exercise=exercise)
+        finished = ExerciseSession.objects.create(
+            user=user, mode='practice', exercises_total=1, exercises_completed=1
+        )
+        fresh = ExerciseSession.objects.create(user=user, mode='practice', exercises_total=1)
+        ExerciseSession.objects.filter(id__in=[stale.id, finished.id]).update(
+            start_time=timezone.now() - timedelta(hours=3)
+        )
+
+        report = session_reaper.sweep(batch_size=1)
+
+        self.assertEqual((report['completed'], report['abandoned'], report['backlog']), (1, 1, 0))
+        self.assertTrue(ExerciseSession.objects.get(id=stale.id).is_abandoned)
+        self.assertTrue(ExerciseSession.objects.get(id=finished.id).is_completed)
+        fresh.refresh_from_db()
+        self.assertFalse(fresh.is_completed or fresh.is_abandoned)
+        self.assertEqual(UserVocabulary.objects.get(user=user).abandoned_exercises, 1)
+
+        # Ya cerrada: abandonarla otra vez no vuelve a penalizar
+        self.assertEqual(ExerciseSession.objects.get(id=stale.id).mark_abandoned(), 0)
+        self.assertEqual(session_reaper.sweep()['backlog'], 0)
+
+
+@override_settings(ACTIVITY_LOG_ASYNC=False)
+class DailyActivityRollupTests(TestCase):
+    """UserDailyActivity: mantenido al escribir ActivityLog y reconstruible"""
+
+    def test_incremental_matches_rebuild(self):
+        user = User.objects.create_user(username='diario', password='x')
+        events = [
+            ActivityLog(user=user, activity_type='detection_session', word_learned='allqu'),
+            ActivityLog(user=user, activity_type='exercise_completed', word_learned='allqu',
+                        details={'is_correct': True}),
+            ActivityLog(user=user, activity_type='exercise_completed', word_learned='misi',
+                        details={'is_correct': False}),
+            ActivityLog(user=user, activity_type='exercise_abandoned', word_learned='misi'),
+            ActivityLog(user=user, activity_type='session_completed'),
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            activity_log.log_activities(events[:2])
+        with self.captureOnCommitCallbacks(execute=True):
+            activity_log.log_activities(events[2:])
+
+        today = timezone.localdate()
+        with self.assertNumQueries(1):
+            row = daily_activity.by_date(user, today - timedelta(days=6), today)[today]
+        counts = (row.detections, row.exercises, row.correct_answers, row.abandonments, row.distinct_words)
+        self.assertEqual(counts, (1, 2, 1, 1, 2))
+
+        self.assertEqual(daily_activity.rebuild([user.id]), 1)
+        row = UserDailyActivity.objects.get(user=user, date=today)
+        self.assertEqual(
+            (row.detections, row.exercises, row.correct_answers, row.abandonments, row.distinct_words),
+            counts
+        )
+
+
+class LogPartitionTests(TestCase):
+    """Limpieza de ActivityLog sin particiones (SQLite): DELETE por lotes"""
+
+    def test_cleanup_deletes_only_expired_rows(self):
+        user = User.objects.create_user(username='limpieza', password='x')
+        ActivityLog.objects.bulk_create([ActivityLog(user=user, activity_type='login') for _ in range(3)])
+        old = ActivityLog.objects.filter(user=user).order_by('id')[:2].values_list('id', flat=True)
+        ActivityLog.objects.filter(id__in=list(old)).update(timestamp=timezone.now() - timedelta(days=120))
+
+        self.assertFalse(log_partitions.is_partitioned())
+        self.assertEqual(log_partitions.ensure_partitions(), [])
+        with override_settings(ACTIVITY_LOG_RETENTION_DAYS=90):
+            result = log_partitions.cleanup()
+        self.assertEqual(result, {'partitions': [], 'rows': 2})
+        self.assertEqual(ActivityLog.objects.filter(user=user).count(), 1)
+
+
+class VocabularyListingTests(TestCase):
+    """Listado del vocabulario: origen, cursor (keyset) y days_since_practice en SQL"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='listado', password='x')
+        now = timezone.now()
+        for i, (word, level, origin) in enumerate([
+            ('allqu', 3, 'detection'), ('misi', 1, 'exercise'), ('wasi', 3, 'detection'),
+            ('yaku', 5, 'manual'), ('inti', 1, 'detection'),
+        ]):
+            vocab = UserVocabulary.objects.create(
+                user=self.user, object_label=word, spanish_word=f'palabra {i}', quechua_word=word,
+                mastery_level=level, origin=origin
+            )
+            # Fechas repetidas: el cursor desempata por id
+            UserVocabulary.objects.filter(id=vocab.id).update(
+                last_detected=now - timedelta(hours=i // 2), last_practiced=now - timedelta(days=i, hours=1)
+            )
+
+    def test_cursor_pages_match_full_listing(self):
+        for sort_by in vocabulary_listing.ORDERINGS:
+            queryset = vocabulary_listing.vocabulary_queryset(self.user, sort_by=sort_by)
+            expected = [vocab.id for vocab in queryset]
+            seen, cursor = [], None
+            while True:
+                rows, cursor = vocabulary_listing.paginate(queryset, sort_by, cursor=cursor, page_size=2)
+                seen.extend(vocab.id for vocab in rows)
+                if cursor is None:
+                    break
+            self.assertEqual(seen, expected, sort_by)
+
+        with self.assertRaises(ValueError):
+            vocabulary_listing.paginate(queryset, 'recent', cursor='no-es-un-cursor')
+
+    def test_origin_filter_and_days_since_practice(self):
+        queryset = vocabulary_listing.vocabulary_queryset(self.user, sort_by='alphabetical', origin='detection')
+        self.assertEqual([v.quechua_word for v in queryset], ['allqu', 'wasi', 'inti'])
+        self.assertEqual([v.days_since_practice for v in queryset], [0, 2, 4])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ACTIVITY_LOG_ASYNC=False, SYNC_SETTLE_SECONDS=0, SESSION_STATE_REDIS=False)
+class SyncTests(TestCase):
+    """Sincronización incremental: cursor sobre ChangeLog, lápidas y cambios del cliente"""
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='sincroniza', password='x')
+        self.translation = ObjectTranslation.objects.create(english_label='dog', spanish='perro', quechua='Allqu')
+        self.session = ExerciseSession.objects.create(user=self.user, mode='practice', exercises_total=1)
+        self.exercise = Exercise.objects.create(
+            type='multiple_choice', category='vocabulary', object_translation=self.translation,
+            question='¿Cómo se dice perro?', answer='Allqu', distractors=['misi', 'wasi', 'yaku'],
+            metadata={'mode': 'practice', 'session_id': self.session.id}
+        )
+        ExerciseSessionLog.objects.create(session=self.session, exercise=self.exercise)
+        self.vocab = UserVocabulary.objects.create(
+            user=self.user, object_label='cat', spanish_word='gato', quechua_word='misi'
+        )
+
+    def test_snapshot_then_deltas_with_tombstones(self):
+        snapshot = sync.changes(self.user, cursor=0)
+        self.assertTrue(snapshot['reset'])
+        self.assertEqual([v.quechua_word for v in snapshot['vocabulary']], ['misi'])
+        cursor = snapshot['cursor']
+        self.assertEqual(cursor, ChangeLog.objects.order_by('-id').first().id)
+
+        other = User.objects.create_user(username='otro', password='x')
+        UserVocabulary.objects.create(user=other, object_label='house', spanish_word='casa', quechua_word='wasi')
+        vocab_id = self.vocab.id
+        self.vocab.delete()
+        # Vigencia del cursor + recorrido del índice (solo lápidas: nada que cargar)
+        with self.assertNumQueries(2):
+            delta = sync.changes(self.user, cursor=cursor)
+        self.assertFalse(delta['reset'])
+        self.assertEqual(delta['vocabulary'], [])
+        self.assertEqual(delta['deleted']['vocabulary'], [vocab_id])
+        self.assertGreater(delta['cursor'], cursor)
+
+        # Sin cambios nuevos el cursor no se mueve
+        self.assertEqual(sync.changes(self.user, cursor=delta['cursor'])['cursor'], delta['cursor'])
+
+    def test_mutations_are_applied_once_and_returned_as_changes(self):
+        self.addCleanup(cache.clear)
+        cursor = sync.changes(self.user, cursor=0)['cursor']
+        mutation = {
+            'id': 'm-1', 'type': 'answers', 'session_id': self.session.id,
+            'answers': [{'exercise_id': self.exercise.id, 'answer': 'allqu'}],
+        }
+        results = sync.apply_mutations(self.user, [mutation, {'id': 'm-2', 'type': 'desconocido'}])
+        self.assertEqual([r['status'] for r in results], ['applied', 'rejected'])
+        self.assertEqual(sync.apply_mutations(self.user, [mutation])[0]['status'], 'duplicate')
+
+        delta = sync.changes(self.user, cursor=cursor)
+        self.assertEqual([v.quechua_word for v in delta['vocabulary']], ['allqu'])
+        self.assertEqual([s['id'] for s in delta['sessions']], [self.session.id])
+        self.assertTrue(delta['sessions'][0]['is_completed'])
+
+    def test_pruned_cursor_gets_a_snapshot(self):
+        cursor = sync.changes(self.user, cursor=0)['cursor']
+        self.vocab.mastery_level = 2
+        self.vocab.save()
+        self.assertEqual(sync.prune(timezone.now() + timedelta(seconds=1)), 2)
+        self.vocab.save()
+        self.assertTrue(sync.changes(self.user, cursor=cursor)['reset'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CompactExercisesTests(TestCase):
+    """manage.py compact_exercises: fusión de duplicados, purga y reanudación"""
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='compacta', password='x')
+        self.other = User.objects.create_user(username='compacta2', password='x')
+        self.translation = ObjectTranslation.objects.create(english_label='dog', spanish='perro', quechua='Allqu')
+        self.survivor, self.duplicate, self.variant = [
+            self._exercise(distractors) for distractors in (['misi', 'wasi'], ['misi', 'wasi'], ['yaku', 'wasi'])
+        ]
+        self.unanswered = self._exercise(['inti'], question='¿Otra pregunta?')
+        self.answered = self._exercise(['killa'], question='¿Respondida?')
+        # Ejercicios de hace 60 días (fuera de la retención y de las sesiones en curso)
+        Exercise.objects.update(created_at=timezone.now() - timedelta(days=60))
+
+        session = ExerciseSession.objects.create(user=self.user, mode='practice')
+        self.duplicate_log = ExerciseSessionLog.objects.create(session=session, exercise=self.duplicate)
+        self.answered_log = ExerciseSessionLog.objects.create(
+            session=session, exercise=self.answered, is_completed=True, is_correct=True
+        )
+        UserProgress.objects.create(user=self.user, exercise=self.survivor, attempts=2)
+        UserProgress.objects.create(user=self.user, exercise=self.duplicate, attempts=3, correct=True, completed=True)
+        UserProgress.objects.create(user=self.other, exercise=self.duplicate, attempts=1)
+        # Mismos textos con otros distractores: no es duplicado
+        UserProgress.objects.create(user=self.user, exercise=self.variant, attempts=1)
+
+    def _exercise(self, distractors, question='¿Cómo se dice perro?'):
+        return Exercise.objects.create(
+            type='multiple_choice', object_translation=self.translation,
+            question=question, answer='Allqu', distractors=distractors
+        )
+
+    def _compact(self, *args):
+        call_command('compact_exercises', *args, stdout=StringIO())
+
+    def test_duplicates_collapse_and_references_are_merged(self):
+        self._compact()
+
+        remaining = set(Exercise.objects.values_list('id', flat=True))
+        self.assertEqual(remaining, {self.survivor.id, self.variant.id, self.answered.id})
+        self.duplicate_log.refresh_from_db()
+        self.assertEqual(self.duplicate_log.exercise_id, self.survivor.id)
+        self.assertTrue(ExerciseSessionLog.objects.filter(id=self.answered_log.id).exists())
+
+        self.assertEqual(UserProgress.objects.filter(user=self.user).count(), 2)
+        merged = UserProgress.objects.get(user=self.user, exercise_id=self.survivor.id)
+        self.assertEqual((merged.exercise_id, merged.attempts, merged.correct, merged.completed),
+                         (self.survivor.id, 5, True, True))
+        self.assertEqual(UserProgress.objects.get(user=self.other).exercise_id, self.survivor.id)
+        self.assertIsNone(cache.get('compact_exercises:checkpoint'))
+
+    def test_dry_run_writes_nothing(self):
+        before = (Exercise.objects.count(), list(UserProgress.objects.values_list('id', 'exercise_id', 'attempts')))
+        self._compact('--dry-run')
+        after = (Exercise.objects.count(), list(UserProgress.objects.values_list('id', 'exercise_id', 'attempts')))
+        self.assertEqual(before, after)
+        self.duplicate_log.refresh_from_db()
+        self.assertEqual(self.duplicate_log.exercise_id, self.duplicate.id)
+        self.assertIsNone(cache.get('compact_exercises:checkpoint'))
+
+    def test_resumes_from_checkpoint(self):
+        # Ejecución interrumpida después de deduplicar: solo falta la purga
+        cache.set('compact_exercises:checkpoint', {'phase': 'purge', 'last_id': 0}, timeout=None)
+        self._compact()
+
+        remaining = set(Exercise.objects.values_list('id', flat=True))
+        self.assertEqual(remaining, {self.survivor.id, self.duplicate.id, self.variant.id, self.answered.id})
+        self.assertIsNone(cache.get('compact_exercises:checkpoint'))
+
+
+class FakeClock:
+    """Reemplazo de time.monotonic que solo avanza con advance()"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class LLMClientTests(TestCase):
+    """Circuit breaker, presupuesto de reintentos y reset_client con un reloj falso"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(llm_client.time, 'monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_breaker_opens_half_opens_and_closes(self):
+        breaker = llm_client.CircuitBreaker(failure_threshold=2, latency_threshold=5.0, reset_timeout=30.0)
+        for _ in range(2):
+            self.assertTrue(breaker.allow_request())
+            breaker.record_failure()
+        self.assertEqual(breaker.state, breaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+        self.assertFalse(breaker.is_available())
+
+        # Pasado el reset_timeout deja pasar una sola llamada de prueba
+        self.clock.advance(30)
+        self.assertTrue(breaker.is_available())
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, breaker.HALF_OPEN)
+        self.assertFalse(breaker.allow_request())
+
+        # Prueba fallida (o lenta): vuelve a abrirse
+        breaker.record_success(latency=6.0)
+        self.assertEqual(breaker.state, breaker.OPEN)
+
+        self.clock.advance(30)
+        self.assertTrue(breaker.allow_request())
+        breaker.record_success(latency=0.5)
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        snapshot = breaker.snapshot()
+        self.assertEqual((snapshot['opened'], snapshot['slow_calls'], snapshot['short_circuited']), (2, 1, 2))
+
+    def test_retry_budget_is_exhausted_and_recovers(self):
+        budget = llm_client.RetryBudget(ratio=0.2, window=60.0, min_retries=1)
+        for _ in range(10):
+            budget.record_request()
+        self.assertTrue(budget.try_acquire())
+        self.assertTrue(budget.try_acquire())
+        self.assertFalse(budget.try_acquire())
+        self.assertEqual(budget.snapshot()['retry_budget_exhausted'], 1)
+
+        self.clock.advance(61)
+        self.assertEqual(budget.snapshot()['requests_in_window'], 0)
+        self.assertTrue(budget.try_acquire())
+
+    @override_settings(OPENAI_API_KEY='test', OPENAI_MAX_RETRIES=2)
+    def test_chat_completion_retries_within_budget_then_short_circuits(self):
+        client = mock.Mock()
+        timeout = llm_client.openai.APITimeoutError(request=llm_client.httpx.Request('POST', 'http://llm'))
+        client.chat.completions.create.side_effect = timeout
+        with mock.patch.object(llm_client, '_client', client), \
+                mock.patch.object(llm_client, 'breaker', llm_client.CircuitBreaker(failure_threshold=3)), \
+                mock.patch.object(llm_client, 'retry_budget', llm_client.RetryBudget(min_retries=1)), \
+                mock.patch.object(llm_client.time, 'sleep'):
+            with self.assertRaises(llm_client.openai.APITimeoutError):
+                llm_client.chat_completion([{'role': 'user', 'content': 'hola'}])
+            # Un solo reintento: el presupuesto (mínimo 1) se agotó antes que OPENAI_MAX_RETRIES
+            self.assertEqual(client.chat.completions.create.call_count, 2)
+
+            with self.assertRaises(llm_client.openai.APITimeoutError):
+                llm_client.chat_completion([{'role': 'user', 'content': 'hola'}])
+            self.assertEqual(llm_client.breaker.state, llm_client.CircuitBreaker.OPEN)
+            with self.assertRaises(llm_client.CircuitOpenError):
+                llm_client.chat_completion([{'role': 'user', 'content': 'hola'}])
+            self.assertEqual(client.chat.completions.create.call_count, 3)
+
+    def test_reset_client_closes_client_and_resets_state(self):
+        client = mock.Mock()
+        with mock.patch.object(llm_client, '_client', client), \
+                mock.patch.object(llm_client, 'breaker', llm_client.breaker), \
+                mock.patch.object(llm_client, 'retry_budget', llm_client.retry_budget):
+            old_breaker = llm_client.breaker
+            llm_client.reset_client()
+            client.close.assert_called_once()
+            self.assertIsNone(llm_client._client)
+            self.assertIsNot(llm_client.breaker, old_breaker)
+            self.assertEqual(llm_client.breaker.state, llm_client.CircuitBreaker.CLOSED)
+
+
+@unittest.skipIf(views is None, 'views.py necesita Firebase y ultralytics configurados')
+@override_settings(CACHES=LOCMEM_CACHES, OPENAI_API_KEY='', ACTIVITY_LOG_ASYNC=False, SESSION_STATE_REDIS=False)
+class ExerciseStreamTests(TestCase):
+    """generate_by_label_stream: NDJSON por defecto y SSE por parámetro o cabecera Accept"""
+
+    URL = '/api/exercises/generate_by_label_stream/'
+
+    def setUp(self):
+        for english, spanish, quechua in [
+            ('dog', 'perro', 'allqu'), ('cat', 'gato', 'misi'), ('house', 'casa', 'wasi'), ('water', 'agua', 'yaku'),
+        ]:
+            ObjectTranslation.objects.create(english_label=english, spanish=spanish, quechua=quechua)
+        self.user = User.objects.create_user(username='stream', password='x')
+        self.client.force_login(self.user)
+
+    def _check_events(self, events):
+        self.assertEqual(events[0][0], 'session')
+        self.assertEqual(events[-1][0], 'done')
+        exercises = [payload for event, payload in events if event == 'exercise']
+        self.assertTrue(exercises)
+        self.assertEqual(events[-1][1]['count'], len(exercises))
+        session = ExerciseSession.objects.get(id=events[0][1]['session_id'])
+        self.assertEqual(session.exercises_total, len(exercises))
+        self.assertTrue(all(payload['exercise']['id'] for payload in exercises))
+
+    def test_ndjson_stream(self):
+        response = self.client.get(self.URL, {'label': 'dog', 'mode': 'practice'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        events = [(item.pop('event'), item) for item in map(json.loads, lines)]
+        self._check_events(events)
+
+    def test_sse_stream_by_parameter_or_accept_header(self):
+        for params, headers in [
+            ({'stream': 'sse'}, {}), ({'format': 'sse'}, {}), ({}, {'HTTP_ACCEPT': 'text/event-stream'}),
+        ]:
+            response = self.client.get(self.URL, {'label': 'dog', **params}, **headers)
+            self.assertEqual(response.status_code, 200, params or headers)
+            self.assertTrue(response['Content-Type'].startswith('text/event-stream'))
+            blocks = b''.join(response.streaming_content).decode().strip().split('\n\n')
+            events = []
+            for block in blocks:
+                event_line, data_line = block.split('\n')
+                events.append((event_line[len('event: '):], json.loads(data_line[len('data: '):])))
+            self._check_events(events)
+
+    def test_errors_before_the_stream_use_the_negotiated_format(self):
+        response = self.client.get(self.URL, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.content.decode().startswith('event: error\ndata: '))
+
+        response = self.client.get(self.URL, {'label': 'nada'})
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('error', response.json())
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PRACTICE_PREFETCH_ENABLED=True)
+class PracticePrefetchTests(TestCase):
+    """Sesión de práctica preparada por adelantado: guardado, uso y candado"""
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='previa', password='x')
+        for i in range(12):
+            ObjectTranslation.objects.create(english_label=f'word{i}', spanish=f'palabra {i}', quechua=f'Simi{i}')
+        self.key = practice_exercises.PREFETCH_KEY.format(user_id=self.user.id, category='vocabulary', mode='practice')
+
+    def _prefetch(self, count):
+        # Se llama sin hilo: no cerrar la conexión de la prueba
+        with mock.patch.object(practice_exercises.connection, 'close'):
+            practice_exercises._prefetch_session(self.user, 'vocabulary', 'practice', count, 60)
+
+    def test_prefetched_session_is_stored_and_used_once(self):
+        self._prefetch(10)
+        prefetched = cache.get(self.key)
+        self.assertEqual(len(prefetched), 10)
+
+        specs = practice_exercises.session_specs(self.user, 'vocabulary', 'practice', 10)
+        self.assertEqual(specs, prefetched)
+        self.assertIsNone(cache.get(self.key))
+        self.assertIsNone(practice_exercises.pop_prefetched_specs(self.user, 'vocabulary', 'practice', 10))
+
+    def test_short_prefetch_is_topped_up_without_repeating_words(self):
+        self._prefetch(3)
+        prefetched = cache.get(self.key)
+
+        specs = practice_exercises.session_specs(self.user, 'vocabulary', 'practice', 10)
+        self.assertEqual(len(specs), 10)
+        self.assertEqual(specs[:3], prefetched)
+        translation_ids = [spec['object_translation_id'] for spec in specs]
+        self.assertEqual(len(set(translation_ids)), 10)
+        self.assertIsNone(cache.get(self.key))
+
+    def test_prefetch_is_scheduled_once_per_session(self):
+        session = ExerciseSession.objects.create(
+            user=self.user, mode='practice', exercises_total=10, exercises_completed=8
+        )
+        with mock.patch.object(practice_exercises.threading, 'Thread') as thread:
+            practice_exercises.maybe_prefetch_next_session(self.user, session, 'vocabulary')
+            practice_exercises.maybe_prefetch_next_session(self.user, session, 'vocabulary')
+        self.assertEqual(thread.call_count, 1)
+        thread.return_value.start.assert_called_once_with()
+        self.assertEqual(thread.call_args.kwargs['args'], (self.user, 'vocabulary', 'practice', 10, 600))
+
+
+def fake_chat_completion(messages, **kwargs):
+    """Respuesta del LLM según el tipo de ejercicio que pide el prompt"""
+    prompt = messages[-1]['content']
+    if 'Genera tres ejercicios' in prompt:
+        return json.dumps({
+            'multiple_choice': {'question': '¿Perro?', 'correct_answer': 'Allqu', 'distractors': ['Misi', 'Wasi']},
+            'fill_blanks': {'question': 'A _ _ q u', 'answer': 'Allqu', 'hint': 'Ladra'},
+            'pronunciation': {'instructions': 'Despacio.', 'phonetic_guide': 'al-yu'},
+        })
+    if 'selección múltiple' in prompt:
+        return '```json\n{"question": "¿Perro?", "correct_answer": "Allqu", "distractors": ["Misi"]}\n```'
+    if 'completar espacios' in prompt:
+        return json.dumps({'question': 'A _ _ q u', 'answer': 'Allqu', 'hint': 'Ladra'})
+    if 'pronunciación' in prompt:
+        return json.dumps({'instructions': 'Despacio.', 'phonetic_guide': 'al-yu'})
+    raise AssertionError(prompt)
+
+
+@override_settings(OPENAI_API_KEY='test')
+class ExerciseGeneratorModeTests(TestCase):
+    """Modos serial, concurrent y single, e iter_exercises, con el LLM simulado"""
+
+    def setUp(self):
+        self.translation = ObjectTranslation.objects.create(english_label='dog', spanish='perro', quechua='Allqu')
+        for english, spanish, quechua in (('cat', 'gato', 'Misi'), ('house', 'casa', 'Wasi'), ('water', 'agua', 'Yaku')):
+            ObjectTranslation.objects.create(english_label=english, spanish=spanish, quechua=quechua)
+        for target, kwargs in (
+            (llm_client, {'get_openai_client': mock.Mock(return_value=object())}),
+            (llm_client.breaker, {'is_available': mock.Mock(return_value=True)}),
+            (llm_client, {'chat_completion': mock.Mock(side_effect=fake_chat_completion)}),
+        ):
+            patcher = mock.patch.multiple(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.service = exercise_generator.ExerciseGeneratorService()
+
+    def _types(self, exercises):
+        return [exercise.type for exercise in exercises]
+
+    @override_settings(EXERCISE_GENERATION_MODE='serial')
+    def test_serial_mode_skips_failed_items(self):
+        exercises = self.service.generate_exercises(self.translation)
+        self.assertEqual(self._types(exercises), ['multiple_choice', 'fill_blanks', 'matching', 'pronunciation'])
+        self.assertEqual(exercises[0].distractors, ['Misi'])
+        self.assertEqual(llm_client.chat_completion.call_count, 3)
+
+        # Un fallo del LLM solo quita su ejercicio
+        def failing(messages, **kwargs):
+            if 'completar espacios' in messages[-1]['content']:
+                raise RuntimeError('timeout')
+            return fake_chat_completion(messages)
+
+        llm_client.chat_completion.side_effect = failing
+        exercises = self.service.generate_exercises(self.translation)
+        self.assertEqual(self._types(exercises), ['multiple_choice', 'matching', 'pronunciation'])
+
+    @override_settings(EXERCISE_GENERATION_MODE='concurrent')
+    def test_concurrent_mode_keeps_order_and_isolates_errors(self):
+        finished = []
+
+        def generator(name, delay, error=None):
+            def generate(object_translation, user_level):
+                # Terminan en orden inverso al de la lista
+                time.sleep(delay)
+                finished.append(name)
+                if error:
+                    raise error
+                return Exercise(type=name, object_translation=object_translation, difficulty=user_level)
+            generate.__name__ = name
+            return generate
+
+        generators = (
+            generator('multiple_choice', 0.15), generator('fill_blanks', 0.1, RuntimeError('timeout')),
+            generator('matching', 0.05), generator('pronunciation', 0),
+        )
+        with mock.patch.object(self.service, '_llm_generators', return_value=generators):
+            exercises = self.service.generate_exercises(self.translation)
+
+        self.assertEqual(finished, ['pronunciation', 'matching', 'fill_blanks', 'multiple_choice'])
+        self.assertEqual(self._types(exercises), ['multiple_choice', 'matching', 'pronunciation'])
+
+    @override_settings(EXERCISE_GENERATION_MODE='single')
+    def test_single_mode_uses_one_call(self):
+        exercises = self.service.generate_exercises(self.translation, user_level=2)
+        self.assertEqual(self._types(exercises), ['multiple_choice', 'fill_blanks', 'matching', 'pronunciation'])
+        self.assertEqual(llm_client.chat_completion.call_count, 1)
+        self.assertEqual({exercise.difficulty for exercise in exercises}, {2})
+
+        # Respuesta incompleta: se conserva lo que sí vino
+        llm_client.chat_completion.side_effect = lambda messages, **kwargs: json.dumps(
+            {'pronunciation': {'instructions': 'Despacio.', 'phonetic_guide': 'al-yu'}}
+        )
+        exercises = self.service.generate_exercises(self.translation)
+        self.assertEqual(self._types(exercises), ['matching', 'pronunciation'])
+
+    @override_settings(EXERCISE_GENERATION_MODE='serial')
+    def test_all_llm_items_failing_falls_back(self):
+        llm_client.chat_completion.side_effect = RuntimeError('caído')
+        exercises = self.service.generate_exercises(self.translation)
+        # Relacionar no usa el LLM; el resto se pierde pero la respuesta no queda vacía
+        self.assertEqual(self._types(exercises), ['matching'])
+
+        with mock.patch.object(self.service, '_generate_matching', return_value=None):
+            exercises = self.service.generate_exercises(self.translation)
+        self.assertEqual(self._types(exercises),
+                         ['multiple_choice', 'fill_blanks', 'pronunciation', 'matching', 'anagram'])
+
+    def test_iter_exercises_yields_fallback_first_and_stops_when_breaker_opens(self):
+        origins = [origin for origin, _ in self.service.iter_exercises(self.translation)]
+        self.assertEqual(origins, ['fallback'] * 5 + ['llm'] * 4)
+
+        llm_client.breaker.is_available.side_effect = [True, False]
+        items = list(self.service.iter_exercises(self.translation))
+        self.assertEqual([origin for origin, _ in items], ['fallback'] * 5 + ['llm'])
+        self.assertEqual(items[-1][1].type, 'multiple_choice')
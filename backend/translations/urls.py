@@ -25,4 +25,5 @@ urlpatterns = [
     path('practice/user_vocabulary/', views.PracticeViewSet.as_view({'get': 'user_vocabulary'}), name='user-vocabulary'),
     path('achievements/check/', views.check_achievements, name='check-achievements'),
     path('daily-goal/', views.daily_goal_view, name='daily-goal'),
+    path('sync/', views.ProgressViewSet.as_view({'post': 'sync'}), name='sync'),
 ]
\ No newline at end of file
@@ -11,15 +11,16 @@ from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
 from django.db import models, transaction, IntegrityError
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
 from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
 
 import firebase_admin
 from firebase_admin import auth as firebase_auth
@@ -30,7 +31,7 @@ from google.auth.transport import requests as google_requests
 from django.conf import settings
 
 # Imports ACTUALIZADOS para el nuevo sistema
-from django.db.models import Sum, Count, Avg, Q, Exists, OuterRef
+from django.db.models import Sum, Count, Avg, Q, Exists, OuterRef, F
 import random
 from .models import (
     ObjectTranslation, UserProfile, Exercise, UserProgress,
@@ -43,8 +44,17 @@ from .serializers import (
     UserAchievementSerializer, ActivityLogSerializer, PronunciationRecordSerializer,
     UserVocabularySerializer, DailyGoalSerializer
 )
+from .renderers import EventStreamRenderer, NDJSONRenderer, encode_event
 from .services.detection import ObjectDetectionService
 from .services.exercise_generator import ExerciseGeneratorService
+from .services import (
+    llm_client, practice_exercises, answer_pipeline, daily_goals, abandonment, session_state,
+    daily_activity, star_histogram, sync, user_cache, vocabulary_listing
+)
+from .services.activity_log import log_activity
+from .services.idempotency import idempotent
+from .services.conditional import conditional_get
+from .services.user_cache import cached_per_user
 import logging
 
 logger = logging.getLogger(__name__)
@@ -171,6 +181,14 @@ class ObjectTranslationViewSet(viewsets.ModelViewSet):
     search_fields = ['english_label', 'spanish', 'quechua']
     ordering_fields = ['english_label', 'created_at']
     ordering = ['english_label']
+    
+    @conditional_get(per_user=False, tables=['object_translation'])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @conditional_get(per_user=False, tables=['object_translation'])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
 class ObjectDetectionViewSet(viewsets.ViewSet):
     def __init__(self, *args, **kwargs):
@@ -178,6 +196,7 @@ class ObjectDetectionViewSet(viewsets.ViewSet):
         self.detection_service = ObjectDetectionService()
 
     @action(detail=False, methods=['POST'])
+    @idempotent
     def detect(self, request):
         """
         Detecta objetos en una imagen y retorna sus traducciones.
@@ -231,7 +250,8 @@ class ObjectDetectionViewSet(viewsets.ViewSet):
                     defaults={
                         'object_label': primary_object['label'],
                         'spanish_word': primary_object['spanish'].strip(),
-                        'mastery_level': 1
+                        'mastery_level': 1,
+                        'origin': 'detection'
                     }
                 )
                 
@@ -244,12 +264,16 @@ class ObjectDetectionViewSet(viewsets.ViewSet):
                     # Si ya existe, incrementar contador de detecciones
                     user_vocab.times_detected += 1
                     user_vocab.last_detected = timezone.now()
+                    # Agregada antes en un ejercicio: ahora también es palabra detectada
+                    user_vocab.origin = 'detection'
                     user_vocab.save()
                 
+                # Progreso y vocabulario cambiaron: invalidar respuestas en caché
+                user_cache.bump(request.user)
+                
                 # 4. REGISTRO DE SESIÓN: Una detección de la palabra principal
-                ActivityLog.objects.create(
-                    user=request.user,
-                    activity_type='detection_session',
+                log_activity(
+                    request.user, 'detection_session',
                     mode='detection',
                     word_learned=normalized_primary,  # Solo la palabra principal
                     details={
@@ -275,21 +299,7 @@ class ObjectDetectionViewSet(viewsets.ViewSet):
                 request.user.profile.update_streak()
                 
                 # 6. META DIARIA: Solo incrementar una vez
-                today = timezone.now().date()
-                daily_goal, _ = DailyGoal.objects.get_or_create(
-                    user=request.user,
-                    date=today,
-                    defaults={
-                        'words_detected': 0,
-                        'words_practiced': 0,
-                        'words_mastered': 0,
-                        'detection_goal': 3,
-                        'practice_goal': 5,
-                        'mastery_goal': 1
-                    }
-                )
-                daily_goal.words_detected += 1  # Solo +1 por sesión
-                daily_goal.save()
+                daily_goals.increment(request.user, detected=1)  # Solo +1 por sesión
                 
                 # 7. PREPARAR RESPUESTA
                 response_data = {
@@ -379,6 +389,7 @@ class UserViewSet(viewsets.ModelViewSet):
         )
         if serializer.is_valid():
             serializer.save()
+            user_cache.bump(request.user)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -390,7 +401,7 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 class ExerciseViewSet(viewsets.ModelViewSet):
-    queryset = Exercise.objects.all()
+    queryset = Exercise.objects.select_related('object_translation')
     serializer_class = ExerciseSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     
@@ -531,7 +542,97 @@ class ExerciseViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
             
+    @action(detail=False, methods=['GET'],
+            renderer_classes=[JSONRenderer, NDJSONRenderer, EventStreamRenderer])
+    def generate_by_label_stream(self, request):
+        """
+        Variante en streaming de generate_by_label.
+        Envía primero el ID de sesión y luego cada ejercicio apenas está listo:
+        los de respaldo (una lectura a la BD) primero y los de IA después.
+        Formato NDJSON por defecto; SSE con ?stream=sse, ?format=sse o
+        Accept: text/event-stream (ver translations/renderers.py).
+        """
+        label = request.query_params.get('label')
+        mode = request.query_params.get('mode', 'detection')
+        
+        if not label:
+            return Response({'error': 'Se requiere label'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        object_translation = ObjectTranslation.objects.filter(
+            english_label__iexact=label
+        ).first()
+        
+        if not object_translation:
+            return Response({'error': f'No se encontró traducción para la etiqueta: {label}'}, 
+                          status=status.HTTP_404_NOT_FOUND)
+        
+        user_level = 1
+        session = None
+        if request.user.is_authenticated:
+            user_level = request.user.profile.current_level
+            # El total se incrementa a medida que se entregan ejercicios, para que
+            # una respuesta temprana no cierre la sesión antes de tiempo
+            session = ExerciseSession.objects.create(
+                user=request.user,
+                mode=mode,
+                exercises_total=0
+            )
+        
+        use_sse = (request.query_params.get('stream') == 'sse' or
+                   isinstance(request.accepted_renderer, EventStreamRenderer))
+        
+        def encode(event, payload):
+            return encode_event(event, payload, sse=use_sse)
+        
+        def event_stream():
+            yield encode('session', {'session_id': session.id if session else None})
+            
+            delivered = 0
+            try:
+                exercise_generator = ExerciseGeneratorService()
+                for source, exercise in exercise_generator.iter_exercises(object_translation, user_level):
+                    if not exercise.metadata:
+                        exercise.metadata = {}
+                    exercise.metadata['mode'] = mode
+                    exercise.metadata['practice_mode'] = (mode == 'practice')
+                    exercise.metadata['source'] = source
+                    if session:
+                        exercise.metadata['session_id'] = session.id
+                    exercise.save()
+                    
+                    if session:
+                        session_log = ExerciseSessionLog.objects.create(session=session, exercise=exercise)
+                        ExerciseSession.objects.filter(id=session.id).update(
+                            exercises_total=F('exercises_total') + 1
+                        )
+                        # Si la sesión ya tiene respuestas en Redis
+                        session_state.add_exercise(session.id, exercise.id, session_log.id)
+                    
+                    delivered += 1
+                    yield encode('exercise', {
+                        'source': source,
+                        'exercise': ExerciseSerializer(exercise, context={'request': request}).data
+                    })
+            except Exception as e:
+                logger.error(f"Error al generar ejercicios en streaming: {str(e)}", exc_info=True)
+                yield encode('error', {'error': f'Error interno del servidor: {str(e)}'})
+            
+            yield encode('done', {'count': delivered})
+        
+        content_type = 'text/event-stream' if use_sse else 'application/x-ndjson'
+        response = StreamingHttpResponse(event_stream(), content_type=content_type)
+        response['Cache-Control'] = 'no-cache'
+        # Evita que nginx acumule la respuesta antes de enviarla
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    @action(detail=False, methods=['GET'], permission_classes=[IsAdminUser])
+    def generator_status(self, request):
+        """Métricas del cliente OpenAI de este worker (circuit breaker y reintentos); solo staff"""
+        return Response(llm_client.get_metrics())
+    
     @action(detail=True, methods=['POST'])
+    @idempotent
     def submit_answer(self, request, pk=None):
         """Verifica la respuesta de un ejercicio y actualiza el dominio de la palabra"""
         if not request.user.is_authenticated:
@@ -546,255 +647,84 @@ class ExerciseViewSet(viewsets.ModelViewSet):
         logger.info(f"🎯 Respuesta recibida: '{answer}'")
         logger.info(f"🎯 Respuesta esperada: '{exercise.answer}'")
         
-        # Mejorar la determinación del modo 
-        mode = request.data.get('mode')
         # Asegurar que siempre tengamos un modo válido
-        if not mode or mode not in ['detection', 'practice']:
-            # Verificar metadata del ejercicio primero
-            if exercise.metadata and exercise.metadata.get('mode'):
-                mode = exercise.metadata.get('mode')
-            elif exercise.metadata and exercise.metadata.get('practice_mode'):
-                mode = 'practice'
-            elif exercise.category == 'detection':
-                mode = 'detection'
-            else:
-                # Último recurso: por defecto es práctica
-                mode = 'practice'
+        mode = answer_pipeline.resolve_mode(exercise, request.data.get('mode'))
         
         if not answer:
             return Response({'error': 'Se requiere una respuesta'}, 
                         status=status.HTTP_400_BAD_REQUEST)
-            
-        # ✅ VERIFICACIÓN DE RESPUESTA MEJORADA POR TIPO DE EJERCICIO
-        is_correct = False
         
+        # ✅ Verificación, dominio, progreso, sesión, actividad y meta diaria
+        # en una sola transacción (ver services/answer_pipeline.py)
         try:
-            if exercise.type == 'pronunciation':
-                # Para pronunciación, siempre consideramos correcto si llegó hasta aquí
-                is_correct = True
-                
-            elif exercise.type == 'matching':
-                # ✅ LÓGICA ESPECÍFICA PARA MATCHING
-                logger.info(f"🔍 Procesando ejercicio de matching")
-                
-                if '→' in answer:
-                    # Formato "español→quechua"
-                    parts = answer.split('→')
-                    if len(parts) == 2:
-                        spanish_part = parts[0].strip()
-                        quechua_part = parts[1].strip()
-                        
-                        # Verificar que la parte en quechua coincida con la respuesta esperada
-                        is_correct = (quechua_part.lower() == exercise.answer.lower().strip())
-                        
-                        # Log adicional para depuración
-                        logger.info(f"🔍 Matching - Español: '{spanish_part}', Quechua: '{quechua_part}'")
-                        logger.info(f"🔍 Comparando '{quechua_part.lower()}' con '{exercise.answer.lower().strip()}'")
-                    else:
-                        logger.warning(f"🔍 Formato de matching inválido: {answer}")
-                        is_correct = False
-                else:
-                    # Formato simple - solo quechua
-                    is_correct = (answer.lower().strip() == exercise.answer.lower().strip())
-                    
-            else:
-                # Lógica original para otros tipos de ejercicios
-                is_correct = (answer.lower().strip() == exercise.answer.lower().strip())
-                
+            response_data = answer_pipeline.submit_answer(request.user, exercise, answer, mode)
         except Exception as e:
-            logger.error(f"❌ Error al verificar respuesta: {str(e)}")
+            logger.error(f"❌ Error al procesar respuesta: {str(e)}", exc_info=True)
             return Response({'error': 'Error interno al verificar respuesta'}, 
                         status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-        logger.info(f"✅ Resultado de verificación: {is_correct}")
+        logger.info(f"✅ Resultado de verificación: {response_data['correct']}")
         
-        # Actualizar progreso del usuario
-        progress, created = UserProgress.objects.get_or_create(
-            user=request.user, 
-            exercise=exercise,
-            defaults={'attempts': 1, 'correct': is_correct, 'completed': is_correct}
-        )
+        return Response(response_data)
+    
+    @action(detail=False, methods=['POST'])
+    @idempotent
+    def submit_answers(self, request):
+        """
+        Envía en bloque las respuestas de una sesión (al terminarla o al
+        sincronizar respuestas hechas sin conexión).
+        Body: {"session_id": 1, "mode": "practice",
+               "answers": [{"exercise_id": 1, "answer": "...", "client_timestamp": "..."}]}
+        Cada resultado tiene el mismo formato que la respuesta de submit_answer.
+        """
+        if not request.user.is_authenticated:
+            return Response({'error': 'Debe iniciar sesión para enviar respuestas'}, 
+                        status=status.HTTP_401_UNAUTHORIZED)
         
-        if not created:
-            progress.attempts += 1
-            progress.correct = is_correct or progress.correct
-            progress.completed = is_correct or progress.completed
-            progress.save()
+        session_id = request.data.get('session_id')
+        answers = request.data.get('answers')
         
-        # NUEVO: Actualizar log de sesión si existe
-        session_id = None
-        if exercise.metadata and 'session_id' in exercise.metadata:
-            session_id = exercise.metadata['session_id']
-            try:
-                session_log = ExerciseSessionLog.objects.get(
-                    session_id=session_id,
-                    exercise=exercise
-                )
-                session_log.is_completed = True
-                session_log.is_correct = is_correct
-                session_log.end_time = timezone.now()
-                session_log.save()
-                
-                # Actualizar contador de ejercicios completados en sesión
-                session = ExerciseSession.objects.get(id=session_id)
-                session.exercises_completed += 1
-                
-                # Si todos los ejercicios están completos, marcar como completada
-                if session.exercises_completed >= session.exercises_total:
-                    session.mark_completed()
-                else:
-                    session.save()
-            except (ExerciseSessionLog.DoesNotExist, ExerciseSession.DoesNotExist):
-                pass
-        
-        # Sistema de estrellas MEJORADO con información detallada
-        mastery_updated = False
-        mastery_decreased = False
-        vocab = None
-        mastery_info = {}
-        consecutive_failures = 0
-        consecutive_failures_limit = 3 if mode == 'detection' else 2
-        is_recent_word = False
-        is_minimally_practiced = False
-
-        # ✅ CORRECCIÓN CRÍTICA 1: Normalizar palabra antes de buscar/crear
-        normalized_quechua = exercise.object_translation.quechua.strip().lower()
-
         try:
-            # ✅ CORRECCIÓN 2: Buscar palabra normalizada
-            vocab = UserVocabulary.objects.get(
-                user=request.user,
-                quechua_word=normalized_quechua  # ← NORMALIZADA
-            )
-            old_mastery = vocab.mastery_level
-            
-            # ACTUALIZADO: Llamar a update_mastery y obtener información detallada
-            mastery_info = vocab.update_mastery(is_correct, mode)  # Pasar el modo específico
-            
-            # Verificar cambios en el nivel de dominio
-            mastery_updated = vocab.mastery_level > old_mastery
-            mastery_decreased = mastery_info.get('was_degraded', False)
-            
-            # Obtener información adicional para enviar al frontend
-            consecutive_failures = mastery_info.get('consecutive_failures', 0)
-            consecutive_failures_limit = mastery_info.get('consecutive_failures_limit', consecutive_failures_limit)
-            is_recent_word = mastery_info.get('is_recent_word', False)
-            is_minimally_practiced = mastery_info.get('is_minimally_practiced', False)
-            
-        except UserVocabulary.DoesNotExist:
-            if mode == 'detection':
-                # ✅ SOLUCIÓN: Crear palabra automáticamente si no existe en detección
-                logger.warning(f"⚠️ Palabra '{normalized_quechua}' no encontrada en vocabulario de detección")
-                logger.warning(f"⚠️ Creando palabra automáticamente para permitir continuar")
-                
-                # Obtener vocabulario actual para diagnóstico
-                user_vocab_words = list(UserVocabulary.objects.filter(user=request.user).values_list('quechua_word', flat=True))
-                logger.warning(f"📚 Vocabulario actual ({len(user_vocab_words)} palabras): {user_vocab_words[:5]}")  # Primeras 5 palabras
-                
-                # Crear la palabra automáticamente
-                vocab = UserVocabulary.objects.create(
-                    user=request.user,
-                    object_label=exercise.object_translation.english_label,
-                    spanish_word=exercise.object_translation.spanish.strip(),
-                    quechua_word=normalized_quechua,
-                    mastery_level=1,
-                    previous_mastery_level=1,
-                    exercises_completed=1,
-                    exercises_correct=1 if is_correct else 0,
-                    times_detected=1  # Marcar como detectada una vez
-                )
-                
-                # Agregar al perfil del usuario
-                request.user.profile.add_word()
-                
-                # Registrar evento especial para diagnóstico
-                ActivityLog.objects.create(
-                    user=request.user,
-                    activity_type='word_auto_created',
-                    mode='detection',
-                    word_learned=normalized_quechua,
-                    details={
-                        'reason': 'missing_from_vocab',
-                        'exercise_id': exercise.id,
-                        'auto_created': True,
-                        'original_word': exercise.object_translation.quechua,
-                        'vocab_count_before': len(user_vocab_words)
-                    }
-                )
-                
-                logger.info(f"✅ Palabra creada automáticamente en modo detección: '{normalized_quechua}'")
-                
-            else:
-                # EN PRÁCTICA: Crear palabra nueva normalmente
-                vocab = UserVocabulary.objects.create(
-                    user=request.user,
-                    object_label=exercise.object_translation.english_label,
-                    spanish_word=exercise.object_translation.spanish.strip(),
-                    quechua_word=normalized_quechua,
-                    mastery_level=1,
-                    previous_mastery_level=1,
-                    exercises_completed=1,
-                    exercises_correct=1 if is_correct else 0
-                )
-                request.user.profile.add_word()
-                
-                logger.info(f"✅ Palabra creada en modo práctica: '{normalized_quechua}'")
-
-        # ✅ CORRECCIÓN 4: Registrar actividad con palabra normalizada
-        ActivityLog.objects.create(
-            user=request.user,
-            activity_type='exercise_completed',
-            mode=mode,
-            category=exercise.category,
-            word_learned=normalized_quechua,  # ← NORMALIZADA
-            details={
-                'exercise_id': exercise.id,
-                'exercise_type': exercise.type,
-                'mastery_level': vocab.mastery_level,
-                'previous_mastery_level': vocab.previous_mastery_level,
-                'is_correct': is_correct,
-                'mode': mode,
-                'session_id': session_id
-            }
-        ) 
+            session_id = int(session_id)
+        except (ValueError, TypeError):
+            return Response({'error': f'ID de sesión debe ser un número: {session_id}'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
         
-        # Actualizar meta diaria
-        today = timezone.now().date()
-        daily_goal, _ = DailyGoal.objects.get_or_create(
-            user=request.user,
-            date=today
-        )
-        daily_goal.words_practiced += 1
-        if vocab.mastery_level == 5 and mastery_updated:
-            daily_goal.words_mastered += 1
-        daily_goal.save()
-        
-        # Verificar logros
-        Achievement.check_achievements(request.user)
-        
-        # Preparar respuesta MEJORADA con información detallada
-        response_data = {
-            'correct': is_correct,
-            'feedback': '¡Correcto!' if is_correct else f'Incorrecto. La respuesta correcta es: {exercise.answer}',
-            'mastery_level': vocab.mastery_level,
-            'previous_mastery_level': vocab.previous_mastery_level,
-            'mastery_updated': mastery_updated,
-            'mastery_decreased': mastery_decreased,
-            'mode': mode,
-            'category': exercise.category,
-            'consecutive_failures': consecutive_failures,
-            'consecutive_failures_limit': consecutive_failures_limit,
-            'is_recent_word': is_recent_word,
-            'is_minimally_practiced': is_minimally_practiced,
-            'exercises_completed': vocab.exercises_completed,
-            'exercises_needed': 5 - vocab.exercises_completed if vocab.exercises_completed < 5 else 0
-        }
+        if not isinstance(answers, list) or not answers:
+            return Response({'error': 'Se requiere una lista de respuestas'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
         
-        # Agregar mensaje específico si hubo degradación
-        if mastery_decreased:
-            response_data['degradation_message'] = "Esta palabra necesita más práctica. ¡Sigue intentándolo!"
+        if len(answers) > answer_pipeline.MAX_BATCH_SIZE:
+            return Response({'error': f'Máximo {answer_pipeline.MAX_BATCH_SIZE} respuestas por envío'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
         
-        return Response(response_data)
+        if not all(isinstance(item, dict) for item in answers):
+            return Response({'error': 'Cada respuesta debe ser un objeto'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            session, results = answer_pipeline.submit_answers(
+                request.user, session_id, answers, default_mode=request.data.get('mode')
+            )
+        except ExerciseSession.DoesNotExist:
+            return Response({'error': 'Sesión no encontrada'}, 
+                          status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"❌ Error al procesar lote de respuestas: {str(e)}", exc_info=True)
+            return Response({'error': 'Error interno al procesar las respuestas'}, 
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        logger.info(f"✅ Lote de {len(answers)} respuestas procesado para sesión {session_id}")
+        
+        return Response({
+            'session_id': session.id,
+            'session': {
+                'exercises_total': session.exercises_total,
+                'exercises_completed': session.exercises_completed,
+                'is_completed': session.is_completed
+            },
+            'results': results
+        })
     
     @action(detail=False, methods=['POST'])
     def abandon_session(self, request):
@@ -882,59 +812,8 @@ class ExerciseViewSet(viewsets.ModelViewSet):
                 
             session = ExerciseSession.objects.get(id=session_id, user=request.user)
             
-            # Calcular palabras que serían afectadas
-            affected_words = []
-            for log in ExerciseSessionLog.objects.filter(session=session, is_completed=False):
-                word = log.exercise.object_translation.quechua
-                try:
-                    vocab = UserVocabulary.objects.get(
-                        user=request.user,
-                        quechua_word=word
-                    )
-                    
-                    if vocab.mastery_level > 1:
-                        # Verificar si cumpliría condiciones para degradación
-                        days_since_added = (timezone.now().date() - vocab.first_detected.date()).days
-                        is_recent_word = days_since_added <= (3 if session.mode == 'detection' else 1)
-                        is_minimally_practiced = vocab.exercises_completed >= 5
-                        
-                        # Definir límite según modo
-                        consecutive_failures_limit = 3 if session.mode == 'detection' else 2
-                        would_degrade = (vocab.consecutive_failures + (1 if session.mode == 'detection' else 2) >= 
-                                        consecutive_failures_limit and
-                                        not is_recent_word and
-                                        is_minimally_practiced)
-                        
-                        affected_words.append({
-                            'word': word,
-                            'spanish': vocab.spanish_word,
-                            'current_level': vocab.mastery_level,
-                            'would_degrade': would_degrade,
-                            'potential_new_level': vocab.mastery_level - 1 if would_degrade else vocab.mastery_level
-                        })
-                except UserVocabulary.DoesNotExist:
-                    pass
-            
-            # Construir mensaje de advertencia
-            warning_message = "Si abandonas esta sesión:"
-            if not affected_words:
-                warning_message += " No hay penalizaciones para palabras existentes."
-            else:
-                degrading_words = [word for word in affected_words if word['would_degrade']]
-                if degrading_words:
-                    warning_message += f" {len(degrading_words)} palabra(s) podrían perder una estrella de dominio."
-                else:
-                    warning_message += " Algunas palabras acumularán fallos, pero ninguna perderá estrellas en este momento."
-            
-            return Response({
-                'warning_message': warning_message,
-                'affected_words': affected_words,
-                'abandonment_consequence': {
-                    'mode': session.mode,
-                    'failure_penalty': 1 if session.mode == 'detection' else 2,
-                    'total_words_affected': len(affected_words)
-                }
-            })
+            # Una sola consulta (con caché por sesión) para las palabras afectadas
+            return Response(abandonment.penalty_preview(session))
             
         except ExerciseSession.DoesNotExist:
             return Response({'error': 'Sesión no encontrada'}, 
@@ -1513,6 +1392,7 @@ class PracticeViewSet(viewsets.ViewSet):
    permission_classes = [IsAuthenticatedOrReadOnly]
    
    @action(detail=False, methods=['GET'])
+   @conditional_get(per_user=False)
    def categories(self, request):
        """Obtiene las categorías disponibles para práctica"""
        categories = [
@@ -1560,77 +1440,20 @@ class PracticeViewSet(viewsets.ViewSet):
         if not category:
             return Response({'error': 'Se requiere categoría'}, status=400)
         
-        # Obtener traducciones según la categoría
-        if category == 'vocabulary':
-            translations = ObjectTranslation.objects.order_by('?')[:10]
-        elif category == 'phrases':
-            # Filtrar frases comunes (traducciones con más de una palabra)
-            translations = ObjectTranslation.objects.filter(
-                spanish__contains=' '
-            ).order_by('?')[:10]
-        elif category == 'memory':
-            translations = ObjectTranslation.objects.order_by('?')[:10]
-        elif category == 'pronunciation':
-            translations = ObjectTranslation.objects.order_by('?')[:10]
-        else:
+        if category not in practice_exercises.CATEGORY_EXERCISE_TYPES:
             return Response({'error': 'Categoría no válida'}, status=400)
         
-        # Generar ejercicios
-        exercises = []
-        for trans in translations:
-            # SOLUCIÓN: Asignar tipos específicos según la categoría sin elegir aleatoriamente
-            if category == 'vocabulary':
-                exercise_type = 'anagram'  # Usar anagram para vocabulario
-            elif category == 'phrases':
-                exercise_type = 'fill_blanks'  # Usar fill_blanks para frases
-            elif category == 'memory':
-                exercise_type = 'matching'  # Usar matching para memoria
-            elif category == 'pronunciation':
-                exercise_type = 'pronunciation'  # Usar pronunciation para pronunciación
-            else:
-                # Fallback (no debería ocurrir)
-                exercise_type = 'multiple_choice'
-            
-            # Generar ejercicio del tipo seleccionado
-            exercise = Exercise.objects.create(
-                type=exercise_type,
-                category=category,
-                object_translation=trans,
-                difficulty=request.user.profile.current_level if request.user.is_authenticated else 1,
-                question=self._generate_question(exercise_type, trans),
-                answer=trans.quechua,
-                distractors=self._generate_distractors(exercise_type, trans),
-                metadata={
-                    'category': category,
-                    'time_limit': self._get_time_limit(exercise_type),
-                    'practice_mode': True,
-                    'mode': mode
-                }
-            )
-            exercises.append(exercise)
-        
-        # NUEVO: Crear sesión de ejercicios
-        session = None
-        if request.user.is_authenticated:
-            session = ExerciseSession.objects.create(
-                user=request.user,
-                mode=mode,
-                exercises_total=len(exercises)
-            )
-            
-            # Registrar ejercicios en la sesión
-            for exercise in exercises:
-                ExerciseSessionLog.objects.create(
-                    session=session,
-                    exercise=exercise
-                )
-                
-                # Actualizar metadata con ID de sesión
-                if not exercise.metadata:
-                    exercise.metadata = {}
-                exercise.metadata['session_id'] = session.id
-                exercise.save()
+        # Si la sesión se preparó por adelantado, solo hay que sacarla de la caché
+        # Frases comunes: traducciones con más de una palabra
+        specs = practice_exercises.session_specs(
+            request.user, category, mode, 10, phrases_only=(category == 'phrases')
+        )
         
+        return self._session_response(request, specs, mode)
+   
+   def _session_response(self, request, specs, mode):
+        """Crea los ejercicios y la sesión, y arma la respuesta"""
+        session, exercises = practice_exercises.create_session_exercises(request.user, specs, mode)
         serializer = ExerciseSerializer(exercises, many=True)
         
         # Si hay sesión, incluir ID en la respuesta
@@ -1642,46 +1465,7 @@ class PracticeViewSet(viewsets.ViewSet):
         else:
             response_data = serializer.data
         
-        return Response(response_data) 
-   
-   def _generate_question(self, exercise_type, translation):
-       questions = {
-           'multiple_choice': f"¿Cómo se dice '{translation.spanish}' en quechua?",
-           'fill_blanks': f"Completa la palabra en quechua para '{translation.spanish}'",
-           'anagram': f"Ordena las letras para formar la palabra en quechua que significa '{translation.spanish}'",
-           'pronunciation': f"Practica la pronunciación de la palabra '{translation.quechua}' que significa '{translation.spanish}'",
-           'matching': f"Relaciona las palabras en español con su traducción en quechua"
-       }
-       return questions.get(exercise_type, "Práctica de quechua")
-   
-   def _generate_distractors(self, exercise_type, translation):
-       if exercise_type == 'multiple_choice':
-           other_translations = ObjectTranslation.objects.exclude(
-               id=translation.id
-           ).order_by('?')[:3]
-           return [t.quechua for t in other_translations]
-       elif exercise_type == 'matching':
-           other_translations = ObjectTranslation.objects.exclude(
-               id=translation.id
-           ).order_by('?')[:3]
-           # CORRECCIÓN: Asegurar que cada par tenga un ID único
-           pairs = [{'id': 1, 'spanish': translation.spanish, 'quechua': translation.quechua}]
-           for i, trans in enumerate(other_translations, start=2):
-               pairs.append({'id': i, 'spanish': trans.spanish, 'quechua': trans.quechua})
-           return {'pairs': pairs}
-       elif exercise_type == 'fill_blanks':
-           return {'hint': f"La palabra tiene {len(translation.quechua)} letras"}
-       return None
-   
-   def _get_time_limit(self, exercise_type):
-       time_limits = {
-           'multiple_choice': 30,
-           'fill_blanks': 45,
-           'anagram': 60,
-           'pronunciation': 60,
-           'matching': 90
-       }
-       return time_limits.get(exercise_type, 30)
+        return Response(response_data)
    
    @action(detail=False, methods=['GET'])
    def random_exercises(self, request):
@@ -1690,78 +1474,14 @@ class PracticeViewSet(viewsets.ViewSet):
         count = int(request.query_params.get('count', '5'))
         mode = request.query_params.get('mode', 'practice')
         
-        # Obtener traducciones aleatorias para la categoría seleccionada
-        translations = ObjectTranslation.objects.order_by('?')[:count]
-        
-        exercises = []
-        for translation in translations:
-            # SOLUCIÓN: Asignar tipos específicos según la categoría sin elegir aleatoriamente
-            if category == 'vocabulary':
-                exercise_type = 'anagram'  # Usar anagram para vocabulario
-            elif category == 'phrases':
-                exercise_type = 'fill_blanks'  # Usar fill_blanks para frases
-            elif category == 'memory':
-                exercise_type = 'matching'  # Usar matching para memoria
-            elif category == 'pronunciation':
-                exercise_type = 'pronunciation'  # Usar pronunciation para pronunciación
-            else:
-                # Fallback (no debería ocurrir)
-                exercise_type = 'multiple_choice'
-            
-            # Crear ejercicio temporal
-            exercise = Exercise.objects.create(
-                type=exercise_type,
-                category=category,
-                object_translation=translation,
-                difficulty=request.user.profile.current_level if request.user.is_authenticated else 1,
-                question=self._generate_question(exercise_type, translation),
-                answer=translation.quechua,
-                distractors=self._generate_distractors(exercise_type, translation),
-                metadata={
-                    'practice_mode': True,
-                    'time_limit': self._get_time_limit(exercise_type),
-                    'category': category,
-                    'mode': mode
-                }
-            )
-            exercises.append(exercise)
-        
-        # NUEVO: Crear sesión de ejercicios
-        session = None
-        if request.user.is_authenticated:
-            session = ExerciseSession.objects.create(
-                user=request.user,
-                mode=mode,
-                exercises_total=len(exercises)
-            )
-            
-            # Registrar ejercicios en la sesión
-            for exercise in exercises:
-                ExerciseSessionLog.objects.create(
-                    session=session,
-                    exercise=exercise
-                )
-                
-                # Actualizar metadata con ID de sesión
-                if not exercise.metadata:
-                    exercise.metadata = {}
-                exercise.metadata['session_id'] = session.id
-                exercise.save()
-        
-        serializer = ExerciseSerializer(exercises, many=True)
+        # Prefetch (si hay) completado con traducciones aleatorias de la categoría
+        specs = practice_exercises.session_specs(request.user, category, mode, count)
         
-        # Si hay sesión, incluir ID en la respuesta
-        if session:
-            response_data = {
-                'session_id': session.id,
-                'exercises': serializer.data
-            }
-        else:
-            response_data = serializer.data
-        
-        return Response(response_data) 
+        return self._session_response(request, specs, mode)
    
    @action(detail=False, methods=['GET'])
+   @conditional_get()
+   @cached_per_user('user_vocabulary')
    def user_vocabulary(self, request):
     """Obtiene el vocabulario personal del usuario con el nuevo sistema"""
     if not request.user.is_authenticated:
@@ -1770,48 +1490,38 @@ class PracticeViewSet(viewsets.ViewSet):
     
     # Obtener parámetros de filtro y ordenamiento
     sort_by = request.query_params.get('sort_by', 'recent')
-    mastery_min = request.query_params.get('mastery_min')
-    mastery_max = request.query_params.get('mastery_max')
     mode = request.query_params.get('mode')  # Nuevo parámetro
+    cursor = request.query_params.get('cursor')
+    page_size = request.query_params.get('page_size')
     
-    # Consulta base
-    queryset = UserVocabulary.objects.filter(user=request.user)
-    
-    # Si se especifica modo, filtrar por origen usando ActivityLog
-    if mode == 'detection':
-        # Obtener palabras que se originaron en detección
-        words_from_detection = ActivityLog.objects.filter(
-            user=request.user,
-            activity_type='detection_session',
-            mode='detection'
-        ).values_list('word_learned', flat=True).distinct()
+    try:
+        queryset = vocabulary_listing.vocabulary_queryset(
+            request.user, sort_by=sort_by,
+            mastery_min=request.query_params.get('mastery_min'),
+            mastery_max=request.query_params.get('mastery_max'),
+            # Origen de la palabra: columna fijada al crearla
+            origin='detection' if mode == 'detection' else None
+        )
         
-        # Filtrar vocabulario para incluir solo estas palabras
-        queryset = queryset.filter(quechua_word__in=words_from_detection)
-    
-    # Aplicar filtros si están presentes
-    if mastery_min is not None:
-        queryset = queryset.filter(mastery_level__gte=int(mastery_min))
-    if mastery_max is not None:
-        queryset = queryset.filter(mastery_level__lte=int(mastery_max))
-    
-    # Aplicar ordenamiento
-    if sort_by == 'recent':
-        queryset = queryset.order_by('-last_detected')
-    elif sort_by == 'mastery':
-        queryset = queryset.order_by('-mastery_level', '-last_detected')
-    elif sort_by == 'needs_practice':
-        queryset = queryset.order_by('mastery_level', '-last_detected')
-    elif sort_by == 'alphabetical':
-        queryset = queryset.order_by('spanish_word')
+        # Sin cursor ni page_size: lista completa (clientes anteriores)
+        if cursor is None and page_size is None:
+            return Response(UserVocabularySerializer(queryset, many=True).data)
+        
+        rows, next_cursor = vocabulary_listing.paginate(queryset, sort_by, cursor=cursor, page_size=page_size)
+    except ValueError:
+        return Response({'error': 'Parámetros de vocabulario inválidos'}, status=status.HTTP_400_BAD_REQUEST)
     
-    serializer = UserVocabularySerializer(queryset, many=True)
-    return Response(serializer.data)
+    return Response({
+        'results': UserVocabularySerializer(rows, many=True).data,
+        'next_cursor': next_cursor
+    })
 
 class ProgressViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
     
     @action(detail=False, methods=['GET'])
+    @conditional_get()
+    @cached_per_user('user_progress')
     def user_progress(self, request):
         """Obtiene el progreso completo del usuario - VERSIÓN CORREGIDA"""
         user = request.user
@@ -1850,26 +1560,7 @@ class ProgressViewSet(viewsets.ViewSet):
             })
         
         # Obtener meta diaria
-        today = timezone.now().date()
-        try:
-            with transaction.atomic():
-                daily_goal, created = DailyGoal.objects.get_or_create(
-                    user=request.user,
-                    date=today,
-                    defaults={
-                        'words_detected': 0,
-                        'words_practiced': 0,
-                        'words_mastered': 0,
-                        'detection_goal': 3,
-                        'practice_goal': 5,
-                        'mastery_goal': 1
-                    }
-                )
-        except IntegrityError:
-            daily_goal = DailyGoal.objects.get(
-                user=request.user,
-                date=today
-            )
+        daily_goal = daily_goals.get_today(request.user)
         
         # ✅ CORRECCIÓN 3: Actividades de detección - usar 'detection_session' como en detect()
         detection_session_activities = ActivityLog.objects.filter(
@@ -1907,7 +1598,8 @@ class ProgressViewSet(viewsets.ViewSet):
         practice_words = len(practice_words_only)
         
         # Verificación de integridad con vocabulario real
-        real_total = UserVocabulary.objects.filter(user=user).count()
+        stars = star_histogram.histogram(user.profile)
+        real_total = stars['total']
         calculated_total = detection_words + practice_words
         
         # ✅ LOGGING MEJORADO para debug
@@ -1938,54 +1630,40 @@ class ProgressViewSet(viewsets.ViewSet):
             logger.info(f"🔧 Corregido - Detección: {detection_words}, Práctica: {practice_words}")
                     
         # Estadísticas por categoría (vocabulario)
-        vocab_stats = UserVocabulary.objects.filter(user=user).aggregate(
-            total=Count('id'),
-            mastered=Count('id', filter=Q(mastery_level=5)),
-            in_progress=Count('id', filter=Q(mastery_level__gte=2, mastery_level__lte=4)),
-            needs_practice=Count('id', filter=Q(mastery_level=1))
-        )
+        vocab_stats = {
+            'total': stars['total'],
+            'mastered': stars['stars'][5],
+            'in_progress': star_histogram.count_between(stars, 2, 4),
+            'needs_practice': stars['stars'][1]
+        }
         
         # ✅ CORRECCIÓN 5: Weekly activity simplificada (sin campo 'date')
+        # Una sola lectura del resumen diario para los últimos 7 días (fecha local)
+        now = timezone.now()
+        today = timezone.localdate()
+        daily = daily_activity.by_date(user, today - timedelta(days=6), today)
         weekly_activity = []
+        recent_activity = []
         for i in range(7):
-            date = timezone.now() - timedelta(days=i)
-            day_activities = ActivityLog.objects.filter(
-                user=user,
-                timestamp__date=date.date()
-            )
-            
-            # Contar palabras únicas aprendidas ese día (solo sesiones de detección y ejercicios completados)
-            words_that_day = day_activities.filter(
-                activity_type__in=['detection_session', 'exercise_completed']
-            ).values('word_learned').distinct().count()
+            date = today - timedelta(days=i)
+            day = daily.get(date)
+            # Palabras únicas de ese día (sesiones de detección y ejercicios completados)
+            words_that_day = day.distinct_words if day else 0
             
             # ✅ Estructura simplificada como espera el frontend
-            day_data = {
+            weekly_activity.append({
                 'day': date.strftime('%a'),
                 'words': words_that_day  # Solo estos dos campos
-            }
-            weekly_activity.append(day_data)
-        weekly_activity.reverse()
-        
-        # Actividad reciente
-        recent_activity = []
-        for i in range(7):
-            date = timezone.now() - timedelta(days=i)
-            day_activities = ActivityLog.objects.filter(
-                user=user,
-                timestamp__date=date.date()
-            )
-            
-            words_learned = day_activities.filter(
-                activity_type__in=['detection_session', 'exercise_completed']
-            ).values('word_learned').distinct().count()
+            })
             
-            if words_learned > 0:
+            # Actividad reciente
+            if words_that_day > 0:
                 recent_activity.append({
-                    'date': date.isoformat(),
-                    'words_learned': words_learned,
-                    'exercises_count': 0  # Compatible con frontend
+                    'date': (now - timedelta(days=i)).isoformat(),
+                    'words_learned': words_that_day,
+                    'exercises_count': day.exercises
                 })
+        weekly_activity.reverse()
         
         # ✅ ESTRUCTURA FINAL COMPLETA - Con todos los campos que espera el frontend
         progress_data = {
@@ -2035,6 +1713,7 @@ class ProgressViewSet(viewsets.ViewSet):
         return Response(progress_data) 
     
     @action(detail=False, methods=['POST'])
+    @idempotent
     def record_progress(self, request):
         """Registra el progreso del usuario"""
         try:
@@ -2049,44 +1728,17 @@ class ProgressViewSet(viewsets.ViewSet):
                 else:
                     mode = 'practice'
             
-            # Actualizar última actividad y racha
-            request.user.profile.update_streak()
-            
-            # Crear registro de actividad
-            activity = ActivityLog.objects.create(
-                user=request.user,
-                activity_type='session_completed',
-                mode=mode,
-                category=category,
-                timestamp=timestamp or timezone.now(),
-                details={
-                    'mode': mode,
-                    'category': category,
-                    'recorded_at': timezone.now().isoformat()
-                }
+            try:
+                completed_exercises = int(request.data.get('completed_exercises', 0))
+            except (TypeError, ValueError):
+                completed_exercises = 0
+            
+            # Racha, registro de actividad y meta diaria (compartido con la sincronización)
+            activity = sync.record_progress(
+                request.user, mode, category=category,
+                client_timestamp=timestamp, completed_exercises=completed_exercises
             )
             
-            # Si es modo práctica, actualizar meta diaria
-            if mode == 'practice':
-                today = timezone.now().date()
-                daily_goal, _ = DailyGoal.objects.get_or_create(
-                    user=request.user,
-                    date=today,
-                    defaults={
-                        'words_detected': 0,
-                        'words_practiced': 0,
-                        'words_mastered': 0,
-                        'detection_goal': 3,
-                        'practice_goal': 5,
-                        'mastery_goal': 1
-                    }
-                )
-                # Incrementar contador de práctica general (no por palabra individual)
-                # Esto es para registrar sesiones completas de práctica
-                if 'completed_exercises' in request.data:
-                    daily_goal.words_practiced += request.data.get('completed_exercises', 0)
-                daily_goal.save()
-            
             return Response({
                 'status': 'success',
                 'message': 'Progreso registrado correctamente',
@@ -2101,7 +1753,62 @@ class ProgressViewSet(viewsets.ViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=False, methods=['POST'])
+    @idempotent
+    def sync(self, request):
+        """
+        Sincronización incremental para clientes sin conexión (ver services/sync.py).
+        Body: {"cursor": 120, "limit": 500,
+               "mutations": [{"id": "...", "type": "answers", "session_id": 1, "mode": "practice",
+                              "answers": [{"exercise_id": 1, "answer": "...", "client_timestamp": "..."}]},
+                             {"id": "...", "type": "progress", "mode": "practice", "category": "...",
+                              "timestamp": "...", "completed_exercises": 5}]}
+        Aplica primero los cambios del cliente y devuelve lo que cambió desde
+        el cursor (con lápidas en 'deleted') y el cursor nuevo.
+        """
+        mutations = request.data.get('mutations') or []
+        try:
+            cursor = int(request.data.get('cursor') or 0)
+            limit = int(request.data.get('limit') or sync.DEFAULT_LIMIT)
+        except (TypeError, ValueError):
+            return Response({'error': 'cursor y limit deben ser números'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        if cursor < 0:
+            return Response({'error': 'Cursor inválido'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        if not isinstance(mutations, list) or not all(isinstance(m, dict) for m in mutations):
+            return Response({'error': 'mutations debe ser una lista de objetos'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        if len(mutations) > sync.MAX_MUTATIONS:
+            return Response({'error': f'Máximo {sync.MAX_MUTATIONS} cambios por sincronización'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            mutation_results = sync.apply_mutations(request.user, mutations)
+            delta = sync.changes(request.user, cursor, limit)
+            daily_goal = daily_goals.get_today(request.user)
+        except Exception as e:
+            logger.error(f"❌ Error en sincronización: {str(e)}", exc_info=True)
+            return Response({'error': 'Error interno al sincronizar'}, 
+                          status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        return Response({
+            'cursor': delta['cursor'],
+            'reset': delta['reset'],
+            'has_more': delta['has_more'],
+            'vocabulary': UserVocabularySerializer(delta['vocabulary'], many=True).data,
+            'achievements': delta['achievements'],
+            'sessions': delta['sessions'],
+            'deleted': delta['deleted'],
+            'daily_goal': DailyGoalSerializer(daily_goal).data,
+            'mutations': mutation_results,
+        })
+    
     @action(detail=False, methods=['GET'])
+    @conditional_get(tables=['achievement'])
     def achievements(self, request):
         """Obtiene todos los logros y su estado para el usuario"""
         user = request.user
@@ -2138,16 +1845,18 @@ class ProgressViewSet(viewsets.ViewSet):
         return 0
     
     @action(detail=False, methods=['GET'])
+    @conditional_get()
+    @cached_per_user('vocabulary_stats')
     def vocabulary_stats(self, request):
         """Estadísticas detalladas del vocabulario"""
         user = request.user
         
-        # Estadísticas por nivel de dominio
-        mastery_stats = UserVocabulary.objects.filter(user=user).values(
-            'mastery_level'
-        ).annotate(
-            count=Count('id')
-        ).order_by('mastery_level')
+        # Estadísticas por nivel de dominio (histograma del perfil)
+        stars = star_histogram.histogram(user.profile)
+        mastery_stats = [
+            {'mastery_level': level, 'count': count}
+            for level, count in stars['stars'].items() if count
+        ]
         
         # Palabras más practicadas
         most_practiced = UserVocabulary.objects.filter(
@@ -2174,28 +1883,52 @@ class UserVocabularyViewSet(viewsets.ModelViewSet):
        """Obtiene el vocabulario del usuario actual"""
        return UserVocabulary.objects.filter(user=self.request.user)
    
+   @conditional_get()
+   def list(self, request, *args, **kwargs):
+       return super().list(request, *args, **kwargs)
+   
+   @conditional_get()
+   def retrieve(self, request, *args, **kwargs):
+       return super().retrieve(request, *args, **kwargs)
+   
+   def perform_create(self, serializer):
+       super().perform_create(serializer)
+       user_cache.bump(self.request.user)
+   
+   def perform_update(self, serializer):
+       super().perform_update(serializer)
+       user_cache.bump(self.request.user)
+   
+   def perform_destroy(self, instance):
+       super().perform_destroy(instance)
+       user_cache.bump(self.request.user)
+   
    @action(detail=False, methods=['GET'])
+   @conditional_get()
+   @cached_per_user('vocabulary_summary')
    def summary(self, request):
        """Resumen del vocabulario del usuario"""
-       queryset = self.get_queryset()
+       # Histograma de estrellas del perfil: sin agregar el vocabulario
+       stars = star_histogram.histogram(request.user.profile)
        
        summary = {
-           'total_words': queryset.count(),
-           'mastered_words': queryset.filter(mastery_level=5).count(),
-           'in_progress': queryset.filter(mastery_level__gt=1, mastery_level__lt=5).count(),
-           'needs_practice': queryset.filter(mastery_level__lte=2).count(),
+           'total_words': stars['total'],
+           'mastered_words': stars['stars'][5],
+           'in_progress': star_histogram.count_between(stars, 2, 4),
+           'needs_practice': star_histogram.count_between(stars, 0, 2),
            'categories': {
-               '1_star': queryset.filter(mastery_level=1).count(),
-               '2_stars': queryset.filter(mastery_level=2).count(),
-               '3_stars': queryset.filter(mastery_level=3).count(),
-               '4_stars': queryset.filter(mastery_level=4).count(),
-               '5_stars': queryset.filter(mastery_level=5).count()
+               '1_star': stars['stars'][1],
+               '2_stars': stars['stars'][2],
+               '3_stars': stars['stars'][3],
+               '4_stars': stars['stars'][4],
+               '5_stars': stars['stars'][5]
            }
        }
        
        return Response(summary)
    
    @action(detail=False, methods=['GET'])
+   @conditional_get()
    def practice_suggestions(self, request):
        """Sugiere palabras para practicar basado en el dominio"""
        limit = int(request.query_params.get('limit', 10))
@@ -2219,6 +1952,7 @@ class UserVocabularyViewSet(viewsets.ModelViewSet):
        vocab.exercises_completed = 0
        vocab.exercises_correct = 0
        vocab.save()
+       user_cache.bump(request.user)
        
        serializer = self.get_serializer(vocab)
        return Response(serializer.data)
@@ -2240,33 +1974,24 @@ def check_achievements(request):
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def daily_goal_view(request):
-   """Obtiene o actualiza la meta diaria"""
-   today = timezone.now().date()
-   
+   """Obtiene o actualiza la meta diaria (contadores de hoy en Redis, ver services/daily_goals.py)"""
    if request.method == 'GET':
-       daily_goal, _ = DailyGoal.objects.get_or_create(
-           user=request.user,
-           date=today
-       )
+       daily_goal = daily_goals.get_today(request.user)
        serializer = DailyGoalSerializer(daily_goal)
        return Response(serializer.data)
    
    elif request.method == 'POST':
-       daily_goal, _ = DailyGoal.objects.get_or_create(
-           user=request.user,
-           date=today
-       )
-       
        # Actualizar contadores según la acción
        action = request.data.get('action')
-       if action == 'word_detected':
-           daily_goal.words_detected += 1
-       elif action == 'word_practiced':
-           daily_goal.words_practiced += 1
-       elif action == 'word_mastered':
-           daily_goal.words_mastered += 1
-       
-       daily_goal.save()
+       counters = {
+           'word_detected': {'detected': 1},
+           'word_practiced': {'practiced': 1},
+           'word_mastered': {'mastered': 1},
+       }.get(action, {})
+       daily_goal = daily_goals.increment(request.user, **counters)
+       if daily_goal is None:
+           # Dentro de una transacción el incremento se aplica al confirmarla
+           daily_goal = daily_goals.with_increments(daily_goals.get_today(request.user), **counters)
        
        # Verificar si se completó la meta
        completed = daily_goal.is_complete()
@@ -2279,6 +2004,8 @@ def daily_goal_view(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_get()
+@cached_per_user('user_dashboard')
 def user_dashboard(request):
    """Proporciona los datos necesarios para la pantalla principal con el nuevo sistema"""
    user = request.user
@@ -2301,43 +2028,31 @@ def user_dashboard(request):
        streak_active = days_diff <= 1
    
    # Obtener meta diaria
-   daily_goal, _ = DailyGoal.objects.get_or_create(
-       user=user,
-       date=today
-   )
+   daily_goal = daily_goals.get_today(user)
    
-   # Actividad de la última semana
-   last_week = today - timedelta(days=7)
-   activity_stats = (
-       ActivityLog.objects.filter(
-           user=user,
-           timestamp__gte=last_week
-       )
-       .values('timestamp__date')
-       .annotate(
-           words_detected=Count('id', filter=Q(activity_type='word_detected')),
-           words_practiced=Count('id', filter=Q(activity_type='exercise_completed'))
-       )
-       .order_by('timestamp__date')
-   )
+   # Actividad de la última semana (resumen diario, una sola lectura)
+   local_today = timezone.localdate()
+   daily = daily_activity.by_date(user, local_today - timedelta(days=7), local_today)
    
    # Preparar datos de actividad
    activity_chart = []
-   for stat in activity_stats:
+   for date in sorted(daily):
+       stat = daily[date]
        activity_chart.append({
-           'date': stat['timestamp__date'].strftime('%Y-%m-%d'),
-           'words_detected': stat['words_detected'],
-           'words_practiced': stat['words_practiced'],
-           'total': stat['words_detected'] + stat['words_practiced']
+           'date': date.strftime('%Y-%m-%d'),
+           'words_detected': stat.detections,
+           'words_practiced': stat.exercises,
+           'total': stat.detections + stat.exercises
        })
    
    # Categorías de vocabulario
-   vocab_stats = UserVocabulary.objects.filter(user=user).aggregate(
-       total=Count('id'),
-       mastered=Count('id', filter=Q(mastery_level=5)),
-       in_progress=Count('id', filter=Q(mastery_level__gt=1, mastery_level__lt=5)),
-       needs_practice=Count('id', filter=Q(mastery_level__lte=2))
-   )
+   stars = star_histogram.histogram(user.profile)
+   vocab_stats = {
+       'total': stars['total'],
+       'mastered': stars['stars'][5],
+       'in_progress': star_histogram.count_between(stars, 2, 4),
+       'needs_practice': star_histogram.count_between(stars, 0, 2)
+   }
    
    # Logros recientes
    recent_achievements = (